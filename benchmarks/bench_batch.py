@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Description: Measure a batch of pages of a bib file: one bibtex2html.py run for each page, compared with a
+single run with --batch (in one process, and in a pool of processes). Each job is the page of an author with a
+style (type, year or venue).
+
+Usage:
+  bench_batch.py [<bibfile>] [-c <conffile>] [-n <pages>] [-j <jobs>]
+  bench_batch.py (-h | --help)
+
+Options:
+
+  -h --help                Show this screen.
+  -c --conf <conffile>     Configuration file. [default: papers.ini]
+  -n --pages <pages>       Number of pages (jobs). [default: 30]
+  -j --jobs <jobs>         Number of processes of the pool. [default: 4]
+
+Examples:
+
+bench_batch.py
+bench_batch.py papers.bib -c papers.ini -n 60 -j 8
+
+<bibfile> and <conffile> are relative to the examples folder. Citations are not fetched (--nc).
+"""
+
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+from docopt import docopt
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+script = os.path.join(root, 'bibtex2html', 'bibtex2html.py')
+examples = os.path.join(root, 'examples')
+
+sys.path.insert(0, os.path.dirname(script))
+import bibtex2html
+
+
+def get_jobs(bibfile, conffile, pages, out_folder):
+    """jobs of the benchmark: pages of authors of bibfile with each style"""
+
+    bib_entries = bibtex2html.read_bib_file(bibfile)
+    authors = sorted(set(a.strip() for e in bib_entries for a in e.get('author', '').split(',') if a.strip()))
+
+    jobs = []
+    for i in range(pages):
+        author = authors[i // 3 % len(authors)]
+        style = ['type', 'year', 'venue'][i % 3]
+        jobs.append({'bibfile': bibfile, 'config': conffile, 'output': os.path.join(out_folder, 'page%d.html' % i),
+                     'input': {'show_paper_style': style, 'selection_and': {'author': [author]}}})
+    return jobs
+
+
+def run(argv):
+    """run argv. Return seconds."""
+
+    start = time.time()
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(argv, cwd=examples, stdout=devnull)
+    return time.time() - start
+
+
+def main():
+    args = docopt(__doc__)
+
+    pages = int(args['--pages'])
+    jobs = int(args['--jobs'])
+
+    os.chdir(examples)
+    bibfile = args['<bibfile>'] or 'papers.bib'
+
+    tmp_folder = tempfile.mkdtemp()
+    try:
+        batch_jobs = get_jobs(bibfile, args['--conf'], pages, tmp_folder)
+        manifest = os.path.join(tmp_folder, 'batch.json')
+        with open(manifest, 'w') as f:
+            json.dump({'jobs': batch_jobs}, f)
+
+        results = []
+
+        seconds = 0.
+        for job in batch_jobs:
+            seconds += run([sys.executable, script, job['bibfile'], job['output'], '-c', job['config'], '--nc',
+                            '-i', repr(job['input'])])
+        results.append(('separate runs', seconds))
+
+        results.append(('--batch', run([sys.executable, script, '--batch', manifest, '--nc'])))
+        results.append(('--batch -j %d' % jobs, run([sys.executable, script, '--batch', manifest, '--nc',
+                                                     '-j', str(jobs)])))
+    finally:
+        shutil.rmtree(tmp_folder)
+
+    print('%d pages of %s' % (pages, bibfile))
+    for name, seconds in results:
+        print('%-20s %8.2f s  %8.1f ms/page' % (name, seconds, seconds * 1000 / pages))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Description: Measure bibtex2html.EntryCache, which keeps cleaned entries of a bib file in memory for --watch,
+--serve, --batch and the WSGI application: the first read, a read of the unchanged file, and a read after an
+entry changed. The entries of each read are checked against bibtex2html.read_bib_file, also for a bib file with
+several entries on a line, @string, @comment and duplicate keys. The exit status is 1 if they differ.
+
+Usage:
+  bench_entry_cache.py [<bibfile>] [-r <repeat>]
+  bench_entry_cache.py (-h | --help)
+
+Options:
+
+  -h --help                Show this screen.
+  -r --repeat <repeat>     Number of reads of the unchanged file. The median time is shown. [default: 5]
+
+Examples:
+
+bench_entry_cache.py
+bench_entry_cache.py papers_group.bib -r 10
+
+<bibfile> is relative to the examples folder.
+"""
+
+from __future__ import print_function
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from docopt import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bibtex2html'))
+import bibtex2html
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples')
+
+# entries which don't start a line, @string, @comment and duplicate keys
+mixed_bibtex = u'''@string{mia = "Medical Image Analysis"}
+@comment{an @article{c0, title={in a comment}} in a comment}
+@article{a1, title={First}, author={Cheng, Jian}, journal=mia, year={2010}} @article{a2, title={Second},
+  author={Cheng, Jian}, journal={NeuroImage}, year={2011}}
+@inproceedings{a3, title={Third, with an email jian@example.org}, author={Cheng, Jian}, booktitle={MICCAI},
+  year={2012}}   @misc{a4, title={Fourth}, author={Cheng, Jian}, year={2013}}
+@article{a1, title={Duplicate}, author={Cheng, Jian}, journal=mia, year={2014}}
+'''
+
+
+def check(cache, bibfile, name, errors):
+    """read bibfile with cache and compare the entries with read_bib_file. Return seconds of the read."""
+
+    start = time.time()
+    entries = cache.read(bibfile)
+    seconds = time.time() - start
+
+    expected = bibtex2html.read_bib_file(bibfile)
+    if entries != expected:
+        errors.append('%s: %s, expected %s' % (name, [e['ID'] for e in entries], [e['ID'] for e in expected]))
+    return seconds
+
+
+def main():
+    args = docopt(__doc__)
+
+    repeat = int(args['--repeat'])
+    bibfile = os.path.join(examples, args['<bibfile>'] or 'papers.bib')
+
+    tmp_folder = tempfile.mkdtemp()
+    errors = []
+    results = []
+    try:
+        mixed_file = os.path.join(tmp_folder, 'mixed.bib')
+        with io.open(mixed_file, 'w', encoding='utf8') as f:
+            f.write(mixed_bibtex)
+
+        work_file = os.path.join(tmp_folder, os.path.basename(bibfile))
+        shutil.copy(bibfile, work_file)
+
+        for name, path in [(os.path.basename(bibfile), work_file), ('mixed.bib', mixed_file)]:
+            cache = bibtex2html.EntryCache()
+            first = check(cache, path, name + ' first read', errors)
+            unchanged = sorted(check(cache, path, name + ' unchanged', errors) for _ in range(repeat))[repeat // 2]
+
+            # change the title of the first entry
+            with io.open(path, 'r', encoding='utf8') as f:
+                bibtex_str = f.read()
+            with io.open(path, 'w', encoding='utf8') as f:
+                f.write(bibtex_str.replace(u'title', u'title = {Changed}, note', 1))
+            changed = check(cache, path, name + ' changed', errors)
+
+            results.append((name, first, unchanged, changed))
+    finally:
+        shutil.rmtree(tmp_folder)
+
+    print('%-24s %12s %12s %12s' % ('bib file', 'first read', 'unchanged', 'changed'))
+    for name, first, unchanged, changed in results:
+        print('%-24s %9.1f ms %9.1f ms %9.1f ms' % (name, first * 1000, unchanged * 1000, changed * 1000))
+
+    for error in errors:
+        print('Wrong entries of %s' % error)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
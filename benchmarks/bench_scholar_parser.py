@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Description: Check that parse_scholar_profile gives the same output as the previous BeautifulSoup parser,
+and compare their speed, on generated google scholar profile pages, the pages of fixtures and recorded pages.
+
+Usage:
+  bench_scholar_parser.py [<recorded_folder>] [-n <rows>] [-r <repeat>]
+  bench_scholar_parser.py (-h | --help)
+
+Options:
+
+  -h --help                Show this screen.
+  -n --rows <rows>         Number of works in generated pages. [default: 100]
+  -r --repeat <repeat>     Number of times each page is parsed. [default: 20]
+
+Examples:
+
+bench_scholar_parser.py
+bench_scholar_parser.py scholar_pages -r 5
+
+<recorded_folder> is a folder of pages recorded by bibtex2html.py with -i "{'scholar_record': 'scholar_pages'}".
+The BeautifulSoup parser needs bs4, which is not a requirement of bibtex2html. check_scholar_parser.py checks
+parse_scholar_profile against the expected output of the fixtures without bs4.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+
+from docopt import docopt
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    sys.exit('bench_scholar_parser.py needs bs4. Use check_scholar_parser.py to check the parser without bs4.')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bibtex2html'))
+import bibtex2html
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def parse_scholar_profile_bs4(html, career=True):
+    """the previous parser of bibtex2html.parse_scholar_profile, with BeautifulSoup"""
+
+    soup = BeautifulSoup(html, "lxml")
+
+    #  title: [citations, url]
+    soup_all_gsc_a_at = soup.findAll("a", {"class": "gsc_a_at"})
+    title = [u''.join(i.findAll(text=True)).strip() for i in soup_all_gsc_a_at]
+    title_url = [u'https://scholar.google.com/%s' % i['href'] for i in soup_all_gsc_a_at]
+    citations = [u''.join(i.findAll(text=True)).strip() for i in soup.findAll("a", {"class": "gsc_a_ac"})]
+
+    dict_out = {}
+    for i, name in enumerate(title):
+        dict_out[bibtex2html.clean_title(name)] = [citations[i] if citations[i] != u'' else u'0', title_url[i]]
+
+    if not career:
+        return dict_out, u'', u''
+
+    career = soup.findAll("td", {"class": "gsc_rsb_std"}, text=True)
+    citations = career[0].get_text()
+    hindex = career[2].get_text()
+
+    return dict_out, citations, hindex
+
+
+def get_profile_page(rows):
+    """generate a google scholar profile page with some markup, entities and unicode in titles"""
+
+    page = [u'<!doctype html><html><head><title>Profile</title></head><body>',
+            u'<table id="gsc_rsb_st"><tbody>',
+            u'<tr><td class="gsc_rsb_sc1"><a class="gsc_rsb_f">Citations</a></td>'
+            u'<td class="gsc_rsb_std">%d</td><td class="gsc_rsb_std">%d</td></tr>' % (rows * 11, rows * 5),
+            u'<tr><td class="gsc_rsb_sc1"><a class="gsc_rsb_f">h-index</a></td>'
+            u'<td class="gsc_rsb_std">%d</td><td class="gsc_rsb_std">%d</td></tr>' % (rows // 3, rows // 5),
+            u'</tbody></table>',
+            u'<table id="gsc_a_t"><tbody id="gsc_a_b">']
+    for i in range(rows):
+        title = [u'Diffusion MRI &amp; fiber tracts %d' % i, u'<b>Spherical</b> codes‐part %d' % i,
+                 u'  Estimation of the <i>ODF</i> in néonatal brains %d  ' % i][i % 3]
+        page.append(u'<tr class="gsc_a_tr"><td class="gsc_a_t">'
+                    u'<a href="/citations?view_op=view_citation&amp;hl=en&amp;user=XYZ&amp;citation_for_view=XYZ:%d" '
+                    u'class="gsc_a_at">%s</a><div class="gs_gray">J Cheng, P Basser</div>'
+                    u'<div class="gs_gray">NeuroImage %d</div></td>'
+                    u'<td class="gsc_a_c"><a href="https://scholar.google.com/scholar?cites=%d" '
+                    u'class="gsc_a_ac gs_ibl">%s</a></td>'
+                    u'<td class="gsc_a_y"><span class="gsc_a_h gsc_a_hc gs_ibl">%d</span></td></tr>'
+                    % (i, title, i, i, u'%d' % (i * 7 % 50) if i % 4 else u'', 2000 + i % 20))
+    page.append(u'</tbody></table></body></html>')
+
+    return u'\n'.join(page).encode('utf-8')
+
+
+def bench(parse, html, repeat, career=True):
+    """parse html repeat times. Return output and seconds per parse."""
+
+    start = time.time()
+    for _ in range(repeat):
+        out = parse(html, career)
+    return out, (time.time() - start) / repeat
+
+
+def main():
+    args = docopt(__doc__)
+
+    rows = int(args['--rows'])
+    repeat = int(args['--repeat'])
+
+    pages = [('generated %d works' % n, get_profile_page(n)) for n in [0, 1, rows]]
+    for folder in [fixtures, args['<recorded_folder>']]:
+        if not folder:
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.html'):
+                continue
+            with open(os.path.join(folder, name), 'rb') as f:
+                pages.append((name, f.read()))
+
+    failed = 0
+    for name, html in pages:
+        # recorded pages after the first page of a profile may have no total citations
+        career = b'gsc_rsb_std' in html
+        out_bs4, t_bs4 = bench(parse_scholar_profile_bs4, html, repeat, career)
+        out, t = bench(bibtex2html.parse_scholar_profile, html, repeat, career)
+        same = out == out_bs4
+        failed += not same
+        print('%-40s %6d works  bs4 %8.2f ms  lxml %8.2f ms  x%5.1f  %s' % (
+            name, len(out[0]), t_bs4 * 1000, t * 1000, t_bs4 / t if t else 0, 'same' if same else 'DIFFERENT'))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Description: Measure the startup of bibtex2html.py: importing the module, --help, and a small --nc run of
+examples/papers.bib, optionally compared with the script of a previous git revision.
+
+Usage:
+  bench_startup.py [-r <repeat>] [--rev <rev>]
+  bench_startup.py (-h | --help)
+
+Options:
+
+  -h --help                Show this screen.
+  -r --repeat <repeat>     Number of runs of each command. The median time is shown. [default: 10]
+  --rev <rev>              Git revision of bibtex2html/bibtex2html.py to compare with, e.g. HEAD~1.
+
+Examples:
+
+bench_startup.py
+bench_startup.py -r 20 --rev HEAD~1
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+from docopt import docopt
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+script = os.path.join(root, 'bibtex2html', 'bibtex2html.py')
+examples = os.path.join(root, 'examples')
+
+
+def get_commands(script, out_folder):
+    """commands (name, argv) of the benchmark for a script"""
+
+    return [('import', [sys.executable, '-c', 'import sys; sys.path.insert(0, %r); import bibtex2html'
+                        % os.path.dirname(script)]),
+            ('--help', [sys.executable, script, '--help']),
+            ('--nc papers.bib', [sys.executable, script, 'papers.bib', os.path.join(out_folder, 'papers.html'),
+                                 '-c', 'papers.ini', '--nc'])]
+
+
+def bench(argv, repeat):
+    """run argv repeat times. Return the median seconds of a run."""
+
+    times = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(repeat):
+            start = time.time()
+            subprocess.check_call(argv, cwd=examples, stdout=devnull)
+            times.append(time.time() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    args = docopt(__doc__)
+
+    repeat = int(args['--repeat'])
+
+    tmp_folder = tempfile.mkdtemp()
+    try:
+        scripts = [('current', script)]
+        if args['--rev']:
+            # the previous script in its own folder, so that import bibtex2html finds it
+            rev_folder = os.path.join(tmp_folder, 'rev')
+            os.mkdir(rev_folder)
+            rev_script = os.path.join(rev_folder, 'bibtex2html.py')
+            with open(rev_script, 'wb') as f:
+                f.write(subprocess.check_output(['git', 'show', '%s:bibtex2html/bibtex2html.py' % args['--rev']],
+                                                cwd=root))
+            scripts.append((args['--rev'], rev_script))
+
+        results = []
+        for name, path in scripts:
+            results.append([bench(argv, repeat) for _, argv in get_commands(path, tmp_folder)])
+
+        print('%-20s' % 'command' + ''.join('%14s' % name for name, _ in scripts))
+        for i, (command, _) in enumerate(get_commands(script, tmp_folder)):
+            print('%-20s' % command + ''.join('%11.1f ms' % (r[i] * 1000) for r in results))
+    finally:
+        shutil.rmtree(tmp_folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Description: Measure requests per second of bibtex2html.PublicationApp under concurrent load, served by a
+threaded wsgiref server: pages rendered for each request, pages from the LRU cache, and conditional requests
+answered with 304 Not Modified.
+
+Usage:
+  bench_wsgi.py [<bibfile>] [-c <conffile>] [-n <requests>] [--clients <clients>]
+  bench_wsgi.py (-h | --help)
+
+Options:
+
+  -h --help                  Show this screen.
+  -c --conf <conffile>       Configuration file. [default: papers.ini]
+  -n --requests <requests>   Number of requests of each case. [default: 500]
+  --clients <clients>        Number of concurrent clients. [default: 8]
+
+Examples:
+
+bench_wsgi.py
+bench_wsgi.py papers.bib -c papers.ini -n 2000 --clients 16
+
+<bibfile> and <conffile> are relative to the examples folder. Citations are not fetched (--nc).
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+import threading
+
+from docopt import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bibtex2html'))
+import bibtex2html
+
+if bibtex2html.PY2:
+    import httplib as http_client
+    from SocketServer import ThreadingMixIn
+else:
+    import http.client as http_client
+    from socketserver import ThreadingMixIn
+from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples')
+
+
+class Server(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def get_queries(bib_entries):
+    """queries of the benchmark: each author with each style"""
+
+    authors = sorted(set(a for e in bib_entries for a in e['author'].split(', ')))
+    return ['/?author=%s&style=%s' % (a.replace(' ', '+'), s) for a in authors for s in ['type', 'year', 'venue']]
+
+
+def bench(port, paths, requests, clients, etags=None):
+    """send requests GET requests of paths by concurrent clients. Return requests per second and statuses."""
+
+    statuses = {}
+    lock = threading.Lock()
+
+    def client(k):
+        connection = http_client.HTTPConnection('127.0.0.1', port)
+        for i in range(k, requests, clients):
+            path = paths[i % len(paths)]
+            headers = {'If-None-Match': etags[path]} if etags else {}
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            # wsgiref closes the connection after each response
+            connection.close()
+            with lock:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return requests / (time.time() - start), statuses
+
+
+def main():
+    args = docopt(__doc__)
+
+    requests = int(args['--requests'])
+    clients = int(args['--clients'])
+
+    os.chdir(examples)
+    bibfile = args['<bibfile>'] or 'papers.bib'
+    conf = bibtex2html.read_config(args['--conf'], no_citation=True)
+
+    results = []
+    stdout = sys.stdout
+    # writers print a line for each rendered page
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        for name, cache_size, conditional in [('render', 0, False), ('cached', 1024, False),
+                                              ('304 not modified', 1024, True)]:
+            app = bibtex2html.PublicationApp(bibfile, conf, cache_size=cache_size)
+            paths = get_queries(app.corpus[0])
+
+            httpd = make_server('127.0.0.1', 0, app, server_class=Server, handler_class=QuietHandler)
+            thread = threading.Thread(target=httpd.serve_forever)
+            thread.daemon = True
+            thread.start()
+
+            etags = {}
+            for path in paths:
+                connection = http_client.HTTPConnection('127.0.0.1', httpd.server_port)
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                etags[path] = response.getheader('ETag')
+                connection.close()
+
+            rate, statuses = bench(httpd.server_port, paths, requests, clients, etags if conditional else None)
+            results.append((name, rate, statuses, len(paths)))
+
+            httpd.shutdown()
+            httpd.server_close()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print('%d requests of %d clients' % (requests, clients))
+    for name, rate, statuses, queries in results:
+        print('%-20s %8.1f requests/s  %d queries  status %s' % (
+            name, rate, queries, ', '.join('%d: %d' % i for i in sorted(statuses.items()))))
+
+
+if __name__ == '__main__':
+    main()
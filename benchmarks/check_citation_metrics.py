@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Description: Check bibtex2html.get_citation_metrics on entries which match the same paper, e.g. a preprint and
+its journal version matched to one google scholar paper by match_titles, or duplicate entries. Each paper must be
+counted once. The exit status is 1 if metrics differ from the expected ones.
+
+Usage:
+  check_citation_metrics.py
+  check_citation_metrics.py (-h | --help)
+
+Options:
+
+  -h --help                Show this screen.
+"""
+
+from __future__ import print_function
+import os
+import sys
+
+from docopt import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bibtex2html'))
+import bibtex2html
+
+# papers of a google scholar profile {title: [citations, url]}
+scholar_titles = {
+    bibtex2html.clean_title(u'Single- and Multiple-Shell Uniform Sampling Schemes for Diffusion MRI Using '
+                            u'Spherical Codes'): [u'10', u'https://scholar.google.com/citations?paper=1'],
+    bibtex2html.clean_title(u'Optimal Design of Multiple Q-shells experiments for Diffusion MRI'):
+        [u'3', u'https://scholar.google.com/citations?paper=2'],
+}
+
+# (name, entries, expected metrics)
+cases = [
+    ('preprint and journal version', [
+        {'ID': 'preprint', 'year': '2017',
+         'title': u'Single and multiple shell uniform sampling schemes for diffusion MRI using spherical codes'},
+        {'ID': 'journal', 'year': '2018',
+         'title': u'{Single- and Multiple-Shell Uniform Sampling Schemes for Diffusion MRI Using Spherical Codes}'}],
+     {'citations': 10, 'hindex': 1, 'i10index': 1, 'years': {'2018': 10}}),
+    ('duplicate entries', [
+        {'ID': 'a', 'year': '2011', 'title': u'Optimal Design of Multiple Q-shells experiments for Diffusion MRI'},
+        {'ID': 'b', 'year': '2011', 'title': u'Optimal Design of Multiple Q-shells experiments for Diffusion MRI'}],
+     {'citations': 3, 'hindex': 1, 'i10index': 0, 'years': {'2011': 3}}),
+    ('two papers and an entry without citations', [
+        {'ID': 'journal', 'year': '2018',
+         'title': u'Single- and Multiple-Shell Uniform Sampling Schemes for Diffusion MRI Using Spherical Codes'},
+        {'ID': 'a', 'year': '2011', 'title': u'Optimal Design of Multiple Q-shells experiments for Diffusion MRI'},
+        {'ID': 'c', 'year': '2012', 'title': u'A paper which is not in the profile'}],
+     {'citations': 13, 'hindex': 2, 'i10index': 1, 'years': {'2018': 10, '2011': 3}}),
+]
+
+
+def main():
+    docopt(__doc__)
+
+    ctx = {'title_match_threshold': 0.8, 'scholar_cache': ''}
+
+    failed = 0
+    for name, entries, expected in cases:
+        ctx['dict_title'] = bibtex2html.match_titles(entries, {'profile': scholar_titles}, ctx)
+        metrics = bibtex2html.get_citation_metrics(entries, ctx)
+
+        # a snapshot record without url, matched by all entries
+        record = [u'7', u'']
+        ctx_snapshot = {'dict_title': dict((bibtex2html.clean_title(e['title']), record) for e in entries)}
+        metrics_snapshot = bibtex2html.get_citation_metrics(entries, ctx_snapshot)
+        latest = max(e['year'] for e in entries)
+        expected_snapshot = {'citations': 7, 'hindex': 1, 'i10index': 0, 'years': {latest: 7}}
+
+        same = metrics == expected and metrics_snapshot == expected_snapshot
+        failed += not same
+        print('%-45s %s' % (name, 'same' if same else 'DIFFERENT'))
+        if not same:
+            print('  %s, expected %s' % (metrics, expected))
+            print('  snapshot %s, expected %s' % (metrics_snapshot, expected_snapshot))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Description: Check bibtex2html.parse_scholar_profile against recorded google scholar profile pages
+(fixtures/<name>.html) and their expected parsed output (fixtures/<name>.json), which was given by the previous
+BeautifulSoup parser. bs4 is not needed. The exit status is 1 if an output differs.
+
+Usage:
+  check_scholar_parser.py [<fixture_folder>]
+  check_scholar_parser.py (-h | --help)
+
+Options:
+
+  -h --help                Show this screen.
+
+Examples:
+
+check_scholar_parser.py
+
+<fixture_folder> is the fixtures folder next to this script by default. bench_scholar_parser.py compares the
+speed of the two parsers, and needs bs4.
+"""
+
+from __future__ import print_function
+import io
+import os
+import sys
+import json
+
+from docopt import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bibtex2html'))
+import bibtex2html
+
+
+def check(html_file, json_file):
+    """parse html_file. Return a list of differences with the expected output in json_file."""
+
+    with open(html_file, 'rb') as f:
+        dict_title, citations, hindex = bibtex2html.parse_scholar_profile(f.read())
+    with io.open(json_file, 'r', encoding='utf8') as f:
+        expected = json.load(f)
+
+    errors = []
+    for title in sorted(set(dict_title) | set(expected['dict_title'])):
+        if dict_title.get(title) != expected['dict_title'].get(title):
+            errors.append('%s: %s, expected %s' % (title, dict_title.get(title), expected['dict_title'].get(title)))
+    if citations != expected['citations']:
+        errors.append('total citations: %s, expected %s' % (citations, expected['citations']))
+    if hindex != expected['hindex']:
+        errors.append('h-index: %s, expected %s' % (hindex, expected['hindex']))
+    return errors
+
+
+def main():
+    args = docopt(__doc__)
+
+    folder = args['<fixture_folder>'] or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+    failed = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.html'):
+            continue
+        errors = check(os.path.join(folder, name), os.path.join(folder, name[:-5] + '.json'))
+        failed += len(errors) > 0
+        print('%-40s %s' % (name, 'same' if not errors else 'DIFFERENT'))
+        for error in errors:
+            print('  %s' % error)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
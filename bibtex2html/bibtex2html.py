@@ -5,7 +5,9 @@
 Description: Convert bibtex to html.
 
 Usage:
-  bibtex2html.py <bibfile> <htmlfile> [-v <verbose>]  [--conf <conffile>] [-i <input>] [--outbib <outbibfile>] [--nc]
+  bibtex2html.py <bibfile> <htmlfile> [-v <verbose>]  [--conf <conffile>] [-i <input>] [--outbib <outbibfile>] [--nc] [-j <jobs>] [--publish <mode>] [--shard <shard>] [--watch] [--serve <port>]
+  bibtex2html.py <bibfile> <htmlfile> --merge [<shardfolder>...] [-v <verbose>]  [--conf <conffile>] [-i <input>] [--outbib <outbibfile>] [--nc] [--publish <mode>]
+  bibtex2html.py --batch <manifest> [-v <verbose>] [--nc] [-j <jobs>]
   bibtex2html.py (-h | --help)
 
 Options:
@@ -17,6 +19,16 @@ Options:
   -i --input <input>       Input cmd parameters which can override some parameters in -c.
   --outbib <outbibfileb>   Output .bib file with cleaned and selected bib entries
   --nc                     No citation. Don't use google scholar. Same as -i "{'show_citation':'no', 'show_total_citation':False}"
+  -j --jobs <jobs>         Number of processes to write pages in group mode, or to run jobs with --batch (all CPUs if 0).
+  --publish <mode>         Render a group in a staging folder and publish it atomically ('symlink' or 'rename').
+  --shard <shard>          Only write the pages of shard 'i/N' of a group, e.g. 2/4.
+  --watch                  Write the pages again whenever the bib file, the configuration, css or icons change.
+  --serve <port>           Serve the pages on http://localhost:<port>, rendered in memory on request, and reload them
+                           in the browser when the bib file, the configuration, css or icons change.
+  --merge                  Merge the pages of the shards of a group (in <shardfolder>s or <htmlfile>), write index.html,
+                           the bib file and the search index, and check links.
+  --batch <manifest>       Run the jobs (bibfile, output, config, input, outbib, nc) of a .json or .toml manifest
+                           in one process, sharing cleaned entries and citations, and print the time of each job.
 
 Examples:
 
@@ -28,9 +40,20 @@ bibtex2html.py papers.bib papers.html -c papers_conf.ini -i "{'show_paper_style'
 bibtex2html.py papers.bib papers.html -c papers_conf.ini -i "{'show_paper_style':'type_year', 'bulleted_list':'ol_reversed'}"
 bibtex2html.py papers.bib papers.html -c papers_conf.ini -i "{'show_paper_style':'type', 'css_file': 'style.css'}"
 bibtex2html.py papers.bib papers.html -c papers_conf.ini -i "{'show_paper_style':'type', 'selection_and': {'author': ['Jian Cheng'], 'year':[2010,2013] }}"
+bibtex2html.py papers.bib papers.html -c papers_conf.ini -i "{'search_index': True}"
+bibtex2html.py papers.bib papers.html -c papers_conf.ini -i "{'assets': 'vendor'}"
+bibtex2html.py papers.bib papers.html -c papers_conf.ini --nc --watch
+bibtex2html.py papers.bib papers.html -c papers_conf.ini --nc --serve 8000
 
 bibtex2html.py papers.bib papers -c group_conf.ini
 bibtex2html.py papers.bib papers -c group_conf.ini --nc
+bibtex2html.py papers.bib papers -c group_conf.ini --nc -j 4
+bibtex2html.py papers.bib papers -c group_conf.ini --nc --publish symlink
+bibtex2html.py papers.bib papers -c group_conf.ini --nc --shard 1/2
+bibtex2html.py papers.bib papers -c group_conf.ini --nc --merge
+
+bibtex2html.py --batch pages.json
+bibtex2html.py --batch pages.toml --nc -j 4
 
 Author(s): Jian Cheng (jian.cheng.1983@gmail.com)
 """
@@ -41,13 +64,21 @@ import sys
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 
+# modules which are only used by some code paths (google scholar, html parsing of profiles, bibtex parsing and
+# writing, urls of assets) are imported where they are used, so that --help and small runs start quickly.
+# See benchmarks/bench_startup.py.
+
 if PY2:
-    from urllib import FancyURLopener
+    from urlparse import urlparse, urljoin
     import ConfigParser as configparser
+    from HTMLParser import HTMLParser
+    html_unescape = HTMLParser().unescape
+    from collections import Mapping
 else:
-    from urllib.request import FancyURLopener
+    from urllib.parse import urlparse, urljoin
     import configparser
-    import functools
+    from html import unescape as html_unescape
+    from collections.abc import Mapping
 
 
     def unicode(ss):
@@ -55,15 +86,20 @@ else:
 
 import re, os, io
 import shutil
+import copy
+import collections
+import functools
+import threading
 import datetime
-import codecs
+import math
+import time
 import textwrap
-
-from bs4 import BeautifulSoup
-
-import bibtexparser
-
-from docopt import docopt
+import json
+import csv
+import unicodedata
+import hashlib
+import base64
+import mimetypes
 
 import ast
 
@@ -114,14 +150,49 @@ params['show_citation_types'] = [u'article', u'inproceedings', u'phdthesis', u'i
 
 params['author_group'] = {}
 
-#  'no', 'scholar.js' 'bs'
+#  'no', 'scholar.js' 'bs', 'snapshot' (see citation_providers)
 params['show_citation'] = 'no'
+# citation snapshot for show_citation 'snapshot', a .json list or a .csv file of records with keys
+# doi, arxiv, title, citations, url. Entries are matched by doi, then arxiv id, then title.
+params['citation_snapshot'] = ''
+# show total citations, h-index, i10-index and citations by year computed from citations of the entries of each
+# page (also year, venue and category pages of a group), instead of the google scholar profile
+params['citation_metrics'] = False
+# SQLite file to record snapshots of citations of entries, and show their trends as sparklines. '' to disable.
+params['citation_history'] = ''
+# obtained from citation_history:  {entry ID: [[date, citations], ...]}
+params['citation_series'] = {}
 params['show_citation_lb'] = 0  # Show citations only if it is not smaller than the lb threshold.
 # show total citation by googlescholarID using bs
 params['show_total_citation'] = False
 # obtained by googlescholarID by using bs
 params['dict_title'] = {}  # dict of papers:  {title: [citations, url]}
 params['google_scholar_out'] = ()
+# url of google scholar to fetch profiles, e.g. a local server with test pages
+params['scholar_url'] = 'https://scholar.google.com'
+# folder to cache citations of google scholar profiles, '' to disable the cache
+params['scholar_cache'] = ''
+# seconds until a cached profile is fetched again
+params['scholar_cache_ttl'] = 86400
+# use an expired cached profile if fetching the profile fails
+params['scholar_cache_stale'] = True
+# number of works per request of a google scholar profile. Profiles are fetched page by page.
+params['scholar_pagesize'] = 100
+# timeout (seconds) and retries of a request to google scholar. Retries wait backoff * 2^n seconds.
+params['scholar_timeout'] = 30
+params['scholar_retries'] = 3
+params['scholar_backoff'] = 1.0
+# folder to record responses of google scholar, and folder to replay recorded responses without network
+params['scholar_record'] = ''
+params['scholar_replay'] = ''
+# match titles of entries to similar titles of google scholar, if the similarity (Dice coefficient of words)
+# is at least the threshold. > 1 to only use the same titles.
+params['title_match_threshold'] = 0.9
+# number of threads to fetch google scholar profiles of a group
+params['scholar_jobs'] = 4
+# politeness limits per host: concurrent requests, and seconds between the starts of requests
+params['scholar_host_connections'] = 2
+params['scholar_host_interval'] = 1.0
 
 params['show_page_title'] = True
 
@@ -178,6 +249,141 @@ params['add_blank_line_after_item'] = False
 # customized bootstrap if provided
 params['bootstrap_css'] = 'https://maxcdn.bootstrapcdn.com/bootstrap/3.3.7/css/bootstrap.min.css'
 
+# javascript libraries
+params['jquery_js'] = 'https://code.jquery.com/jquery-2.2.0.min.js'
+params['bootstrap_js'] = 'https://maxcdn.bootstrapcdn.com/bootstrap/3.3.7/js/bootstrap.min.js'
+
+# css, javascript and icon resources:
+#  'cdn': remote urls, local files are used in place (copied in group mode)
+#  'vendor': local copies with content-hash fingerprinted file names, which can be cached forever
+#  'inline': self-contained html pages with embedded css, javascript and icons
+params['assets'] = 'cdn'
+# embed icons in html pages as data URIs
+params['inline_icons'] = False
+
+# remove insignificant whitespace in html output (except in <pre>, <script>, <style> and <textarea>)
+params['minify_html'] = False
+
+# client-side search: write an inverted index (title, authors, venue, year) and add a search box to the pages
+params['search_index'] = False
+# index shards are partitioned by the first characters of each token
+params['search_index_prefix_len'] = 2
+# number of entries per document chunk loaded by the browser
+params['search_index_chunk_size'] = 1000
+
+# verbose level
+params['verbose'] = 0
+
+# time of 'Last modified' in the disclaimer: 'now', or 'bibfile' (modification time of the bib file) which
+# doesn't change html pages between runs on the same bib file
+params['disclaimer_time'] = 'now'
+
+# number of processes to write pages in group mode (all CPUs if <= 0)
+params['jobs'] = 1
+
+# group mode: only write pages whose entries or parameters changed since the previous run
+params['incremental'] = False
+
+# group mode: render into a staging folder next to the output folder and publish it atomically.
+# '': write into the output folder directly
+# 'symlink': the output folder is a symlink to the latest build in <folder>_builds, flipped atomically
+# 'rename': the staging folder is renamed to the output folder
+# unchanged files are hard-linked from the previous tree
+params['publish'] = ''
+
+# group mode: only write the pages of shard 'i/N' (1 <= i <= N), e.g. '2/4'.
+# Pages are assigned to shards by the md5 digest of their file names (author, year, venue, category).
+# index.html, the bib file and the search index are written by --merge.
+params['shard'] = ''
+
+# folder to cache cleaned entries of bib files, which can be shared by several runs (e.g. shards)
+params['bib_cache'] = ''
+
+# output of a group
+# 'pages': html pages of each author, year, venue and category
+# 'spa': a single page application. index.html renders the pages in the browser from data.json, which has
+#        each entry once and the entries of each page, with urls like index.html#/Author/Cheng-Jian
+params['group_output'] = 'pages'
+
+# seconds between checks of input files with --watch
+params['watch_interval'] = 1.0
+
+# citation provider kept between builds with --watch or jobs of --batch, see get_citation_provider
+params['citation_provider'] = None
+
+# {output file: bytes} to render output files in memory instead of writing them, see MemoryFile
+params['memory_files'] = None
+
+# don't print progress of writers, e.g. of pages rendered by PublicationApp or Corpus (see log)
+params['quiet'] = False
+
+# parameters which don't change the output, not used to detect changed pages
+context_digest_exclude = ['verbose', 'jobs', 'incremental', 'publish', 'shard', 'bib_cache',
+                          'scholar_url', 'scholar_cache', 'scholar_cache_ttl', 'scholar_cache_stale', 'scholar_jobs',
+                          'scholar_host_connections', 'scholar_host_interval', 'scholar_pagesize', 'scholar_timeout',
+                          'scholar_retries', 'scholar_backoff', 'scholar_record', 'scholar_replay',
+                          'citation_history', 'watch_interval', 'citation_provider',
+                          'memory_files', 'quiet']
+
+# output files, set by make_render_context
+params['bibfile'] = ''
+params['htmlfile_type'] = ''
+params['htmlfile_year'] = ''
+params['htmlfile_venue'] = ''
+params['htmlfile_group'] = ''
+
+
+class RenderContext(Mapping):
+    """Read-only mapping of parameters used by writers and renderers.
+
+    The configuration context is built once (see make_render_context). A page context is derived from it with
+    per-page values (e.g. title, output file, citations), so contexts are never modified during rendering.
+
+    Examples
+    --------
+        ctx = make_render_context(conf)
+        page_ctx = ctx.page(title='Publications of Year 2018', htmlfile_type='Year/2018.html')
+    """
+
+    def __init__(self, values, parent=None):
+        self._values = dict(values)
+        self._parent = parent
+        # relative links shared by all pages of a configuration (see get_link_table)
+        self.link_tables = parent.link_tables if parent is not None else {}
+        self._digest = None
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        if self._parent is not None:
+            return self._parent[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        keys = set(self._values)
+        if self._parent is not None:
+            keys.update(self._parent)
+        return iter(keys)
+
+    def __len__(self):
+        return len(set(self))
+
+    def page(self, **values):
+        """get a context derived from this one with additional or overridden values"""
+
+        return RenderContext(values, self)
+
+    def digest(self):
+        """md5 digest of the values of the context, except context_digest_exclude"""
+
+        if self._digest is None:
+            values = dict((k, v) for k, v in self._values.items() if k not in context_digest_exclude)
+            md5 = hashlib.md5(self._parent.digest().encode('utf-8') if self._parent is not None else b'')
+            md5.update(json.dumps(values, sort_keys=True, default=repr).encode('utf-8'))
+            self._digest = md5.hexdigest()
+        return self._digest
+
+
 # regular expression for \emph{...{...}*...}
 emph = re.compile(u'''
             \\\\emph{                       # \emph{
@@ -245,7 +451,7 @@ def get_journal_short_full_names(sf_names):
     return short_list, full_list
 
 
-def cmp_by_type(y, x):
+def cmp_by_type(y, x, ctx):
     """sort entry by type"""
 
     if x['ENTRYTYPE'] != y['ENTRYTYPE']:
@@ -260,22 +466,22 @@ def cmp_by_type(y, x):
     else:
         if x['ENTRYTYPE'] == 'article':
             x_hl, y_hl = False, False
-            for word in params['journal_fullname_highlighted_lower']:
+            for word in ctx['journal_fullname_highlighted_lower']:
                 if not x_hl and x['journal'].lower().find(word) >= 0:  x_hl = True
                 if not y_hl and y['journal'].lower().find(word) >= 0:  y_hl = True
                 if x_hl or y_hl:
                     break
             if not (x_hl or y_hl):
-                for word in params['journal_shortname_highlighted']:
+                for word in ctx['journal_shortname_highlighted']:
                     if x['journal'].find('(%s)' % word) >= 0:  x_hl = True
                     if y['journal'].find('(%s)' % word) >= 0:  y_hl = True
                     if x_hl or y_hl:
                         break
             if x_hl and not y_hl:  return 1
             if not x_hl and y_hl:  return -1
-        elif x['ENTRYTYPE'] in params['type_conference_paper']:
+        elif x['ENTRYTYPE'] in ctx['type_conference_paper']:
             x_hl, y_hl = False, False
-            for word in params['conference_shortname_highlighted']:
+            for word in ctx['conference_shortname_highlighted']:
                 if x['booktitle'].find(word + "'") >= 0:  x_hl = True
                 if y['booktitle'].find(word + "'") >= 0:  y_hl = True
                 if x_hl or y_hl:
@@ -284,20 +490,20 @@ def cmp_by_type(y, x):
             if not x_hl and y_hl:  return -1
 
         #  same type, both types are highlighted or not highlighted
-        if len(params['author_names_highlighted']):
-            x_hl = is_author_selected(x, params['author_names_highlighted'])
-            y_hl = is_author_selected(y, params['author_names_highlighted'])
+        if len(ctx['author_names_highlighted']):
+            x_hl = is_author_selected(x, ctx['author_names_highlighted'])
+            y_hl = is_author_selected(y, ctx['author_names_highlighted'])
             if x_hl and not y_hl:  return 1
             if not x_hl and y_hl:  return -1
 
         return 1
 
 
-def cmp_by_year(y, x):
+def cmp_by_year(y, x, ctx):
     """sort entry by year"""
 
     if x['year'].isdigit() and y['year'].isdigit():
-        return int(x['year']) - int(y['year']) if int(x['year']) != int(y['year']) else cmp_by_type(y, x)
+        return int(x['year']) - int(y['year']) if int(x['year']) != int(y['year']) else cmp_by_type(y, x, ctx)
     elif x['year'].isdigit() and not y['year'].isdigit():
         return -1
     elif not x['year'].isdigit() and y['year'].isdigit():
@@ -306,50 +512,99 @@ def cmp_by_year(y, x):
         return 1
 
 
-def highlight_author(entry, out_path=''):
+def sort_entries(entries, cmp, ctx):
+    """sort entries by a compare function cmp(y, x, ctx), e.g. cmp_by_type, cmp_by_year"""
+
+    cmp_ctx = functools.partial(cmp, ctx=ctx)
+    if PY2:
+        return sorted(entries, cmp=cmp_ctx)
+    else:
+        return sorted(entries, key=functools.cmp_to_key(cmp_ctx))
+
+
+def get_author_html_name(author):
+    """get html file name (Last-First.html) of an author in author_group"""
+
+    author_split = author.rsplit(' ', 1)
+    if len(author_split) != 2:
+        raise ValueError('author_split should have 2 elements for first and last name')
+    # last-first.html
+    return author_split[1] + '-' + author_split[0].replace(' ', '-') + '.html'
+
+
+def _get_link_table(ctx, out_dir):
+    """compute relative links from folder out_dir to author pages and assets"""
+
+    table = {}
+
+    for name in asset_names:
+        link = ctx['asset_links'].get(name, '')
+        local = os.path.exists(link) or ctx['memory_files'] is not None and link in ctx['memory_files']
+        table[name] = os.path.relpath(link, out_dir) if link and local else link
+
+    if ctx['search_index']:
+        table['search_index_folder'] = os.path.relpath(ctx['search_index_folder'], out_dir)
+
+    table['author'] = {}
+    if len(ctx['author_group']):
+        for author in ctx['author_group'].keys():
+            author_file = os.path.join(ctx['author_group_Author'], get_author_html_name(author))
+            if ctx['group_output'] == 'spa':
+                table['author'][author] = '#/' + get_group_route(author_file, ctx)
+            else:
+                table['author'][author] = os.path.relpath(author_file, out_dir)
+
+    return table
+
+
+def get_link_table(ctx, out_path=''):
+    """get the table of relative links for the folder of out_path. It is computed once per folder."""
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir not in ctx.link_tables:
+        ctx.link_tables[out_dir] = _get_link_table(ctx, out_dir)
+
+    return ctx.link_tables[out_dir]
+
+
+def highlight_author(entry, ctx, out_path=''):
     """return a string with highlighted author"""
 
     authors = entry['author'].split(', ')
 
     authors_new = []
     for p in authors:
-        if len(params['author_group']):
-            if p in params['author_group'].keys():
-                author_split = p.rsplit(' ', 1)
-                if len(author_split) != 2:
-                    raise ValueError('author_split should have 2 elements for first and last name')
-                # last-first.html
-                author_file = os.path.join(params['author_group_Author'],
-                                           author_split[1] + '-' + author_split[0].replace(' ', '-') + '.html')
-                author_file = os.path.relpath(author_file, os.path.dirname(out_path))
-                authors_new.append('<a target="%s" href="%s"><b>%s</b></a>' % (params['target_link'], author_file, p))
+        if len(ctx['author_group']):
+            if p in ctx['author_group'].keys():
+                author_file = get_link_table(ctx, out_path)['author'][p]
+                authors_new.append('<a target="%s" href="%s"><b>%s</b></a>' % (ctx['target_link'], author_file, p))
             else:
                 authors_new.append(p)
         else:
-            if p in params['author_names_highlighted']:
+            if p in ctx['author_names_highlighted']:
                 authors_new.append('<b>%s</b>' % p)
             else:
                 authors_new.append(p)
 
-    if params['show_author_sign']:
+    if ctx['show_author_sign']:
         authorFirst_names = entry['author_first'].split(', ') if 'author_first' in entry else []
         authorCorr_names = entry['author_corresponding'].split(', ') if 'author_corresponding' in entry else []
         if len(authorFirst_names) or len(authorCorr_names):
             for i, name in enumerate(authors):
                 if name in authorFirst_names:
-                    authors_new[i] = authors_new[i] + params['author_sign']['author_first']
+                    authors_new[i] = authors_new[i] + ctx['author_sign']['author_first']
                 if name in authorCorr_names:
-                    authors_new[i] = authors_new[i] + params['author_sign']['author_corresponding']
+                    authors_new[i] = authors_new[i] + ctx['author_sign']['author_corresponding']
 
     return ', '.join(authors_new)
 
 
-def highlight_publisher(publisher):
+def highlight_publisher(publisher, ctx):
     """return a string with highlighted jounrls and conferences"""
 
-    words_highlighted = params['journal_shortname_highlighted'] + params['conference_shortname_highlighted']
+    words_highlighted = ctx['journal_shortname_highlighted'] + ctx['conference_shortname_highlighted']
 
-    if publisher.lower() in params['journal_fullname_highlighted_lower']:
+    if publisher.lower() in ctx['journal_fullname_highlighted_lower']:
         return '<b>%s</b>' % publisher
     else:
         dem_1 = publisher.find('(')
@@ -372,36 +627,867 @@ def remove_shorname_in_publisher(publisher):
     return publisher[:dem_1].strip() if dem_1 > 0 else publisher
 
 
-def get_title_citation_url(scholarID):
+class ScholarFetcher(object):
+    """Fetch pages of google scholar and remote assets (url -> bytes) with keep-alive connections which are reused by
+    each thread, timeouts, and retries with exponential backoff for connection errors and HTTP 429 or 5xx.
+
+    If record, responses are saved in the folder record. If replay, responses are read from the folder replay
+    instead of the network, e.g. to benchmark parsing and the whole pipeline offline.
+    """
+
+    user_agent = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+    def __init__(self, timeout=30, retries=3, backoff=1.0, record='', replay=''):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.record = record
+        self.replay = replay
+        self.local = threading.local()
+
+        if PY2:
+            import httplib as http_client
+        else:
+            import http.client as http_client
+        self.http_client = http_client
+
+    def __call__(self, url):
+        if self.replay:
+            replay_file = self.get_record_file(self.replay, url)
+            if not os.path.exists(replay_file):
+                raise IOError('No recorded response of %s in %s' % (url, self.replay))
+            with open(replay_file, 'rb') as f:
+                return f.read()
+
+        data = self.get(url)
+
+        if self.record:
+            if not os.path.isdir(self.record):
+                try:
+                    os.makedirs(self.record)
+                except OSError:
+                    if not os.path.isdir(self.record):
+                        raise
+            write_file_if_changed(data, self.get_record_file(self.record, url))
+
+        return data
+
+    @staticmethod
+    def get_record_file(folder, url):
+        """file of the recorded response of an url"""
+
+        return os.path.join(folder, hashlib.md5(url.encode('utf-8')).hexdigest() + '.html')
+
+    def get_connection(self, scheme, host):
+        """get the connection to a host of this thread"""
+
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        if (scheme, host) not in self.local.connections:
+            connection = self.http_client.HTTPSConnection if scheme == 'https' else self.http_client.HTTPConnection
+            self.local.connections[(scheme, host)] = connection(host, timeout=self.timeout)
+        return self.local.connections[(scheme, host)]
+
+    def get(self, url, redirects=5):
+        """GET an url with retries. Return the content (bytes)."""
+
+        parts = urlparse(url)
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+        error = None
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt
+            connection = self.get_connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', path, headers={'User-Agent': self.user_agent})
+                response = connection.getresponse()
+                data = response.read()
+            except (IOError, OSError, self.http_client.HTTPException) as e:
+                # e.g. a keep-alive connection closed by the server
+                connection.close()
+                error = e
+            else:
+                if response.status in [301, 302, 303, 307, 308] and redirects > 0:
+                    return self.get(urljoin(url, response.getheader('Location')), redirects - 1)
+                if response.status == 200:
+                    return data
+
+                error = IOError('HTTP error %d: %s' % (response.status, url))
+                if response.status != 429 and response.status < 500:
+                    raise error
+                retry_after = response.getheader('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+
+            if attempt < self.retries:
+                time.sleep(delay)
+
+        raise error
+
+
+def get_scholar_fetcher(ctx):
+    """get a ScholarFetcher with parameters of ctx"""
+
+    return ScholarFetcher(ctx['scholar_timeout'], ctx['scholar_retries'], ctx['scholar_backoff'],
+                          ctx['scholar_record'], ctx['scholar_replay'])
+
+
+class ScholarProfileTarget(object):
+    """lxml parser target which collects cells of a google scholar profile page in a single pass:
+    titles and urls (a.gsc_a_at), citations (a.gsc_a_ac) and total citations, h-index, i10-index (td.gsc_rsb_std).
+    """
+
+    fields = {('a', 'gsc_a_at'): 'titles', ('a', 'gsc_a_ac'): 'citations', ('td', 'gsc_rsb_std'): 'career'}
+
+    def __init__(self):
+        self.titles = []
+        self.urls = []
+        self.citations = []
+        self.career = []
+
+        # field of the open element whose text is collected, depth and number of its child elements
+        self.field = None
+        self.depth = 0
+        self.children = 0
+        self.text = []
+
+    def start(self, tag, attrib):
+        if self.field is not None:
+            self.depth += 1
+            self.children += 1
+            return
+
+        for name in attrib.get('class', '').split():
+            if (tag, name) in self.fields:
+                self.field = self.fields[(tag, name)]
+                self.depth = 0
+                self.children = 0
+                self.text = []
+                if self.field == 'titles':
+                    self.urls.append(attrib.get('href', ''))
+                return
+
+    def end(self, tag):
+        if self.field is None:
+            return
+        if self.depth:
+            self.depth -= 1
+            return
+
+        text = u''.join(self.text)
+        if self.field == 'career':
+            # only cells with text, without child elements
+            if not self.children:
+                self.career.append(text)
+        else:
+            getattr(self, self.field).append(text.strip())
+        self.field = None
+
+    def data(self, data):
+        if self.field is not None:
+            self.text.append(data)
+
+    def close(self):
+        return self
+
+
+def parse_scholar_profile(html, career=True):
+    """parse a google scholar profile page. If not career, total citations and h-index are not parsed,
+    e.g. in pages after the first page of a profile.
+
+    Returns
+    -------
+        dict_title : {title: [citations, url]}
+        citations  : total citations
+        hindex     : h-index
+    """
+
+    from lxml import etree
+
+    parser = etree.HTMLParser(target=ScholarProfileTarget())
+    parser.feed(html.decode('utf-8', 'replace') if isinstance(html, bytes) else html)
+    page = parser.close()
+
+    #  title: [citations, url]
+    dict_out = {}
+    for i, name in enumerate(page.titles):
+        dict_out[clean_title(name)] = [page.citations[i] if page.citations[i] != u'' else u'0',
+                                       u'https://scholar.google.com/%s' % page.urls[i]]
+
+    if not career:
+        return dict_out, u'', u''
+
+    #  (total_citations, h-index, str_out)
+    citations = unicode(page.career[0])
+    hindex = unicode(page.career[2])
+
+    return dict_out, citations, hindex
+
+
+def get_scholar_profile(scholarID, ctx, fetch=None):
+    """get citations of a google scholar profile, using the cache in ctx['scholar_cache'].
+
+    A cached profile is used if it is not older than ctx['scholar_cache_ttl'] seconds, or if fetching or parsing
+    fails and ctx['scholar_cache_stale']. An expired profile is revalidated by fetching all its pages again and
+    comparing their md5 digest with the cached one (no conditional request is sent), and pages identical to the
+    cached ones are not parsed again.
+
+    Parameters
+    ----------
+        scholarID :   google scholar id
+        ctx       :   render context
+        fetch     :   function url -> bytes, get_scholar_fetcher(ctx) by default
+
+    Returns
+    -------
+        dict_title : {title: [citations, url]}
+        citations  : total citations
+        hindex     : h-index
+    """
+
+    if fetch is None:
+        fetch = get_scholar_fetcher(ctx)
+
+    cache = None
+    cache_file = os.path.join(ctx['scholar_cache'], scholarID + '.json') if ctx['scholar_cache'] else ''
+    if cache_file and os.path.exists(cache_file):
+        with io.open(cache_file, 'r', encoding='utf8') as f:
+            cache = json.load(f)
+        if time.time() - cache['time'] < ctx['scholar_cache_ttl']:
+            return cache['dict_title'], cache['citations'], cache['hindex']
+
+    url = ctx['scholar_url'].rstrip('/') + u'/citations?user=%s&hl=en&view_op=list_works&sortby=pubdate' % scholarID
+    pagesize = ctx['scholar_pagesize']
+    try:
+        # fetch pages until a page is not full
+        pages = []
+        while True:
+            html = fetch(url + u'&cstart=%d&pagesize=%d' % (len(pages) * pagesize, pagesize))
+            if pages and html == pages[-1]:
+                break
+            pages.append(html)
+            if html.count(b'class="gsc_a_at"') < pagesize:
+                break
+
+        digest = hashlib.md5(b''.join(pages)).hexdigest()
+        if cache is not None and cache['digest'] == digest:
+            profile = cache['dict_title'], cache['citations'], cache['hindex']
+        else:
+            profile = parse_scholar_profile(pages[0])
+            for html in pages[1:]:
+                profile[0].update(parse_scholar_profile(html, career=False)[0])
+    except Exception as e:
+        # network errors, or pages which can't be parsed, e.g. after a change of google scholar
+        if cache is None or not ctx['scholar_cache_stale']:
+            raise
+        print('Use cached citations of %s, fetching or parsing failed: %s' % (scholarID, e))
+        return cache['dict_title'], cache['citations'], cache['hindex']
+
+    if cache_file:
+        if not os.path.exists(ctx['scholar_cache']):
+            try:
+                os.makedirs(ctx['scholar_cache'])
+            except OSError:
+                # created by another thread
+                if not os.path.isdir(ctx['scholar_cache']):
+                    raise
+        cache = {'time': time.time(), 'digest': digest,
+                 'dict_title': profile[0], 'citations': profile[1], 'hindex': profile[2]}
+        write_file_if_changed(json.dumps(cache, indent=1, sort_keys=True).encode('utf-8'), cache_file)
+
+    return profile
+
+
+def get_title_citation_url(scholarID, ctx, fetch=None):
     """get a dictionary {title: [citations, url]}, total citations, h-index from a given googlescholar id"""
 
     if scholarID is None or scholarID == u'':
         raise ValueError("no googlescholarID")
 
-    openurl = FancyURLopener().open
+    dict_out, citations, hindex = get_scholar_profile(scholarID, ctx, fetch)
+
+    return dict_out, citations, hindex, get_html_scholar_citation(scholarID, citations, hindex, ctx)
+
+
+def get_html_scholar_citation(scholarID, citations, hindex, ctx):
+    """get html string of total citations and h-index of a google scholar profile"""
+
     url0 = u'https://scholar.google.com/citations?user=%s&hl=en' % scholarID
-    url = url0 + u'&view_op=list_works&sortby=pubdate&cstart=0&pagesize=1000'
-    soup = BeautifulSoup(openurl(url).read(), "lxml")
+    return '''<p><big>&#8226;&nbsp;<b>Total Citations</b>: <a target="%s" href='%s'>%s</a> &#8226;&nbsp;  <b>H-Index</b>: <a target="%s" href='%s'>%s</a></big></p>''' % (
+        ctx['target_link_citation'], url0, citations, ctx['target_link_citation'], url0, hindex)
 
-    #  title: [citations, url]
-    soup_all_gsc_a_at = soup.findAll("a", {"class": "gsc_a_at"})
-    title = [unicode(u''.join(i.findAll(text=True))).strip() for i in soup_all_gsc_a_at]
-    title_url = [u'https://scholar.google.com/%s' % i['href'] for i in soup_all_gsc_a_at]
-    citations = [unicode(u''.join(i.findAll(text=True))).strip() for i in soup.findAll("a", {"class": "gsc_a_ac"})]
+
+class HostLimiter(object):
+    """Wrap a fetch function (url -> bytes) with politeness limits per host, for fetching in threads:
+    at most connections concurrent requests, and at least interval seconds between the starts of requests.
+    """
+
+    def __init__(self, fetch, connections=2, interval=1.0):
+        self.fetch = fetch
+        self.connections = max(connections, 1)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def __call__(self, url):
+        host = urlparse(url).netloc
+
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = [threading.Semaphore(self.connections), 0.0]
+            semaphore = self.hosts[host][0]
+
+        with semaphore:
+            with self.lock:
+                start = max(time.time(), self.hosts[host][1] + self.interval)
+                self.hosts[host][1] = start
+            if start > time.time():
+                time.sleep(start - time.time())
+            return self.fetch(url)
+
+
+def get_title_citation_urls(scholarIDs, ctx, fetch=None):
+    """get outputs of get_title_citation_url for several googlescholar ids, fetched concurrently
+    by ctx['scholar_jobs'] threads with politeness limits per host (see HostLimiter).
+
+    Returns
+    -------
+        out_scholar : {scholarID: (dict_title, citations, hindex, str_out)}
+    """
+
+    scholarIDs = sorted(set(i for i in scholarIDs if i))
+    if not scholarIDs:
+        return {}
+
+    fetch = HostLimiter(fetch if fetch is not None else get_scholar_fetcher(ctx),
+                        ctx['scholar_host_connections'], ctx['scholar_host_interval'])
+
+    jobs = min(max(ctx['scholar_jobs'], 1), len(scholarIDs))
+    if jobs == 1:
+        return dict((i, get_title_citation_url(i, ctx, fetch)) for i in scholarIDs)
+
+    import multiprocessing.pool
+
+    pool = multiprocessing.pool.ThreadPool(jobs)
+    try:
+        outs = pool.map(lambda i: get_title_citation_url(i, ctx, fetch), scholarIDs)
+    finally:
+        pool.close()
+        pool.join()
+
+    return dict(zip(scholarIDs, outs))
+
+
+def get_title_match(title, words, index, threshold):
+    """get the most similar title of an index of titles, or '' if the similarity is smaller than threshold.
+
+    Parameters
+    ----------
+        title     :   title to match
+        words     :   {title: set of words} of indexed titles
+        index     :   {word: list of titles} of indexed titles
+        threshold :   minimal Dice coefficient of words of titles. Numbers in titles must be the same.
+
+    Returns
+    -------
+        match : the most similar title (the first in sorted order of equally similar titles), or ''
+        score : Dice coefficient of match, or 0.0
+    """
+
+    tokens = set(get_search_tokens(title))
+    if not tokens:
+        return '', 0.0
+    numbers = set(w for w in tokens if w.isdigit())
+
+    # a title with a Dice coefficient >= threshold has at least min_common words of title, so it has one of
+    # any len(tokens) - min_common + 1 words of title. The least frequent words give the fewest candidates.
+    min_common = max(1, int(math.ceil(threshold * len(tokens) / (2.0 - threshold) - 1e-9)))
+    rare = sorted(tokens, key=lambda w: len(index.get(w, ())))[:len(tokens) - min_common + 1]
+    candidates = set()
+    for w in rare:
+        candidates.update(index.get(w, ()))
+
+    match, match_score = '', -1.0
+    for key in sorted(candidates):
+        if set(w for w in words[key] if w.isdigit()) != numbers:
+            continue
+        score = 2.0 * len(tokens & words[key]) / (len(tokens) + len(words[key]))
+        if score > match_score:
+            match, match_score = key, score
+
+    return (match, match_score) if match_score >= threshold else ('', 0.0)
+
+
+def get_title_index(keys):
+    """index of titles for get_title_match, ({title: set of words}, {word: list of titles})"""
+
+    words = {}
+    index = {}
+    for key in sorted(keys):
+        words[key] = set(get_search_tokens(key))
+        for w in words[key]:
+            index.setdefault(w, []).append(key)
+    return words, index
+
+
+# days after which cached matches of titles which were not used are removed, see get_title_matches
+title_match_cache_days = 30
+
+
+def get_title_matches(titles, dict_title, ctx, cache_name=''):
+    """get the most similar titles of dict_title {title: [citations, url]} for titles (see get_title_match).
+
+    If ctx['scholar_cache'] and cache_name (e.g. a googlescholar id), matches are cached in
+    matches-<cache_name>.json with the titles of dict_title. When dict_title changes, cached matches are only
+    compared with the new titles of dict_title, or matched again if their match was removed. Matches which were
+    not used for title_match_cache_days are removed.
+
+    Returns
+    -------
+        matches : {title: (match, score)}, match is '' if no title is similar enough
+    """
+
+    threshold = ctx['title_match_threshold']
+    keys = set(dict_title)
+
+    cache = {'threshold': threshold, 'keys': [], 'matches': {}}
+    cache_file = ''
+    if ctx['scholar_cache'] and cache_name:
+        cache_file = os.path.join(ctx['scholar_cache'], 'matches-%s.json' % cache_name)
+        if os.path.exists(cache_file):
+            with io.open(cache_file, 'r', encoding='utf8') as f:
+                cached = json.load(f)
+            if cached.get('threshold') == threshold:
+                cache = cached
+
+    # {title: [match, score, day of the last use]}
+    matches = cache['matches']
+    keys_old = set(cache['keys'])
+    added = keys - keys_old
+    removed = keys_old - keys
+
+    today = int(time.time() // 86400)
+    for t in list(matches):
+        if matches[t][0] in removed or today - matches[t][2] > title_match_cache_days:
+            del matches[t]
+
+    # matches of the previous titles are still the most similar of them, unless a new title is more similar
+    if added and matches:
+        words, index = get_title_index(added)
+        for t in matches:
+            match, score = get_title_match(t, words, index, threshold)
+            if match and (score > matches[t][1] or score == matches[t][1] and match < matches[t][0]):
+                matches[t][:2] = [match, score]
+
+    titles_new = [t for t in titles if t not in matches]
+    if titles_new:
+        words, index = get_title_index(keys)
+        for t in titles_new:
+            matches[t] = list(get_title_match(t, words, index, threshold)) + [today]
+
+    for t in titles:
+        matches[t][2] = today
+
+    if cache_file:
+        if not os.path.exists(ctx['scholar_cache']):
+            os.makedirs(ctx['scholar_cache'])
+        cache['keys'] = sorted(keys)
+        write_file_if_changed(json.dumps(cache, indent=1, sort_keys=True).encode('utf-8'), cache_file)
+
+    return dict((t, tuple(matches[t][:2])) for t in titles)
+
+
+def match_titles(bib_entries, dict_titles, ctx):
+    """match titles of bib_entries which are not in dict_titles to similar titles (see get_title_match),
+    e.g. titles with different punctuation, accents or markup.
+
+    Parameters
+    ----------
+        bib_entries :   bib entries
+        dict_titles :   {cache name: dict_title {title: [citations, url]}}, e.g. {googlescholar id: citations of
+                        the profile}. Matches of each dict_title are cached (see get_title_matches).
+        ctx         :   render context
+
+    Returns
+    -------
+        dict_title : dict_titles merged, with matched titles of bib_entries
+    """
 
     dict_out = {}
-    for i, name in enumerate(title):
-        dict_out[clean_title(name)] = [citations[i] if citations[i] != u'' else u'0', title_url[i]]
+    for name in dict_titles:
+        dict_out.update(dict_titles[name])
 
-    #  (total_citations, h-index, str_out)
-    career = soup.findAll("td", {"class": "gsc_rsb_std"}, text=True)
-    citations = unicode(career[0].get_text())
-    hindex = unicode(career[2].get_text())
+    titles = sorted(set(clean_title(e['title']) for e in bib_entries) - set(dict_out))
+    if not titles or not dict_out or ctx['title_match_threshold'] > 1:
+        return dict_out
+
+    # the most similar title of all dict_titles. Like in dict_out, a title of a later dict_title replaces the
+    # same title of a previous one.
+    best = {}
+    for name in dict_titles:
+        for t, (match, score) in get_title_matches(titles, dict_titles[name], ctx, name).items():
+            if match and (t not in best or score > best[t][0] or score == best[t][0] and match <= best[t][1]):
+                best[t] = (score, match, dict_titles[name][match])
+
+    for t in best:
+        dict_out[t] = best[t][2]
+
+    return dict_out
+
+
+def get_citation_metrics(bib_entries, ctx):
+    """compute citation metrics of bib_entries from their citations in ctx['dict_title'].
+
+    Each paper [citations, url] of ctx['dict_title'] is counted once, also if several entries match it, e.g. a
+    preprint and its journal version matched to the same google scholar paper (see match_titles). Papers are
+    identified by their url, or by the record of dict_title if it has no url. Citations of a paper are counted
+    in the latest year of its entries, which is the year of the published version.
+
+    Returns
+    -------
+        metrics : {'citations': total citations, 'hindex': h-index, 'i10index': i10-index,
+                   'years': {year: citations of papers of the year}}
+    """
+
+    # {paper: (citations, year)}
+    papers = {}
+    for e in bib_entries:
+        tt = clean_title(e['title'])
+        if tt not in ctx['dict_title']:
+            continue
+        record = ctx['dict_title'][tt]
+        paper = record[1] or id(record)
+        if paper not in papers or e['year'] > papers[paper][1]:
+            papers[paper] = (int(record[0]), e['year'])
+
+    years = {}
+    for citations, year in papers.values():
+        years[year] = years.get(year, 0) + citations
+
+    # h-index: largest h such that h papers have at least h citations each
+    ranked = sorted((citations for citations, year in papers.values()), reverse=True)
+    hindex = sum(1 for i, c in enumerate(ranked) if c >= i + 1)
+
+    return {'citations': sum(ranked), 'hindex': hindex, 'i10index': sum(1 for c in ranked if c >= 10),
+            'years': years}
+
+
+def get_html_citation_metrics(metrics):
+    """get html string of citation metrics (see get_citation_metrics)"""
+
+    str_out = '<p><big>&#8226;&nbsp;<b>Total Citations</b>: %d &#8226;&nbsp;  <b>H-Index</b>: %d &#8226;&nbsp;  <b>i10-Index</b>: %d</big></p>' % (
+        metrics['citations'], metrics['hindex'], metrics['i10index'])
+
+    if metrics['years']:
+        years = sorted(metrics['years'].keys(), reverse=True)
+        str_out += '\n<p>&#8226;&nbsp;<b>Citations by year</b>: %s</p>' % ' &#8226;&nbsp; '.join(
+            '%s (%d)' % (y, metrics['years'][y]) for y in years)
+
+    return str_out
+
+
+def get_html_total_citation(bib_entries, ctx, show_total_citation=False):
+    """get html string of total citations of a page.
+
+    If ctx['citation_metrics'], metrics are computed from citations of bib_entries (see get_citation_metrics).
+    Otherwise, citations of the google scholar profile ctx['googlescholarID'] are shown if show_total_citation.
+    The trend of citations of bib_entries is shown with ctx['citation_history'].
+    """
+
+    if ctx['citation_metrics'] and ctx['show_citation'] in citation_providers:
+        str_out = get_html_citation_metrics(get_citation_metrics(bib_entries, ctx))
+    elif show_total_citation:
+        str_out = get_html_scholar_citation(ctx['googlescholarID'], ctx['google_scholar_out'][0],
+                                            ctx['google_scholar_out'][1], ctx)
+    else:
+        return ''
+
+    sparkline = get_html_sparkline(get_citation_series_sum(bib_entries, ctx))
+    if sparkline:
+        str_out += '\n<p>&#8226;&nbsp;<b>Citations trend</b>: %s</p>' % sparkline
+    return str_out
+
+
+class CitationProvider(object):
+    """Source of citations of entries for params['show_citation'] (see citation_providers).
+
+    get_citations returns dict_title {title: [citations, url]}, where title is clean_title of the entry title,
+    which is used by get_entry_output, and google_scholar_out (total citations, h-index) or ().
+
+    A provider can be shared by pages with different parameters (e.g. jobs of --batch), so it only returns data.
+    Html is made from the ctx of a page.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def prefetch(self, scholarIDs):
+        """prepare citations of googlescholar ids, e.g. of all authors of a group"""
+
+        pass
+
+    def get_citations(self, bib_entries, scholarIDs=()):
+        """get citations of bib_entries, from googlescholar ids of authors if the provider uses them
+
+        Returns
+        -------
+            dict_title         : {title: [citations, url]}
+            google_scholar_out : (total citations, h-index) of a single googlescholar id, or ()
+        """
+
+        raise NotImplementedError
+
+
+class ScholarProvider(CitationProvider):
+    """citations of google scholar profiles, show_citation 'bs'"""
+
+    def __init__(self, ctx):
+        CitationProvider.__init__(self, ctx)
+        self.scholar_out = {}
+
+    def prefetch(self, scholarIDs):
+        self.scholar_out.update(get_title_citation_urls(
+            [i for i in scholarIDs if i not in self.scholar_out], self.ctx))
+
+    def get_citations(self, bib_entries, scholarIDs=()):
+        scholarIDs = [i for i in scholarIDs if i]
+        for scholarID in scholarIDs:
+            if scholarID not in self.scholar_out:
+                self.scholar_out[scholarID] = get_title_citation_url(scholarID, self.ctx)
+
+        dict_titles = collections.OrderedDict((i, self.scholar_out[i][0]) for i in scholarIDs)
+
+        google_scholar_out = tuple(self.scholar_out[scholarIDs[0]][1:3]) if len(scholarIDs) == 1 else ()
+        return match_titles(bib_entries, dict_titles, self.ctx), google_scholar_out
+
+
+class SnapshotProvider(CitationProvider):
+    """citations of a local snapshot file ctx['citation_snapshot'], show_citation 'snapshot'.
+
+    The snapshot is a .json list or a .csv file of records with keys doi, arxiv, title, citations and url
+    (optional). Records are indexed by doi, arxiv id and title, so no network access is needed.
+    """
+
+    def __init__(self, ctx):
+        CitationProvider.__init__(self, ctx)
+
+        snapshot_file = ctx['citation_snapshot']
+        if not snapshot_file:
+            raise ValueError("show_citation=='snapshot' needs params['citation_snapshot']")
 
-    str_out = '''<p><big>&#8226;&nbsp;<b>Total Citations</b>: <a target="%s" href='%s'>%s</a> &#8226;&nbsp;  <b>H-Index</b>: <a target="%s" href='%s'>%s</a></big></p>''' % (
-        params['target_link_citation'], url0, citations, params['target_link_citation'], url0, hindex)
+        if snapshot_file.lower().endswith('.csv'):
+            with io.open(snapshot_file, 'r', encoding='utf8', newline='') as f:
+                records = list(csv.DictReader(f))
+        else:
+            with io.open(snapshot_file, 'r', encoding='utf8') as f:
+                records = json.load(f)
+
+        self.by_doi = {}
+        self.by_arxiv = {}
+        self.by_title = {}
+        for i, r in enumerate(records):
+            out = [u'%d' % self.get_citations_number(r.get('citations'), snapshot_file, i + 1), r.get('url') or u'']
+            if r.get('doi'):
+                self.by_doi[self.get_doi_key(r['doi'])] = out
+            if r.get('arxiv'):
+                self.by_arxiv[self.get_arxiv_key(r['arxiv'])] = out
+            if r.get('title'):
+                self.by_title[clean_title(r['title'])] = out
+
+    @staticmethod
+    def get_citations_number(citations, snapshot_file, record):
+        """number of citations of a record of a snapshot, e.g. 1234 for '1,234'"""
+
+        if citations is None or citations == u'':
+            return 0
+        try:
+            if isinstance(citations, (int, float)) and int(citations) == citations:
+                number = int(citations)
+            else:
+                number = int(re.sub(r'[\s,_]', u'', unicode(citations)))
+        except ValueError:
+            number = -1
+        if number < 0:
+            raise ValueError("Wrong citations %r of record %d in %s. Must be a number of citations"
+                             % (citations, record, snapshot_file))
+        return number
+
+    @staticmethod
+    def get_doi_key(doi):
+        """normalized doi, without https://doi.org/"""
+
+        doi = doi.strip().lower()
+        return re.sub(r'^(https?://(dx\.)?doi\.org/|doi:)', '', doi)
+
+    @staticmethod
+    def get_arxiv_key(arxivid):
+        """normalized arxiv id, without arxiv: and version"""
+
+        arxivid = arxivid.strip().lower()
+        if arxivid.startswith('arxiv:'):
+            arxivid = arxivid[6:]
+        return re.sub(r'v\d+$', '', arxivid)
+
+    def get_citations(self, bib_entries, scholarIDs=()):
+        dict_title = {}
+        entries_title = []
+        for e in bib_entries:
+            out = None
+            if e.get('doi'):
+                out = self.by_doi.get(self.get_doi_key(e['doi']))
+            if out is None and get_arxivID_from_entry(e):
+                out = self.by_arxiv.get(self.get_arxiv_key(get_arxivID_from_entry(e)))
+            if out is None:
+                entries_title.append(e)
+            else:
+                dict_title[clean_title(e['title'])] = out
+
+        # remaining entries by (similar) titles
+        cache_name = 'snapshot-' + hashlib.md5(os.path.abspath(self.ctx['citation_snapshot']).encode('utf-8')).hexdigest()
+        by_title = match_titles(entries_title, {cache_name: self.by_title}, self.ctx)
+        for e in entries_title:
+            tt = clean_title(e['title'])
+            if tt in by_title:
+                dict_title[tt] = by_title[tt]
+
+        return dict_title, ()
+
+
+class CitationHistory(object):
+    """Local SQLite store of citation snapshots (entry key, date, citations), params['citation_history'].
+
+    A row is written only if the citations of an entry changed since its last snapshot. Trends of entries are
+    read from the store, so they need no network access.
+    """
+
+    def __init__(self, db_file):
+        import sqlite3
+
+        self.db = sqlite3.connect(db_file, timeout=30)
+        self.db.execute('CREATE TABLE IF NOT EXISTS citations '
+                        '(key TEXT NOT NULL, date TEXT NOT NULL, citations INTEGER NOT NULL, PRIMARY KEY (key, date))')
+        self.series = None
+
+    def close(self):
+        self.db.close()
+
+    def get_series(self):
+        """get snapshots of all entries, {key: [[date, citations], ...]} sorted by date"""
+
+        if self.series is None:
+            self.series = {}
+            for key, date, citations in self.db.execute('SELECT key, date, citations FROM citations ORDER BY key, date'):
+                self.series.setdefault(key, []).append([date, citations])
+        return self.series
+
+    def record(self, bib_entries, dict_title, date=None):
+        """record citations of bib_entries in dict_title {title: [citations, url]} at date (today by default).
+
+        Returns
+        -------
+            number of entries whose citations changed
+        """
+
+        date = date or datetime.date.today().isoformat()
+        series = self.get_series()
+
+        rows = []
+        for e in bib_entries:
+            tt = clean_title(e['title'])
+            if tt not in dict_title:
+                continue
+            citations = int(dict_title[tt][0])
+            points = series.setdefault(e['ID'], [])
+            if points and points[-1][1] == citations:
+                continue
+            if points and points[-1][0] == date:
+                points[-1][1] = citations
+            else:
+                points.append([date, citations])
+            rows.append((e['ID'], date, citations))
+
+        if rows:
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO citations VALUES (?, ?, ?)', rows)
+        return len(rows)
+
+
+def get_citation_series(bib_entries, dict_title, ctx):
+    """record citations of bib_entries in ctx['citation_history'] (see CitationHistory)
+
+    Returns
+    -------
+        citation_series : {entry ID: [[date, citations], ...]} of bib_entries, or {} without citation_history
+    """
+
+    if not ctx['citation_history']:
+        return {}
+
+    history = CitationHistory(ctx['citation_history'])
+    try:
+        changed = history.record(bib_entries, dict_title)
+        series = history.get_series()
+    finally:
+        history.close()
+
+    if ctx['verbose']:
+        print('Record %d changed citations in %s' % (changed, ctx['citation_history']))
 
-    return dict_out, citations, hindex, str_out
+    return dict((e['ID'], series[e['ID']]) for e in bib_entries if e['ID'] in series)
+
+
+def get_citation_series_sum(bib_entries, ctx):
+    """get the sum of ctx['citation_series'] of bib_entries, e.g. of an author, [[date, citations], ...]
+
+    The citations of an entry at a date are its last snapshot before the date.
+    """
+
+    # changes of citations at dates
+    deltas = {}
+    keys = set(e['ID'] for e in bib_entries)
+    for key in keys:
+        previous = 0
+        for date, citations in ctx['citation_series'].get(key, ()):
+            deltas[date] = deltas.get(date, 0) + citations - previous
+            previous = citations
+
+    series = []
+    total = 0
+    for date in sorted(deltas):
+        total += deltas[date]
+        series.append([date, total])
+    return series
+
+
+def get_html_sparkline(series, width=60, height=12):
+    """get an inline svg sparkline of citations [[date, citations], ...], or '' with less than 2 snapshots"""
+
+    if len(series) < 2:
+        return ''
+
+    values = [v for _, v in series]
+    lo, hi = min(values), max(values)
+    step = float(width) / (len(values) - 1)
+    points = ' '.join('%.1f,%.1f' % (i * step, height - (float(v - lo) / (hi - lo) * height if hi > lo else height / 2.0))
+                      for i, v in enumerate(values))
+    return '<svg class="sparkline" width="%d" height="%d" viewBox="-1 -1 %d %d"><title>%d to %d citations from %s to %s</title><polyline fill="none" stroke="currentColor" points="%s"/></svg>' % (
+        width, height, width + 2, height + 2, values[0], values[-1], series[0][0], series[-1][0], points)
+
+
+# citation providers of params['show_citation']
+citation_providers = {'bs': ScholarProvider, 'snapshot': SnapshotProvider}
+
+
+def get_citation_provider(ctx):
+    """get the citation provider of ctx['show_citation'], or None if citations are not provided at build time.
+    ctx['citation_provider'] is used if it is set, e.g. to keep citations in memory between builds.
+    """
+
+    if ctx['citation_provider'] is not None:
+        return ctx['citation_provider']
+    if ctx['show_citation'] in citation_providers:
+        return citation_providers[ctx['show_citation']](ctx)
+    return None
 
 
 def get_arxivID_from_entry(entry):
@@ -463,7 +1549,7 @@ def get_wwwlink_from_entry(entry):
         return ''
 
 
-def get_bibtex_from_entry(entry, comma_to_and=False):
+def get_bibtex_from_entry(entry, ctx, comma_to_and=False):
     """Get bibtex string from an entry. Remove some non-standard fields."""
 
     entry2 = entry.copy()
@@ -477,7 +1563,7 @@ def get_bibtex_from_entry(entry, comma_to_and=False):
     e = {}
     keep_list = ['ENTRYTYPE', 'ID']
     for i_str in entry2.keys():
-        if i_str in params['bibtex_show_list'] or i_str in keep_list:
+        if i_str in ctx['bibtex_show_list'] or i_str in keep_list:
             e[i_str] = entry2[i_str]
 
     if 'journal' in e and e['journal']:
@@ -486,18 +1572,20 @@ def get_bibtex_from_entry(entry, comma_to_and=False):
     if 'pages' in e and e['pages']:
         e['pages'] = e['pages'].replace('&ndash;', '-')
 
+    import bibtexparser
+
     bibdata = bibtexparser.bibdatabase.BibDatabase()
     bibdata.entries = [e]
     bibstr = bibtexparser.dumps(bibdata)
     bibstr = remove_empty_lines(bibstr)
 
-    if params['verbose'] >= 2:
+    if ctx['verbose'] >= 2:
         print('bibstr=%s' % bibstr)
 
     return bibstr
 
 
-def get_publisher_shortname_from_entry(entry):
+def get_publisher_shortname_from_entry(entry, ctx):
     """Get shortname for journals or conferences from an entry.
 
     Parameters
@@ -524,7 +1612,7 @@ def get_publisher_shortname_from_entry(entry):
         return pub[dem_1 + 1:dem], True
     else:
         pub_lower = pub.lower()
-        for cp in params['publisher_short_full_names']:
+        for cp in ctx['publisher_short_full_names']:
             if len(cp) == 1:
                 if cp[0].lower() == pub_lower:
                     return cp[0], True
@@ -569,10 +1657,10 @@ def add_empty_fields_in_entry(entry):
             entry['journal'] = journal
 
 
-def add_shortname_in_entry(entry):
+def add_shortname_in_entry(entry, ctx):
     """add shortname for journals and conferences if there is no one."""
 
-    shortname, has_sname = get_publisher_shortname_from_entry(entry)
+    shortname, has_sname = get_publisher_shortname_from_entry(entry, ctx)
     if shortname and not has_sname:
         if 'journal' in entry and entry['journal']:
             entry['journal'] = ''.join([entry['journal'], ' (', shortname, ')'])
@@ -580,11 +1668,11 @@ def add_shortname_in_entry(entry):
             entry['booktitle'] = ''.join([entry['booktitle'], ' (', shortname, ')'])
 
 
-def _get_count_name_number(entries):
+def _get_count_name_number(entries, ctx):
     """get a name list and a list of count numbers from entries"""
 
     count_name = []
-    for name in params['count_publisher']:
+    for name in ctx['count_publisher']:
         if type(name) == list:
             count_name.append(name[0])
         else:
@@ -592,7 +1680,7 @@ def _get_count_name_number(entries):
     count_number = [0] * len(count_name)
 
     for e in entries:
-        name, _ = get_publisher_shortname_from_entry(e)
+        name, _ = get_publisher_shortname_from_entry(e, ctx)
         for i, name1 in enumerate(count_name):
             if name.lower() == name1.lower():
                 count_number[i] += 1
@@ -607,7 +1695,7 @@ def _get_count_name_number(entries):
     return count_name2, count_number2
 
 
-def get_publisher_countnumber_from_entries(entries):
+def get_publisher_countnumber_from_entries(entries, ctx):
     """Get count numbers from entries for specific journals (conferences).
 
     Parameters
@@ -621,14 +1709,14 @@ def get_publisher_countnumber_from_entries(entries):
         count_str :  output string in html format
     """
 
-    count_name, count_number = _get_count_name_number(entries)
+    count_name, count_number = _get_count_name_number(entries, ctx)
 
     if sum(count_number):
         count_str_list = ['<p><big>&#8226;&nbsp;']
         for name, num in zip(count_name, count_number):
             if num > 0:
-                if params['show_paper_style'] == 'venue':
-                    str_count = '''<a href="%s#%s"><b>%s</b> (%s)</a> &#8226;&nbsp;''' % (os.path.basename(params['htmlfile_venue']), name, name, num)
+                if ctx['show_paper_style'] == 'venue':
+                    str_count = '''<a href="%s#%s"><b>%s</b> (%s)</a> &#8226;&nbsp;''' % (os.path.basename(ctx['htmlfile_venue']), name, name, num)
                 else:
                     str_count = '''<b>%s</b> (%s) &#8226;&nbsp;''' % (name, num)
                 count_str_list.append(str_count)
@@ -670,7 +1758,7 @@ def is_entry_selected_by_key(entry, k, v):
         raise ValueError('Wrong selection keys!')
 
 
-def is_entry_selected(entry, selection_and=None, selection_or=None):
+def is_entry_selected(entry, ctx, selection_and=None, selection_or=None):
     """return true if entry is selected
 
     Parameters
@@ -689,9 +1777,9 @@ def is_entry_selected(entry, selection_and=None, selection_or=None):
     """
 
     if selection_and is None:
-        selection_and = params['selection_and']
+        selection_and = ctx['selection_and']
     if selection_or is None:
-        selection_or = params['selection_or']
+        selection_or = ctx['selection_or']
 
     if not selection_and and not selection_or:
         return True
@@ -721,45 +1809,198 @@ def get_anchor_name(name):
         return name.lower().replace(' ', '-')
 
 
-def get_bulleted_list_str():
+def get_bulleted_list_str(ctx):
     """get html string for bulleted list"""
 
-    if params['bulleted_list'] == 'ol':
+    if ctx['bulleted_list'] == 'ol':
         return '<ol>', '</ol>'
-    elif params['bulleted_list'] == 'ul':
+    elif ctx['bulleted_list'] == 'ul':
         return '<ul>', '</ul>'
-    elif params['bulleted_list'] == 'ol_reversed':
+    elif ctx['bulleted_list'] == 'ol_reversed':
         return '<ol reversed>', '</ol>'
     else:
         raise ValueError("Wrong params['bulleted_list']. Must be 'ol', 'ul', 'ol_reversed'")
 
 
-def get_html_prelog(out_path=''):
-    """get prelog in html."""
+# css, javascript and icon resources used in html pages
+asset_names = ['jquery_js', 'bootstrap_css', 'bootstrap_js', 'scholar.js', 'css_file', 'icon_pdf', 'icon_www']
 
-    css_file = os.path.relpath(params['css_file'], os.path.dirname(out_path)) if params['css_file'] and os.path.exists(params['css_file']) else ''
-    bootstrap_css_file = os.path.relpath(params['bootstrap_css'], os.path.dirname(out_path)) if params['bootstrap_css'] and os.path.exists(params['bootstrap_css']) else params['bootstrap_css']
+# html tags to load an asset by a link or with inline content
+asset_tags = {
+    'jquery_js': ('<script type="text/javascript" src="%s"></script>', '<script type="text/javascript">\n%s\n</script>'),
+    'bootstrap_css': ('<link rel="stylesheet" href="%s">', '<style type="text/css">\n%s\n</style>'),
+    'bootstrap_js': ('<script src="%s"></script>', '<script type="text/javascript">\n%s\n</script>'),
+    'scholar.js': ('<script type="text/javascript" src="%s"></script>', '<script type="text/javascript">\n%s\n</script>'),
+    'css_file': ('<link rel="stylesheet" type="text/css" href="%s">', '<style type="text/css">\n%s\n</style>'),
+}
 
-    # html prelog
-    # modify according to your needs
-    prelog = """<!DOCTYPE HTML
-        PUBLIC "-//W3C//DTD HTML 4.01//EN"
-        "https://www.w3.org/TR/html4/strict.dtd">
-    <head>
-    <meta http-equiv=Content-Type content="text/html; charset=%s">
-    <title>%s</title>
 
-    <script type="text/javascript" src="https://code.jquery.com/jquery-2.2.0.min.js"></script>
-    <link rel="stylesheet" href="%s">
-    <script src="https://maxcdn.bootstrapcdn.com/bootstrap/3.3.7/js/bootstrap.min.js"></script>
-    <script type="text/javascript" src="%s"></script>
+def log(ctx, message):
+    """print a progress message of a writer, unless ctx['quiet']"""
 
+    if not ctx['quiet']:
+        print(message)
 
-    <script type="text/javascript">
-        function toggle(showHideDiv, switchTextDiv)
-        {
-        var ele = document.getElementById(showHideDiv);
-        var text = document.getElementById(switchTextDiv);
+
+def is_url(path):
+    """return true if path is an url (or a data URI) instead of a local file"""
+
+    return path.startswith('//') or path.startswith('data:') or '://' in path
+
+
+def read_asset(path, fetch=None):
+    """read an asset from a local file or an url.
+
+    Urls are read by fetch (url -> bytes), a ScholarFetcher by default, which raises IOError for HTTP errors,
+    so that an error page is never used as an asset.
+    """
+
+    if is_url(path):
+        if fetch is None:
+            fetch = ScholarFetcher()
+        return fetch(path if not path.startswith('//') else 'https:' + path)
+    else:
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def write_file_if_changed(data, out_file, memory_files=None):
+    """write data (bytes) to out_file, or keep it in memory_files {out_file: bytes} if it is given (see MemoryFile).
+    Return false if the file already has the same content."""
+
+    f = MemoryFile(out_file, memory_files) if memory_files is not None else OutputFile(out_file)
+    f.write_bytes(data)
+    return f.close()
+
+
+def vendor_asset(path, folder, manifest, memory_files=None, fetch=None):
+    """copy an asset into folder with a fingerprinted file name (name.<hash>.ext), or into memory_files.
+
+    manifest {url: file name} avoids fetching remote assets which were vendored in a previous run.
+    """
+
+    if is_url(path) and path in manifest:
+        vendored_file = os.path.join(folder, manifest[path])
+        if (vendored_file in memory_files) if memory_files is not None else os.path.exists(vendored_file):
+            return vendored_file
+
+    data = read_asset(path, fetch)
+    name, ext = os.path.splitext(os.path.basename(path.split('?')[0].split('#')[0]))
+    if name.endswith('.min'):
+        name, ext = name[:-4], '.min' + ext
+    file_name = '%s.%s%s' % (name, hashlib.md5(data).hexdigest()[:10], ext)
+    write_file_if_changed(data, os.path.join(folder, file_name), memory_files)
+
+    if is_url(path):
+        manifest[path] = file_name
+
+    return os.path.join(folder, file_name)
+
+
+def prepare_assets(conf, static_folder, icons_folder):
+    """prepare css, javascript and icon resources according to conf['assets'].
+
+    Returns
+    -------
+        asset_links  : {name: url, data URI or local file}
+        asset_inline : {name: content}, assets embedded in html pages
+    """
+
+    if conf['assets'] not in ['cdn', 'vendor', 'inline']:
+        raise ValueError("Wrong params['assets']. Must be 'cdn', 'vendor', 'inline'")
+
+    asset_links = {}
+    asset_inline = {}
+
+    # assets are kept in conf['memory_files'] if it is set, e.g. for pages rendered in memory
+    memory_files = conf['memory_files']
+
+    if memory_files is None and (conf['assets'] == 'vendor' or conf['assets'] == 'cdn' and len(conf['author_group'])):
+        for folder in [static_folder, icons_folder]:
+            if not os.path.exists(folder):
+                os.mkdir(folder)
+
+    # remote assets are fetched with timeouts and retries of scholar_*, but never recorded or replayed
+    fetch = ScholarFetcher(conf['scholar_timeout'], conf['scholar_retries'], conf['scholar_backoff'])
+
+    manifest_file = os.path.join(static_folder, 'assets.json')
+    manifest = {}
+    if conf['assets'] == 'vendor' and os.path.exists(manifest_file):
+        with io.open(manifest_file, 'r', encoding='utf8') as f:
+            manifest = json.load(f)
+
+    for name in asset_names:
+        path = conf[name]
+        if not path:
+            continue
+        if name == 'scholar.js' and conf['show_citation'] != 'scholar.js':
+            continue
+        if name == 'css_file' and not os.path.exists(path):
+            continue
+
+        is_icon = name.startswith('icon_')
+        folder = icons_folder if is_icon else static_folder
+        local = not is_url(path) and os.path.exists(path)
+
+        if is_icon and (conf['assets'] == 'inline' or conf['inline_icons']):
+            mime = mimetypes.guess_type(path.split('?')[0])[0] or 'image/gif'
+            data = base64.b64encode(read_asset(path, fetch)).decode('ascii')
+            asset_links[name] = 'data:%s;base64,%s' % (mime, data)
+        elif conf['assets'] == 'inline':
+            content = read_asset(path, fetch).decode('utf-8')
+            if name.endswith('_js') or name == 'scholar.js':
+                content = content.replace('</script', '<\\/script')
+            asset_inline[name] = content
+        elif conf['assets'] == 'vendor' and (local or is_url(path)):
+            asset_links[name] = vendor_asset(path, folder, manifest, memory_files, fetch)
+        elif local and len(conf['author_group']):
+            out_file = os.path.join(folder, os.path.basename(path))
+            with open(path, 'rb') as f:
+                write_file_if_changed(f.read(), out_file, memory_files)
+            asset_links[name] = out_file
+        else:
+            asset_links[name] = path
+
+    if manifest:
+        write_file_if_changed(json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'), manifest_file,
+                              memory_files)
+
+    return asset_links, asset_inline
+
+
+def get_html_asset_tag(name, ctx, out_path=''):
+    """get html tag which loads a css or javascript asset, by a link or with inline content"""
+
+    tag_link, tag_inline = asset_tags[name]
+    if name in ctx['asset_inline']:
+        return tag_inline % ctx['asset_inline'][name]
+    else:
+        return tag_link % get_link_table(ctx, out_path)[name]
+
+
+def get_html_prelog(ctx, out_path=''):
+    """get prelog in html."""
+
+    # html prelog
+    # modify according to your needs
+    prelog = """<!DOCTYPE HTML
+        PUBLIC "-//W3C//DTD HTML 4.01//EN"
+        "https://www.w3.org/TR/html4/strict.dtd">
+    <head>
+    <meta http-equiv=Content-Type content="text/html; charset=%s">
+    <title>%s</title>
+
+    %s
+    %s
+    %s
+    %s
+
+
+    <script type="text/javascript">
+        function toggle(showHideDiv, switchTextDiv)
+        {
+        var ele = document.getElementById(showHideDiv);
+        var text = document.getElementById(switchTextDiv);
         if(ele.style.display == "block")
         {
             ele.style.display = "none";
@@ -771,7 +2012,7 @@ def get_html_prelog(out_path=''):
         }
     </script>
 
-    <link rel="stylesheet" type="text/css" href="%s">
+    %s
     <style type="text/css">
     </style>
 
@@ -781,21 +2022,41 @@ def get_html_prelog(out_path=''):
 
     <div id="content">
     <br>
-    """ % (params['encoding'], params['title'], bootstrap_css_file,
-           params['scholar.js'] if params['show_citation'] == 'scholar.js' else '', css_file)
+    """ % (ctx['encoding'], ctx['title'], get_html_asset_tag('jquery_js', ctx, out_path),
+           get_html_asset_tag('bootstrap_css', ctx, out_path), get_html_asset_tag('bootstrap_js', ctx, out_path),
+           get_html_asset_tag('scholar.js', ctx, out_path), get_html_asset_tag('css_file', ctx, out_path))
 
     return prelog
 
 
-def get_html_disclaimer():
+# user name in the disclaimer, see get_user_name
+user_name = None
+
+
+def get_user_name():
+    """get the user name in the disclaimer, only looked up once"""
+
+    global user_name
+    if user_name is None:
+        import getpass
+        user_name = getpass.getuser()
+    return user_name
+
+
+def get_html_disclaimer(ctx):
     """return str of disclaimer"""
 
-    import time, getpass
+    if ctx['disclaimer_time'] == 'now':
+        last_modified = time.strftime("%Y-%m-%d, %H:%M:%S")
+    elif ctx['disclaimer_time'] == 'bibfile':
+        last_modified = time.strftime("%Y-%m-%d, %H:%M:%S", time.localtime(os.path.getmtime(ctx['bibfile'])))
+    else:
+        raise ValueError("Wrong params['disclaimer_time']. Must be 'now', 'bibfile'")
 
     log_sign = ''
-    if params['show_author_sign']:
+    if ctx['show_author_sign']:
         log_sign = '\n<p>%s denotes co-first authors. %s denotes corresponding authors.</p> \n' % (
-        params['author_sign']['author_first'], params['author_sign']['author_corresponding'])
+        ctx['author_sign']['author_first'], ctx['author_sign']['author_corresponding'])
 
     log_disclaimer = """
 <br><br /><br><br />
@@ -823,11 +2084,96 @@ Last modifiled:  %s
 <a href="https://github.com/JianCheng/bibtex2html.py"><em>bibtex2html.py</em></a>
 </p>
 
-""" % (log_sign, time.strftime("%Y-%m-%d, %H:%M:%S"), getpass.getuser())
+""" % (log_sign, last_modified, get_user_name())
 
     return log_disclaimer
 
 
+def get_html_search_box(ctx, out_path=''):
+    """get html string of a search box which queries the search index in the browser"""
+
+    search_folder = get_link_table(ctx, out_path)['search_index_folder']
+
+    search_box = """
+<div class="search">
+<input type="search" id="search-input" placeholder="Search title, author, venue or year" size="50">
+<ol id="search-results"></ol>
+</div>
+
+<script type="text/javascript">
+(function() {
+    var base = "%s/", plen = %d, csize = %d, cache = {}, seq = 0;
+    var input = document.getElementById('search-input'), ol = document.getElementById('search-results');
+
+    function load(name) {
+        if (!(name in cache)) {
+            cache[name] = fetch(base + name).then(function(r) { return r.ok ? r.json() : {}; }, function() { return {}; });
+        }
+        return cache[name];
+    }
+
+    function terms(q) {
+        q = q.normalize('NFKD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase();
+        return q.split(/[^0-9a-z]+/).filter(function(t) { return t.length >= plen; });
+    }
+
+    function lookup(t) {
+        return load('idx-' + t.slice(0, plen) + '.json').then(function(idx) {
+            var ids = {};
+            for (var k in idx) {
+                if (k.lastIndexOf(t, 0) === 0) {
+                    idx[k].forEach(function(i) { ids[i] = true; });
+                }
+            }
+            return ids;
+        });
+    }
+
+    function show(ids, docs, n) {
+        if (n !== seq) return;
+        ol.innerHTML = '';
+        ids.forEach(function(i) {
+            var d = docs[Math.floor(i / csize)][i %% csize], li = document.createElement('li'), a;
+            li.appendChild(document.createTextNode(d[1] + ', '));
+            a = document.createElement(d[4] ? 'a' : 'span');
+            a.className = 'title';
+            a.textContent = '"' + d[0] + '"';
+            if (d[4]) { a.href = d[4]; a.target = "%s"; }
+            li.appendChild(a);
+            li.appendChild(document.createTextNode(', ' + (d[2] ? d[2] + ', ' : '') + d[3] + '.'));
+            ol.appendChild(li);
+        });
+    }
+
+    input.addEventListener('input', function() {
+        var ts = terms(input.value), n = ++seq;
+        if (!ts.length) {
+            ol.innerHTML = '';
+            return;
+        }
+        Promise.all(ts.map(lookup)).then(function(sets) {
+            var ids = Object.keys(sets[0]).filter(function(i) {
+                return sets.every(function(s) { return i in s; });
+            }).map(Number).sort(function(a, b) { return a - b; }).slice(0, 100);
+            var chunks = {};
+            ids.forEach(function(i) { chunks[Math.floor(i / csize)] = true; });
+            return Promise.all(Object.keys(chunks).map(function(c) {
+                return load('docs-' + c + '.json').then(function(d) { return [c, d]; });
+            })).then(function(loaded) {
+                var docs = {};
+                loaded.forEach(function(cd) { docs[cd[0]] = cd[1]; });
+                show(ids, docs, n);
+            });
+        });
+    });
+})();
+</script>
+""" % (search_folder.replace(os.sep, '/'), ctx['search_index_prefix_len'], ctx['search_index_chunk_size'],
+       ctx['target_link'])
+
+    return search_box
+
+
 def clean_title(title: str):
     """clean title str for better match"""
 
@@ -912,7 +2258,7 @@ def clean_entry(entry):
         entry[k] = v
 
 
-def get_entry_output(entry, out_path=''):
+def get_entry_output(entry, ctx, out_path=''):
     """Get output html string for a bib entry
 
     Parameters
@@ -930,8 +2276,8 @@ def get_entry_output(entry, out_path=''):
 
     # --- author ---
     if 'author' in entry:
-        out.append('<span class="author">%s</span>,' % highlight_author(entry, out_path))
-        if not params['single_line']:
+        out.append('<span class="author">%s</span>,' % highlight_author(entry, ctx, out_path))
+        if not ctx['single_line']:
             out.append('<br>')
 
         out.append('\n')
@@ -941,13 +2287,13 @@ def get_entry_output(entry, out_path=''):
     if 'chapter' in entry:
         chapter = True
         out.append('<span class="title">"%s"</span>,' % entry['chapter'])
-        if not params['single_line']:
+        if not ctx['single_line']:
             out.append('<br>')
 
     # --- title ---
     if not chapter:
         out.append('<span class="title">"%s"</span>,' % entry['title'])
-        if not params['single_line']:
+        if not ctx['single_line']:
             out.append('<br>')
 
     # -- if book chapter --
@@ -961,16 +2307,16 @@ def get_entry_output(entry, out_path=''):
 
     # --- journal or similar ---
     if 'journal' in entry:
-        out.append('<span class="publisher">%s</span>' % highlight_publisher(entry['journal']))
+        out.append('<span class="publisher">%s</span>' % highlight_publisher(entry['journal'], ctx))
     elif 'booktitle' in entry:
         out.append('<span class="publisher">')
-        if entry['ENTRYTYPE'] in params['type_conference_paper']:
-            out.append(highlight_publisher(entry['booktitle']))
+        if entry['ENTRYTYPE'] in ctx['type_conference_paper']:
+            out.append(highlight_publisher(entry['booktitle'], ctx))
         else:
             out.append(entry['booktitle'])
         out.append('</span>')
     elif 'eprint' in entry:
-        out.append('<span class="publisher">%s</span>' % highlight_publisher(entry['eprint']))
+        out.append('<span class="publisher">%s</span>' % highlight_publisher(entry['eprint'], ctx))
     elif entry['ENTRYTYPE'] == 'phdthesis':
         out.append('PhD thesis, %s' % entry['school'])
     elif entry['ENTRYTYPE'] == 'techreport':
@@ -996,54 +2342,52 @@ def get_entry_output(entry, out_path=''):
     # final period
     out.append('.\n')
 
-    if not params['single_line']:
+    if not ctx['single_line']:
         out.append('<br>')
 
     # --- Links ---
 
-    #  if not params['single_line']:
+    #  if not ctx['single_line']:
     #      out.append('<div class="publilinks">\n')
 
     #  pdf
     pdf_link = get_pdflink_from_entry(entry)
     if pdf_link != '':
-        if params['use_icon'] and params['icon_pdf']:
-            icon_pdf_file = params['icon_pdf'] if len(params['author_group']) == 0 else params['author_group_icon_pdf']
-            icon_pdf_file = os.path.relpath(icon_pdf_file, os.path.dirname(out_path))
+        if ctx['use_icon'] and ctx['icon_pdf']:
+            icon_pdf_file = get_link_table(ctx, out_path)['icon_pdf']
             out.append('<a target="%s" href="%s"><img src="%s" alt="[pdf]" style="width: %s; height: %s;"></a>' % (
-            params['target_link'], pdf_link, icon_pdf_file, params['icon_size'], params['icon_size']))
+            ctx['target_link'], pdf_link, icon_pdf_file, ctx['icon_size'], ctx['icon_size']))
         else:
-            out.append('[<a target="%s" href="%s">pdf</a>]' % (params['target_link'], pdf_link))
+            out.append('[<a target="%s" href="%s">pdf</a>]' % (ctx['target_link'], pdf_link))
         out.append('&nbsp;')
 
     #  url, www, doi, hal_id
     href_link = get_wwwlink_from_entry(entry)
     if href_link != '':
         out.append('\n')
-        if not params['use_icon']:
+        if not ctx['use_icon']:
             out.append('[')
-        out.append('<a target="%s" href="%s">' % (params['target_link'], href_link))
-        if params['use_icon'] and params['icon_www']:
-            icon_www_file = params['icon_www'] if len(params['author_group']) == 0 else params['author_group_icon_www']
-            icon_www_file = os.path.relpath(icon_www_file, os.path.dirname(out_path))
+        out.append('<a target="%s" href="%s">' % (ctx['target_link'], href_link))
+        if ctx['use_icon'] and ctx['icon_www']:
+            icon_www_file = get_link_table(ctx, out_path)['icon_www']
             out.append('<img src="%s" alt="[www]" style="width: %s; height: %s;"></a>' % (
-            icon_www_file, params['icon_size'], params['icon_size']))
+            icon_www_file, ctx['icon_size'], ctx['icon_size']))
         else:
             out.append('link</a>')
-        if not params['use_icon']:
+        if not ctx['use_icon']:
             out.append(']')
         out.append('&nbsp;')
 
     bibid = entry['ID']
     bibid = bibid.replace(':', u'-')
     bibid = bibid.replace('.', u'-')
-    show_abstract = params['show_abstract'] and 'abstract' in entry and entry['abstract'] != ''
-    show_bibtex = params['show_bibtex']
+    show_abstract = ctx['show_abstract'] and 'abstract' in entry and entry['abstract'] != ''
+    show_bibtex = ctx['show_bibtex']
 
     # bibtex
     if show_bibtex:
         out.append('\n')
-        if params['use_bootstrap_dialog']:
+        if ctx['use_bootstrap_dialog']:
             out.append('''[<a type="button" data-toggle="modal" data-target="#bib-%s">bibtex</a>]&nbsp;''' % bibid)
         else:
             out.append('''[<a id="blk-%s" href="javascript:toggle('bib-%s', 'blk-%s');">bibtex</a>]&nbsp;''' % (
@@ -1052,49 +2396,54 @@ def get_entry_output(entry, out_path=''):
     #  abstract
     if show_abstract:
         out.append('\n')
-        if params['use_bootstrap_dialog']:
+        if ctx['use_bootstrap_dialog']:
             out.append('''[<a type="button" data-toggle="modal" data-target="#abs-%s">abstract</a>]&nbsp;''' % bibid)
         else:
             out.append('''[<a id="alk-%s" href="javascript:toggle('abs-%s', 'alk-%s');">abstract</a>]&nbsp;''' % (
                 bibid, bibid, bibid))
 
     #  download fields
-    for i_str in params['bibtex_fields_download']:
+    for i_str in ctx['bibtex_fields_download']:
         if i_str in entry and entry[i_str] != '':
             out.append('\n')
             out.append('''[<a target="%s" href="%s">%s</a>]&nbsp;''' % (
-            params['target_link'], entry[i_str] if i_str != 'arxiv' else get_arxivlink_from_entry(entry), i_str))
+            ctx['target_link'], entry[i_str] if i_str != 'arxiv' else get_arxivlink_from_entry(entry), i_str))
 
     #  citation
-    if entry['ENTRYTYPE'] in params['show_citation_types'] and int(entry['year']) <= params['show_citation_year']:
-        if params['show_citation'] == 'no':
+    if entry['ENTRYTYPE'] in ctx['show_citation_types'] and int(entry['year']) <= ctx['show_citation_year']:
+        if ctx['show_citation'] == 'no':
             pass
-        elif params['show_citation'] == 'scholar.js':
+        elif ctx['show_citation'] == 'scholar.js':
             out.append('\n[citations: <span class="scholar" name="%s" with-link="true" target="%s"></span>]&nbsp;' % (
-            entry['title'], params['target_link_citation']))
-        elif params['show_citation'] == 'bs':
+            entry['title'], ctx['target_link_citation']))
+        elif ctx['show_citation'] in citation_providers:
             tt = clean_title(entry['title'])
-            if tt in params['dict_title']:
-                citations_url = params['dict_title'][tt]
-                if int(citations_url[0]) >= params['show_citation_lb']:
-                    out.append('\n[citations: <a target="%s" href="%s">%s</a>]&nbsp;' % (
-                    params['target_link_citation'], citations_url[1], citations_url[0]))
+            if tt in ctx['dict_title']:
+                citations_url = ctx['dict_title'][tt]
+                sparkline = get_html_sparkline(ctx['citation_series'].get(entry['ID'], ()))
+                if sparkline:
+                    sparkline = '&nbsp;' + sparkline
+                if int(citations_url[0]) >= ctx['show_citation_lb'] and not citations_url[1]:
+                    out.append('\n[citations: %s%s]&nbsp;' % (citations_url[0], sparkline))
+                elif int(citations_url[0]) >= ctx['show_citation_lb']:
+                    out.append('\n[citations: <a target="%s" href="%s">%s</a>%s]&nbsp;' % (
+                    ctx['target_link_citation'], citations_url[1], citations_url[0], sparkline))
         else:
             raise ValueError('wrong show_citation')
 
     #  note
-    for i_str in params['bibtex_fields_note']:
+    for i_str in ctx['bibtex_fields_note']:
         if i_str in entry and entry[i_str] != '':
             out.append('\n(<span class="%s">%s</span>)&nbsp;' % (i_str if i_str != 'note' else 'hlnote0', entry[i_str]))
 
     out.append('\n')
-    #  if not params['single_line']:
+    #  if not ctx['single_line']:
     #      out.append('</div>')
 
     if show_bibtex:
         out.append('\n')
-        bibstr = get_bibtex_from_entry(entry, comma_to_and=True)
-        if params['use_bootstrap_dialog']:
+        bibstr = get_bibtex_from_entry(entry, ctx, comma_to_and=True)
+        if ctx['use_bootstrap_dialog']:
             out.append(
                 '''<div class="modal fade" id="bib-%s" role="dialog"><div class="modal-dialog"><div class="modal-content"><div class="modal-header"><button type="button" class="close" data-dismiss="modal">&times;</button><h4 class="modal-title">Bibtex</h4></div><div class="modal-body"> \n<pre>%s</pre> </div><div class="modal-footer"><button type="button" class="btn btn-default" data-dismiss="modal">Close</button></div></div></div></div>''' % (
                 bibid, bibstr))
@@ -1105,7 +2454,7 @@ def get_entry_output(entry, out_path=''):
     #  abstract
     if show_abstract:
         out.append('\n')
-        if params['use_bootstrap_dialog']:
+        if ctx['use_bootstrap_dialog']:
             out.append(
                 '''<div class="modal fade" id="abs-%s" role="dialog"><div class="modal-dialog"><div class="modal-content"><div class="modal-header"><button type="button" class="close" data-dismiss="modal">&times;</button><h4 class="modal-title">Abstract</h4></div><div class="modal-body"> \n<pre>%s</pre> </div><div class="modal-footer"><button type="button" class="btn btn-default" data-dismiss="modal">Close</button></div></div></div></div>''' % (
                 bibid, "\n".join(textwrap.wrap(entry['abstract'], 68))))
@@ -1116,7 +2465,7 @@ def get_entry_output(entry, out_path=''):
     # Terminate the list entry
     out.append('\n</li>')
 
-    if params['add_blank_line_after_item']:
+    if ctx['add_blank_line_after_item']:
         out.append('<br>')
 
     out.append('\n')
@@ -1124,7 +2473,166 @@ def get_entry_output(entry, out_path=''):
     return ''.join(out)
 
 
-def get_categories_of_entries(bib_entries):
+class HtmlMinifier(object):
+    """File-like object which removes insignificant whitespace from html chunks before writing them to a file.
+
+    Whitespace runs are collapsed into one space, except inside <pre>, <script>, <style> and <textarea>.
+    Chunks are processed as they are written. An unfinished tag at the end of a chunk is kept until the next one.
+    """
+
+    re_preserve_open = re.compile(u'<(pre|script|style|textarea)\\b[^>]*>', re.IGNORECASE)
+    re_space = re.compile(u'\\s+')
+
+    def __init__(self, f):
+        self.f = f
+        self.pending = u''
+        self.preserve = None
+        self.last_space = True
+
+    def _write_collapsed(self, text):
+        text = self.re_space.sub(u' ', text)
+        if self.last_space:
+            text = text.lstrip(u' ')
+        if text:
+            self.f.write(text)
+            self.last_space = text.endswith(u' ')
+
+    def _write_verbatim(self, text):
+        if text:
+            self.f.write(text)
+            self.last_space = False
+
+    def write(self, text, final=False):
+        buf = self.pending + text
+        self.pending = u''
+        pos = 0
+        while pos < len(buf):
+            if self.preserve:
+                close_tag = u'</' + self.preserve
+                end = buf.lower().find(close_tag, pos)
+                if end < 0:
+                    keep = 0 if final else min(len(close_tag) - 1, len(buf) - pos)
+                    self._write_verbatim(buf[pos:len(buf) - keep])
+                    self.pending = buf[len(buf) - keep:]
+                    return
+                self._write_verbatim(buf[pos:end])
+                self.preserve = None
+                pos = end
+            else:
+                m = self.re_preserve_open.search(buf, pos)
+                if m:
+                    self._write_collapsed(buf[pos:m.start()])
+                    self._write_verbatim(m.group(0))
+                    self.preserve = m.group(1).lower()
+                    pos = m.end()
+                else:
+                    end = len(buf)
+                    lt = buf.rfind(u'<', pos)
+                    if not final and lt >= 0 and buf.find(u'>', lt) < 0:
+                        end = lt
+                    self._write_collapsed(buf[pos:end])
+                    self.pending = buf[end:]
+                    return
+
+    def close(self):
+        self.write(u'', final=True)
+        return self.f.close()
+
+
+class OutputFile(object):
+    """File-like object which writes text to a temporary file and replaces out_file on close,
+    only if the content changed. Unchanged files keep their modification time (e.g. for rsync and CDN caches).
+    out_file is replaced, never modified in place, so it can be a hard link to a file of a published tree.
+    """
+
+    def __init__(self, out_file, encoding='utf-8'):
+        self.out_file = out_file
+        self.encoding = encoding
+        self.tmp_file = out_file + '.tmp'
+        self.f = open(self.tmp_file, 'wb')
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def write(self, text):
+        self.write_bytes(text.encode(self.encoding))
+
+    def write_bytes(self, data):
+        self.f.write(data)
+        self.md5.update(data)
+        self.size += len(data)
+
+    def close(self):
+        """close the file. Return true if out_file was written, false if it was unchanged."""
+
+        self.f.close()
+
+        if os.path.exists(self.out_file) and os.path.getsize(self.out_file) == self.size:
+            md5 = hashlib.md5()
+            with open(self.out_file, 'rb') as f:
+                for block in iter(functools.partial(f.read, 1 << 20), b''):
+                    md5.update(block)
+            if md5.digest() == self.md5.digest():
+                os.remove(self.tmp_file)
+                return False
+
+        replace_file(self.tmp_file, self.out_file)
+        return True
+
+
+class MemoryFile(object):
+    """File-like object which keeps the content of out_file in files {out_file: bytes} on close instead of
+    writing it, e.g. to serve pages rendered in memory (see PageServer).
+    """
+
+    def __init__(self, out_file, files, encoding='utf-8'):
+        self.out_file = out_file
+        self.files = files
+        self.encoding = encoding
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text.encode(self.encoding))
+
+    def write_bytes(self, data):
+        self.chunks.append(data)
+
+    def close(self):
+        """keep the content. Return true if it differs from the previous content of out_file."""
+
+        data = b''.join(self.chunks)
+        changed = self.files.get(self.out_file) != data
+        self.files[self.out_file] = data
+        return changed
+
+
+def replace_file(src_file, dst_file):
+    """rename src_file to dst_file, replacing dst_file if it exists"""
+
+    if PY2:
+        if os.path.exists(dst_file):
+            os.remove(dst_file)
+        os.rename(src_file, dst_file)
+    else:
+        os.replace(src_file, dst_file)
+
+
+def open_output_file(out_file, ctx, encoding=None):
+    """open an output file for writing, in ctx['memory_files'] if it is set. encoding is ctx['encoding'] if None."""
+
+    encoding = encoding or ctx['encoding']
+    if ctx['memory_files'] is not None:
+        return MemoryFile(out_file, ctx['memory_files'], encoding)
+    return OutputFile(out_file, encoding)
+
+
+def open_html_file(html_file, ctx):
+    """open an html file for writing, with whitespace minification if ctx['minify_html']"""
+
+    f1 = open_output_file(html_file, ctx)
+    return HtmlMinifier(f1) if ctx['minify_html'] else f1
+
+
+def get_categories_of_entries(bib_entries, ctx):
     """get list of caregories of entries, section names, section tags"""
 
     # lists according to publication type
@@ -1149,9 +2657,9 @@ def get_categories_of_entries(bib_entries):
             bookchapterlist.append(e)
         elif e['ENTRYTYPE'] == "article":
             journallist.append(e)
-        elif e['ENTRYTYPE'] in params['type_conference_paper']:
+        elif e['ENTRYTYPE'] in ctx['type_conference_paper']:
             conflist.append(e)
-        elif e['ENTRYTYPE'] in params['type_conference_abstract']:
+        elif e['ENTRYTYPE'] in ctx['type_conference_abstract']:
             abstractlist.append(e)
         elif e['ENTRYTYPE'] == "techreport":
             techreportlist.append(e)
@@ -1171,68 +2679,71 @@ def get_categories_of_entries(bib_entries):
     return paperlists, seclist, secline
 
 
-def write_entries_by_type(bib_entries, show_total_citation=False):
+def write_entries_by_type(bib_entries, ctx, show_total_citation=False):
     """write bib_entries by types (journal, conference, etc.)"""
 
     # create the html file with opted encoding
-    f1 = codecs.open(params['htmlfile_type'], 'w', encoding=params['encoding'])
+    f1 = open_html_file(ctx['htmlfile_type'], ctx)
 
     # write the initial part of the file
-    f1.write(get_html_prelog(params['htmlfile_type']))
+    f1.write(get_html_prelog(ctx, ctx['htmlfile_type']))
 
-    if len(params['author_group']):
+    if len(ctx['author_group']):
         f1.write('''<br />
 <a href="../index.html"><strong> BACK TO INDEX </strong></a>
 <br /><br />\n\n''')
 
-    if params['show_page_title']:
-        f1.write('<h1>%s</h1>\n\n' % params['title'])
+    if ctx['show_page_title']:
+        f1.write('<h1>%s</h1>\n\n' % ctx['title'])
+
+    if ctx['search_index']:
+        f1.write(get_html_search_box(ctx, ctx['htmlfile_type']))
 
-    if show_total_citation:
-        f1.write('%s\n\n' % params['google_scholar_out'][2])
+    html_citation = get_html_total_citation(bib_entries, ctx, show_total_citation)
+    if html_citation:
+        f1.write('%s\n\n' % html_citation)
 
-    if params['show_count_number']:
-        _, _, count_str = get_publisher_countnumber_from_entries(bib_entries)
+    if ctx['show_count_number']:
+        _, _, count_str = get_publisher_countnumber_from_entries(bib_entries, ctx)
         f1.write('%s\n\n' % count_str)
 
     # write list of sections, papers
-    paperlists, seclist, secline = get_categories_of_entries(bib_entries)
+    paperlists, seclist, secline = get_categories_of_entries(bib_entries, ctx)
 
     # write list of sections
-    if len(params['author_group']) == 0:
+    if len(ctx['author_group']) == 0:
         str_year = '''<span style="font-size: 20px;"><a href="%s"><b>Sorted by year</b></a></span> &#8226;&nbsp;''' % os.path.basename(
-            params['htmlfile_year']) if params['htmlfile_year'] else ''
+            ctx['htmlfile_year']) if ctx['htmlfile_year'] else ''
         f1.write('<p><big>&#8226;&nbsp;%s' % str_year)
     for papers, sec, secl in zip(paperlists, seclist, secline):
         strTmp = '''<span style="font-size: 20px;"><a href="%s#%s"><b>%s</b></a></span> &#8226;&nbsp;''' % (
-            os.path.basename(params['htmlfile_type']), get_anchor_name(sec), secl) if papers else ''
+            os.path.basename(ctx['htmlfile_type']), get_anchor_name(sec), secl) if papers else ''
         f1.write(strTmp)
     f1.write('</big></p>\n\n')
 
-    ol_1, ol_2 = get_bulleted_list_str()
+    ol_1, ol_2 = get_bulleted_list_str(ctx)
     # write list according to publication type
     for papers, sec in zip(paperlists, seclist):
         if papers:
             f1.write('<h2><a name="%s"></a>%s</h2>' % (get_anchor_name(sec), sec))
             f1.write('\n%s\n' % ol_1)
-            if PY2:
-                papers = sorted(papers, cmp=cmp_by_year)
-            else:
-                papers = sorted(papers, key=functools.cmp_to_key(cmp_by_year))
+            papers = sort_entries(papers, cmp_by_year, ctx)
             for e in papers:
-                f1.write(get_entry_output(e, params['htmlfile_type']))
+                f1.write(get_entry_output(e, ctx, ctx['htmlfile_type']))
             f1.write('\n%s\n\n\n' % ol_2)
 
-    if len(params['author_group']):
-        f1.write(get_html_disclaimer())
+    if len(ctx['author_group']):
+        f1.write(get_html_disclaimer(ctx))
+
+    f1.write(ctx['afterlog'])
+    changed = f1.close()
 
-    f1.write(params['afterlog'])
-    f1.close()
+    log(ctx, 'Convert %s to %s' % (ctx['bibfile'], ctx['htmlfile_type']))
 
-    print('Convert %s to %s' % (params['bibfile'], params['htmlfile_type']))
+    return {ctx['htmlfile_type']: changed}
 
 
-def write_entries_by_year(bib_entries, show_total_citation=False):
+def write_entries_by_year(bib_entries, ctx, show_total_citation=False):
     """write bib_entries by years."""
 
     year_entries_dict = {}
@@ -1245,31 +2756,35 @@ def write_entries_by_year(bib_entries, show_total_citation=False):
     #  print 'year_entries_dict=', year_entries_dict
 
     # create the html file with opted encoding
-    f1 = codecs.open(params['htmlfile_year'], 'w', encoding=params['encoding'])
+    f1 = open_html_file(ctx['htmlfile_year'], ctx)
 
     # write the initial part of the file
-    f1.write(get_html_prelog(params['htmlfile_year']))
+    f1.write(get_html_prelog(ctx, ctx['htmlfile_year']))
 
-    if params['show_page_title']:
-        f1.write('<h1>%s</h1>\n\n' % params['title'])
+    if ctx['show_page_title']:
+        f1.write('<h1>%s</h1>\n\n' % ctx['title'])
 
-    if show_total_citation:
-        f1.write('%s\n\n' % params['google_scholar_out'][2])
+    if ctx['search_index']:
+        f1.write(get_html_search_box(ctx, ctx['htmlfile_year']))
 
-    if params['show_count_number']:
-        _, _, count_str = get_publisher_countnumber_from_entries(bib_entries)
+    html_citation = get_html_total_citation(bib_entries, ctx, show_total_citation)
+    if html_citation:
+        f1.write('%s\n\n' % html_citation)
+
+    if ctx['show_count_number']:
+        _, _, count_str = get_publisher_countnumber_from_entries(bib_entries, ctx)
         f1.write('%s\n\n' % count_str)
 
-    ol_1, ol_2 = get_bulleted_list_str()
+    ol_1, ol_2 = get_bulleted_list_str(ctx)
     if year_entries_dict:
         years = sorted(year_entries_dict.keys(), reverse=True)
 
         str_type = '''<span style="font-size: 20px;"><a href="%s"><b>Sorted by type</b></a></span> &#8226;&nbsp;''' % os.path.basename(
-            params['htmlfile_type']) if params['htmlfile_type'] else ''
+            ctx['htmlfile_type']) if ctx['htmlfile_type'] else ''
         f1.write('<p><big>&#8226;&nbsp;%s' % str_type)
         for y in years:
             f1.write('''<span style="font-size: 20px;"><a href="%s#year%s"><b>%s</b></a></span> &#8226;&nbsp;''' % (
-                os.path.basename(params['htmlfile_year']), y, y))
+                os.path.basename(ctx['htmlfile_year']), y, y))
         f1.write('</big></p>\n\n')
 
         for y in years:
@@ -1278,468 +2793,1121 @@ def write_entries_by_year(bib_entries, show_total_citation=False):
             f1.write('\n<h2><a name="year%s"></a>%s</h2>\n' % (y, y))
             f1.write('\n%s\n' % ol_1)
             papers = year_entries_dict[y]
-            if PY2:
-                papers = sorted(papers, cmp=cmp_by_type)
-            else:
-                papers = sorted(papers, key=functools.cmp_to_key(cmp_by_type))
+            papers = sort_entries(papers, cmp_by_type, ctx)
             for e in papers:
-                f1.write(get_entry_output(e, params['htmlfile_year']))
+                f1.write(get_entry_output(e, ctx, ctx['htmlfile_year']))
             f1.write('\n%s\n\n\n' % ol_2)
 
-    f1.write(params['afterlog'])
-    f1.close()
+    f1.write(ctx['afterlog'])
+    changed = f1.close()
 
-    print('Convert %s to %s' % (params['bibfile'], params['htmlfile_year']))
+    log(ctx, 'Convert %s to %s' % (ctx['bibfile'], ctx['htmlfile_year']))
 
+    return {ctx['htmlfile_year']: changed}
 
-def write_entries_by_venue(bib_entries, show_total_citation=False):
+
+def write_entries_by_venue(bib_entries, ctx, show_total_citation=False):
     """write bib_entries by venues."""
 
-    count_name, count_number, count_str = get_publisher_countnumber_from_entries(bib_entries)
+    count_name, count_number, count_str = get_publisher_countnumber_from_entries(bib_entries, ctx)
 
     venue_entries_dict = {}
     for name in count_name:
         venue_entries_dict[name] = []
     for e in bib_entries:
-        name_e, _ = get_publisher_shortname_from_entry(e)
+        name_e, _ = get_publisher_shortname_from_entry(e, ctx)
         if name_e and name_e in count_name:
             venue_entries_dict[name_e].append(e)
 
     # create the html file with opted encoding
-    f1 = codecs.open(params['htmlfile_venue'], 'w', encoding=params['encoding'])
+    f1 = open_html_file(ctx['htmlfile_venue'], ctx)
 
     # write the initial part of the file
-    f1.write(get_html_prelog(params['htmlfile_venue']))
+    f1.write(get_html_prelog(ctx, ctx['htmlfile_venue']))
+
+    if ctx['show_page_title']:
+        f1.write('<h1>%s</h1>\n\n' % ctx['title'])
 
-    if params['show_page_title']:
-        f1.write('<h1>%s</h1>\n\n' % params['title'])
+    if ctx['search_index']:
+        f1.write(get_html_search_box(ctx, ctx['htmlfile_venue']))
 
-    if show_total_citation:
-        f1.write('%s\n\n' % params['google_scholar_out'][2])
+    html_citation = get_html_total_citation(bib_entries, ctx, show_total_citation)
+    if html_citation:
+        f1.write('%s\n\n' % html_citation)
 
-    if params['show_count_number']:
+    if ctx['show_count_number']:
         f1.write('%s\n\n' % count_str)
 
-    ol_1, ol_2 = get_bulleted_list_str()
+    ol_1, ol_2 = get_bulleted_list_str(ctx)
     if venue_entries_dict:
         for venue, e_list in venue_entries_dict.items():
             f1.write('\n<h2><a name="%s"></a>%s</h2>\n' % (venue, venue))
             f1.write('\n%s\n' % ol_1)
-            if PY2:
-                e_list = sorted(e_list, cmp=cmp_by_year)
-            else:
-                e_list = sorted(e_list, key=functools.cmp_to_key(cmp_by_year))
+            e_list = sort_entries(e_list, cmp_by_year, ctx)
             for e in e_list:
-                f1.write(get_entry_output(e, params['htmlfile_venue']))
+                f1.write(get_entry_output(e, ctx, ctx['htmlfile_venue']))
             f1.write('\n%s\n\n\n' % ol_2)
 
-    f1.write(params['afterlog'])
-    f1.close()
-
-    print('Convert %s to %s' % (params['bibfile'], params['htmlfile_venue']))
-
-
-def write_entries_group(bib_entries):
-    """write bib_entries by types in a group (journal, conference, etc.)"""
-
-    # copy icons
-    icons_folder = os.path.join(params['htmlfile_group'], 'Icons')
-    params['author_group_Icons'] = icons_folder
-    if not os.path.exists(icons_folder):
-        os.mkdir(icons_folder)
-    if params['icon_www']:
-        params['author_group_icon_www'] = os.path.join(icons_folder, os.path.basename(params['icon_www']))
-        shutil.copyfile(params['icon_www'], params['author_group_icon_www'])
-    if params['icon_pdf']:
-        params['author_group_icon_pdf'] = os.path.join(icons_folder, os.path.basename(params['icon_pdf']))
-        shutil.copyfile(params['icon_pdf'], params['author_group_icon_pdf'])
-
-    # copy css file
-    static_folder = os.path.join(params['htmlfile_group'], 'Static')
-    params['author_group_Static'] = static_folder
-    if not os.path.exists(static_folder):
-        os.mkdir(static_folder)
-    if params['css_file'] and os.path.exists(params['css_file']):
-        params['author_group_css'] = os.path.join(static_folder, os.path.basename(params['css_file']))
-        shutil.copyfile(params['css_file'], params['author_group_css'])
-        params['css_file'] = params['author_group_css']
-    if params['bootstrap_css'] and os.path.exists(params['bootstrap_css']):
-        params['author_group_bootstrap_css'] = os.path.join(static_folder, os.path.basename(params['bootstrap_css']))
-        shutil.copyfile(params['bootstrap_css'], params['author_group_bootstrap_css'])
-        params['bootstrap_css'] = params['author_group_bootstrap_css']
-
-    title = params['title']
-
-    # write entries selected by authors
-    _write_entries_group_author(bib_entries)
-    params['dict_title'] = params['dict_title_group']
-
-    # write complete-bibliography.html
-    params['title'] = title
-    _write_entries_group_complete(bib_entries)
+    f1.write(ctx['afterlog'])
+    changed = f1.close()
 
-    # write complete-bibliography.bib
-    biblio_folder = os.path.join(params['htmlfile_group'], 'Bibliography')
-    params['outbibfile'] = os.path.join(biblio_folder, 'complete-bibliography.bib')
-    write_entries_to_bibfile(bib_entries)
+    log(ctx, 'Convert %s to %s' % (ctx['bibfile'], ctx['htmlfile_venue']))
 
-    # write entries selected by publication venues
-    _write_entries_group_venue(bib_entries)
+    return {ctx['htmlfile_venue']: changed}
 
-    # write entries selected by years
-    _write_entries_group_year(bib_entries)
 
-    # write entries selected by categories
-    _write_entries_group_category(bib_entries)
+def get_pages_group(bib_entries, ctx):
+    """get pages of a group (authors, complete bibliography, venues, years and categories)
 
-    # write index.html
-    params['title'] = title
-    _write_entries_group_index(bib_entries)
+    Returns
+    -------
+        pages     : list of (entries, page_ctx, show_total_citation)
+        group_ctx : ctx with citations of papers of all authors
+    """
 
+    # pages of entries selected by authors, with citations of authors
+    pages, ctx = _get_pages_group_author(bib_entries, ctx)
 
-def _write_entries_group_index(bib_entries):
-    """write bib_entries to a index.html file."""
+    # complete-bibliography.html
+    pages += _get_pages_group_complete(bib_entries, ctx)
 
-    html_file = os.path.join(params['htmlfile_group'], 'index.html')
+    # pages of entries selected by publication venues
+    pages += _get_pages_group_venue(bib_entries, ctx)
 
-    # create the html file with opted encoding
-    f1 = codecs.open(html_file, 'w', encoding=params['encoding'])
+    # pages of entries selected by years
+    pages += _get_pages_group_year(bib_entries, ctx)
 
-    # write the initial part of the file
-    f1.write(get_html_prelog(html_file))
+    # pages of entries selected by categories
+    pages += _get_pages_group_category(bib_entries, ctx)
 
-    if params['show_page_title']:
-        f1.write('<h1>%s</h1>\n\n' % params['title'])
+    return pages, ctx
 
-    #  if params['show_count_number']:
-    #      _, _, count_str = get_publisher_countnumber_from_entries(bib_entries)
-    #      f1.write('%s\n\n' % count_str)
 
-    # selection by year
-    f1.write("""
-<table width="100%">
- <tr><td><h2>Selection by year</h2></td></tr>
-</table>
-""")
+def write_entries_group(bib_entries, ctx):
+    """write bib_entries by types in a group (journal, conference, etc.)
 
-    year_entries_dict = {}
-    for e in bib_entries:
-        if e['year'] in year_entries_dict:
-            year_entries_dict[e['year']].append(e)
-        else:
-            year_entries_dict[e['year']] = [e]
+    If ctx['incremental'], only pages whose entries or parameters changed since the previous run are written,
+    and pages of groups which disappeared are removed (see GroupManifest).
+    """
 
-    years = sorted(year_entries_dict.keys(), reverse=True)
-    f1.write('\n\n<br /><table align="center" cellpadding="4" cellspacing="2">\n')
-    for ii in range(len(years)):
-        if ii % 9 and ii != 0:
-            f1.write('<td><a href="Year/%s.html">%s</a></td>\n' % (years[ii], years[ii]))
-        else:
-            if ii:
-                f1.write('</tr>\n')
-            f1.write('<tr align="left" valign="top">\n<td><a href="Year/%s.html">%s</a></td>\n' % (years[ii], years[ii]))
-    f1.write('</tr>\n </table><br />\n\n')
+    pages, ctx = get_pages_group(bib_entries, ctx)
+
+    if ctx['group_output'] == 'spa':
+        if ctx['shard']:
+            raise ValueError("params['shard'] is not supported with params['group_output'] 'spa'")
+        return write_entries_group_spa(bib_entries, pages, ctx)
+    elif ctx['group_output'] != 'pages':
+        raise ValueError("Wrong params['group_output']. Must be 'pages', 'spa'")
+
+    for folder in ['Author', 'Category', 'Venue', 'Year']:
+        if not os.path.exists(ctx['author_group_' + folder]):
+            os.mkdir(ctx['author_group_' + folder])
+
+    # only pages of this shard. index.html and the bib file are written by merge_shards
+    shard = get_shard(ctx['shard'])
+    if shard:
+        pages = [page for page in pages if get_page_shard(page[1]['htmlfile_type'], ctx, shard[1]) == shard[0]]
+        manifest = GroupManifest(ctx['htmlfile_group'], bib_entries, enabled=ctx['incremental'],
+                                 file_name='.bibtex2html-manifest-shard-%d-%d.json' % shard)
+    else:
+        manifest = GroupManifest(ctx['htmlfile_group'], bib_entries, enabled=ctx['incremental'])
 
-    # selection by category
-    seclist = ['Preprints', 'Books', 'Book Chapters', 'Journal Articles', 'Conference Articles', 'Conference Abstracts',
-               'Research Reports', 'Theses', 'Miscellaneous']
-    file_names = [os.path.join(params['author_group_Category'], get_anchor_name(secName) + '.html') for secName in seclist]
-    categories_print = [''] * len(file_names)
-    for ii in range(len(file_names)):
-        if os.path.exists(file_names[ii]):
-            categories_print[ii] = '<td><a href="%s">%s</a></td>' % (
-               os.path.relpath(file_names[ii], os.path.dirname(html_file)), seclist[ii])
+    # find changed files, remove files of groups which disappeared
+    bib_ctx = ctx.page(outbibfile=os.path.join(ctx['author_group_Bibliography'], 'complete-bibliography.bib'))
+    bib_changed = not shard and manifest.is_changed(bib_ctx['outbibfile'], bib_entries, bib_ctx)
+    pages_changed = [page for page in pages if manifest.is_changed(page[1]['htmlfile_type'], *page)]
+    index_file = os.path.join(ctx['htmlfile_group'], 'index.html')
+    index_changed = not shard and manifest.is_changed(index_file, bib_entries, ctx)
+    manifest.remove_files(ctx)
 
-    categories_print = [cat for cat in categories_print if cat != '']
-    if len(categories_print) < 9:
-        categories_print += [''] * (9 - len(categories_print))
+    written = {}
 
-    f1.write("""
-<table width="100%%">
- <tr><td><h2>Selection by category</h2></td></tr>
-</table>
+    # write complete-bibliography.bib
+    if bib_changed:
+        written.update(write_entries_to_bibfile(bib_entries, bib_ctx))
 
+    written.update(write_pages(pages_changed, ctx['jobs']))
 
-<br /><table align="center" cellpadding="4" cellspacing="2">
-<tr align="left" valign="top">
-%s
-%s
-%s
-</tr>
-<tr align="left" valign="top">
-%s
-%s
-%s
-</tr>
-<tr align="left" valign="top">
-%s
-%s
-%s
-</tr>
-</table><br />\n\n\n
-""" % tuple(cat for cat in categories_print))
-    #  f1.write('\n\n\n')
+    # write index.html, after the pages it links to
+    if index_changed:
+        written.update(_write_entries_group_index(bib_entries, ctx))
 
-    # selection by venue
-    f1.write("""
-<table width="100%%">
- <tr><td><h2>Selection by selected venues</h2></td></tr>
-</table>
+    manifest.save()
 
+    if shard:
+        written.update(write_shard_list(pages, bib_entries, ctx, shard))
 
-<table align="center" cellpadding="3" cellspacing="1">
-<tr align="left" valign="top">\n""")
+    if ctx['incremental']:
+        log(ctx, 'Write %d of %d pages in %s (%d unchanged, %d removed)' % (
+            len(pages_changed), len(pages), ctx['htmlfile_group'], len(pages) - len(pages_changed),
+            len(manifest.removed)))
 
-    count_name, count_number = _get_count_name_number(bib_entries)
-    for ii in range(len(count_name)):
-        f1.write('<td><a href="Venue/%s.html"><b>%s</b> (%s)</a></td>\n' % (
-            count_name[ii], count_name[ii], count_number[ii]))
+    return written
 
-        if not (ii + 1) % 3:
-            f1.write('</tr>\n<tr align="left" valign="top">\n')
 
-    f1.write('''</tr>
-</table>
-<br />\n\n\n''')
+def get_group_route(html_file, ctx):
+    """get the route (e.g. Author/Cheng-Jian) of a page of a group in a single page application"""
 
-    # selection by author
-    author_list = [None] * 26
-    for author in params['author_group'].keys():
-        author_split = author.rsplit(' ', 1)
-        jj = ord(author_split[1][0].lower()) - ord('a')
-        if author_list[jj] is None:
-            author_list[jj] = [author]
-        else:
-            author_list[jj].append(author)
+    return os.path.splitext(os.path.relpath(html_file, ctx['htmlfile_group']))[0].replace(os.sep, '/')
 
-    f1.write("""
-<table width="100%%">
- <tr><td><h2>Selection by author</h2></td></tr>
-</table>
 
+def write_entries_group_spa(bib_entries, pages, ctx):
+    """write a group as a single page application (params['group_output'] 'spa').
 
-<br /><table align="center" cellpadding="4" cellspacing="4">
-<tr align="center">\n""")
+    Each entry is rendered once in data.json, with the entries of each page of the group.
+    index.html shows the selections of the group and renders pages in the browser for urls like
+    index.html#/Year/2017, or index.html#/Year/2017/journal-articles for a section.
+    """
 
-    for ii in range(26):
-        out_str = chr(65 + ii)
-        if author_list[ii] is not None:
-            out_str = '<a href="#AUTH%s">%s</a>' % (out_str, out_str)
-        f1.write('<td><b>%s</b></td>\n' % out_str)
-        if not (ii + 1) % 13:
-            f1.write('</tr>\n<tr align="center">\n')
+    html_file = os.path.join(ctx['htmlfile_group'], 'index.html')
+    data_file = os.path.join(ctx['htmlfile_group'], 'data.json')
 
-    f1.write('</table><br />\n\n\n')
+    written = {}
 
-    f1.write('<table align="center" cellpadding="3" cellspacing="1">\n')
-    for ii in range(26):
-        if author_list[ii] is not None:
+    # write complete-bibliography.bib
+    bib_ctx = ctx.page(outbibfile=os.path.join(ctx['author_group_Bibliography'], 'complete-bibliography.bib'))
+    written.update(write_entries_to_bibfile(bib_entries, bib_ctx))
 
-            out_str = chr(65 + ii)
-            f1.write('<tr align="left" valign="top">\n<td>%s</td>\n' % out_str)
+    # entries sorted by year, so entries of a page sorted by their index are sorted by year
+    entries = sort_entries(bib_entries, cmp_by_year, ctx)
+    index = dict((id(e), ii) for ii, e in enumerate(entries))
 
-            for jj in range(len(author_list[ii])):
+    paperlists, seclist, secline = get_categories_of_entries(entries, ctx)
+    section = [0] * len(entries)
+    for ii in range(len(paperlists)):
+        for e in paperlists[ii]:
+            section[index[id(e)]] = ii
+
+    data = {'sections': [[sec, secl, get_anchor_name(sec)] for sec, secl in zip(seclist, secline)],
+            'list': list(get_bulleted_list_str(ctx)),
+            'entries': [get_entry_output(e, ctx, html_file) for e in entries],
+            'section': section,
+            'pages': {}}
+
+    for page_entries, page_ctx, show_total_citation in pages:
+        head = ''
+        if page_ctx['show_page_title']:
+            head += '<h1>%s</h1>\n\n' % page_ctx['title']
+        html_citation = get_html_total_citation(page_entries, page_ctx, show_total_citation)
+        if html_citation:
+            head += '%s\n\n' % html_citation
+        if page_ctx['show_count_number']:
+            _, _, count_str = get_publisher_countnumber_from_entries(page_entries, page_ctx)
+            head += '%s\n\n' % count_str
+
+        data['pages'][get_group_route(page_ctx['htmlfile_type'], ctx)] = {
+            'title': page_ctx['title'], 'head': head, 'entries': sorted(index[id(e)] for e in page_entries)}
+
+    data_str = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    f1 = open_output_file(data_file, ctx)
+    f1.write_bytes(data_str.encode('utf-8'))
+    written[data_file] = f1.close()
+
+    # index.html, with links to pages replaced by routes
+    categories = [seclist[ii] for ii in range(len(paperlists)) if len(paperlists[ii])]
+    group_index = get_html_group_index(bib_entries, ctx, categories)
+    group_index = re.sub(r'href="((?:Author|Bibliography|Category|Venue|Year)/[^"]*)\.html"', r'href="#/\1"',
+                         group_index)
+
+    f1 = open_html_file(html_file, ctx)
+
+    f1.write(get_html_prelog(ctx, html_file))
+
+    if ctx['search_index']:
+        f1.write(get_html_search_box(ctx, html_file))
+
+    f1.write('<div id="group-index">\n')
+    if ctx['show_page_title']:
+        f1.write('<h1>%s</h1>\n\n' % ctx['title'])
+    f1.write(group_index)
+    f1.write('</div>\n\n<div id="group-page"></div>\n')
 
-                str_tag = '<a name="AUTH%s"></a>' % out_str
-                author_split = author_list[ii][jj].rsplit(' ', 1)
-                str_author = author_split[1] + '-' + author_split[0].replace(' ', '-') + '.html'
-                f1.write('<td>%s<a href="Author/%s">%s <strong>%s</strong></a></td>\n' % (
-                    str_tag if jj == 0 else '', str_author, author_split[0], author_split[1]))
+    f1.write("""
+<script type="text/javascript">
+(function() {
+    var index = document.getElementById('group-index'), page = document.getElementById('group-page');
+    var title = document.title, data = null;
+
+    function load() {
+        if (!data) {
+            data = fetch("data.json").then(function(r) { return r.json(); });
+        }
+        return data;
+    }
+
+    function render(d, route, anchor) {
+        var p = d.pages[route], html = '<br />\\n<a href="#/"><strong> BACK TO INDEX </strong></a>\\n<br /><br />\\n\\n';
+        if (!p) {
+            page.innerHTML = html + '<p>Page ' + route + ' not found.</p>';
+            return;
+        }
+        var lists = d.sections.map(function() { return []; });
+        p.entries.forEach(function(i) { lists[d.section[i]].push(d.entries[i]); });
+
+        html += p.head + '<p><big>&#8226;&nbsp;';
+        d.sections.forEach(function(s, k) {
+            if (lists[k].length) {
+                html += '<span style="font-size: 20px;"><a href="#/' + route + '/' + s[2] + '"><b>' + s[1] +
+                        '</b></a></span> &#8226;&nbsp;';
+            }
+        });
+        html += '</big></p>\\n\\n';
+        d.sections.forEach(function(s, k) {
+            if (lists[k].length) {
+                html += '<h2><a name="' + s[2] + '"></a>' + s[0] + '</h2>\\n' + d.list[0] + '\\n' +
+                        lists[k].join('') + '\\n' + d.list[1] + '\\n\\n\\n';
+            }
+        });
+        page.innerHTML = html;
+        document.title = p.title;
+
+        var a = anchor && document.getElementsByName(anchor)[0];
+        if (a) {
+            a.scrollIntoView();
+        } else {
+            window.scrollTo(0, 0);
+        }
+    }
+
+    function route() {
+        var hash = decodeURIComponent(location.hash.slice(1)), parts = hash.split('/');
+        if (parts[0] !== '' || parts.length < 3) {
+            index.style.display = '';
+            page.style.display = 'none';
+            document.title = title;
+            return;
+        }
+        index.style.display = 'none';
+        page.style.display = '';
+        load().then(function(d) { render(d, parts[1] + '/' + parts[2], parts[3]); });
+    }
+
+    window.addEventListener('hashchange', route);
+    route();
+})();
+</script>
+""")
 
-                if not (jj + 1) % 4:
-                    f1.write('</tr>\n<tr align="left" valign="top">\n')
+    f1.write(get_html_disclaimer(ctx))
 
-    f1.write('''</tr>
-</table>
-<br />\n\n\n''')
+    f1.write(ctx['afterlog'])
+    written[html_file] = f1.close()
 
-    # write Complete bibliography
-    f1.write("""
-<table width="100%%">
- <tr><td><h2>Complete bibliography</h2></td></tr>
-</table>
+    log(ctx, 'Convert %s to %s' % (ctx['bibfile'], html_file))
 
+    return written
 
-<br /><table align="center" cellpadding="4" cellspacing="2">
-<tr align="left" valign="top">
-<td><a href="Bibliography/complete-bibliography.html">Complete bibliography as a single HTML page</a>
-</td>
-</tr>
-<tr align="left" valign="top">
-<td><a href="Bibliography/complete-bibliography.bib">Complete bibliography as a single BIBTEX file</a>
-</td>
-</tr>
-</table><br />\n\n\n""")
 
-    f1.write(get_html_disclaimer())
+class GroupManifest(object):
+    """Dependency manifest of the output files of a group, for incremental builds.
 
-    # afterlog
-    f1.write(params['afterlog'])
-    f1.close()
+    The manifest (.bibtex2html-manifest.json in the group folder) maps each output file to a digest of
+    the entries and the parameters (render context) it depends on. A file is changed if its digest differs
+    from the previous run, if it is missing, or if bibtex2html.py itself changed.
+    Files of the previous run which are not part of this run (e.g. a venue without entries) are removed by
+    remove_files(ctx).
+    """
 
-    print('Convert %s to %s' % (params['bibfile'], html_file))
+    file_name = '.bibtex2html-manifest.json'
 
+    def __init__(self, folder, bib_entries, enabled=True, file_name=''):
+        self.folder = folder
+        self.enabled = enabled
+        self.files = {}
+        self.removed = []
+        if file_name:
+            self.file_name = file_name
 
-def _write_entries_group_year(bib_entries):
-    """write bib_entries by types for different years."""
+        self.generator = get_generator_digest()
 
-    year_folder = os.path.join(params['htmlfile_group'], 'Year')
-    params['author_group_Year'] = year_folder
-    if not os.path.exists(year_folder):
-        os.mkdir(year_folder)
+        self.previous = {}
+        manifest_file = os.path.join(folder, self.file_name)
+        if enabled and os.path.exists(manifest_file):
+            with io.open(manifest_file, 'r', encoding='utf8') as f:
+                manifest = json.load(f)
+            if manifest.get('generator') == self.generator:
+                self.previous = manifest['files']
 
-    year_entries_dict = {}
-    for e in bib_entries:
-        if e['year'] in year_entries_dict:
-            year_entries_dict[e['year']].append(e)
-        else:
-            year_entries_dict[e['year']] = [e]
+        # digest of each entry, computed once
+        self.entry_digests = {}
+        for e in bib_entries:
+            self.entry_digests[id(e)] = hashlib.md5(json.dumps(e, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get_digest(self, entries, ctx, show_total_citation=False):
+        """digest of the entries and the parameters of an output file"""
+
+        md5 = hashlib.md5(ctx.digest().encode('utf-8'))
+        md5.update(str(bool(show_total_citation)).encode('utf-8'))
+        for e in entries:
+            md5.update(self.entry_digests[id(e)].encode('utf-8'))
+        return md5.hexdigest()
+
+    def is_changed(self, out_file, entries, ctx, show_total_citation=False):
+        """return true if out_file needs to be written, and record its new digest"""
+
+        name = os.path.relpath(out_file, self.folder).replace(os.sep, '/')
+        if not self.enabled:
+            self.files[name] = ''
+            return True
+
+        digest = self.get_digest(entries, ctx, show_total_citation)
+        self.files[name] = digest
+        return self.previous.get(name) != digest or not os.path.exists(out_file)
+
+    def remove_files(self, ctx):
+        """remove output files of the previous run which are not part of this run. Removed files are logged
+        with log(ctx, ...)."""
+
+        for name in sorted(set(self.previous) - set(self.files)):
+            out_file = os.path.join(self.folder, name)
+            if os.path.exists(out_file):
+                os.remove(out_file)
+                self.removed.append(out_file)
+                log(ctx, 'Remove %s' % out_file)
+
+    def save(self):
+        """write the manifest. A manifest of a previous run is removed if incremental builds are disabled."""
+
+        manifest_file = os.path.join(self.folder, self.file_name)
+        if not self.enabled:
+            if os.path.exists(manifest_file):
+                os.remove(manifest_file)
+            return
+
+        manifest = {'generator': self.generator, 'files': self.files}
+        write_file_if_changed(json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'), manifest_file)
+
+
+def get_generator_digest():
+    """md5 digest of bibtex2html.py, to detect outputs and caches of a different version"""
+
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def get_entries_digest(bib_entries):
+    """md5 digest of bib entries"""
+
+    md5 = hashlib.md5()
+    for e in bib_entries:
+        md5.update(json.dumps(e, sort_keys=True).encode('utf-8'))
+    return md5.hexdigest()
+
+
+def get_shard(shard):
+    """parse params['shard'] 'i/N'. Return (i, N), or None if shard is empty."""
+
+    if not shard:
+        return None
+
+    match = re.match(r'^\s*(\d+)\s*/\s*(\d+)\s*$', shard)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise ValueError("Wrong params['shard']. Must be 'i/N' with 1 <= i <= N")
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_page_shard(html_file, ctx, num_shards):
+    """get the shard (1, ..., num_shards) of a page of a group, by the md5 digest of its file name in the group"""
+
+    name = os.path.relpath(html_file, ctx['htmlfile_group']).replace(os.sep, '/')
+    return int(hashlib.md5(name.encode('utf-8')).hexdigest(), 16) % num_shards + 1
+
+
+def get_shard_list_name(shard):
+    """file name of the list of pages of a shard in the group folder"""
+
+    return '.bibtex2html-shard-%d-%d.json' % shard
+
+
+def write_shard_list(pages, bib_entries, ctx, shard):
+    """write the list of pages of a shard, which is read by merge_shards"""
+
+    shard_list = {'generator': get_generator_digest(), 'entries': get_entries_digest(bib_entries),
+                  'shard': shard[0], 'shards': shard[1],
+                  'files': sorted(os.path.relpath(page[1]['htmlfile_type'], ctx['htmlfile_group']).replace(os.sep, '/')
+                                  for page in pages)}
+
+    out_file = os.path.join(ctx['htmlfile_group'], get_shard_list_name(shard))
+    changed = write_file_if_changed(json.dumps(shard_list, indent=1, sort_keys=True).encode('utf-8'), out_file)
+
+    log(ctx, 'Write shard %d/%d (%d pages) to %s' % (shard[0], shard[1], len(pages), ctx['htmlfile_group']))
+
+    return {out_file: changed}
+
+
+def read_shard_lists(folder, bib_entries):
+    """read the lists of pages of all shards in a group folder, and check that the shards are complete
+    and were written by the same bibtex2html.py from the same entries.
+
+    Returns
+    -------
+        files : list of files of all shards, relative to folder
+    """
+
+    shard_lists = {}
+    for name in os.listdir(folder):
+        if re.match(r'^\.bibtex2html-shard-\d+-\d+\.json$', name):
+            with io.open(os.path.join(folder, name), 'r', encoding='utf8') as f:
+                shard_list = json.load(f)
+            shard_lists[(shard_list['shard'], shard_list['shards'])] = shard_list
+
+    num_shards = set(shard[1] for shard in shard_lists)
+    if len(num_shards) != 1:
+        raise ValueError('Cannot merge shards in %s. Found shards %s' % (folder, sorted(shard_lists)))
+    num_shards = num_shards.pop()
+    missing = [i for i in range(1, num_shards + 1) if (i, num_shards) not in shard_lists]
+    if missing:
+        raise ValueError('Cannot merge shards in %s. Missing shards %s of %d' % (folder, missing, num_shards))
+
+    generator = get_generator_digest()
+    entries = get_entries_digest(bib_entries)
+    files = []
+    for shard in sorted(shard_lists):
+        shard_list = shard_lists[shard]
+        if shard_list['generator'] != generator or shard_list['entries'] != entries:
+            raise ValueError('Cannot merge shards in %s. Shard %d/%d was written by a different bibtex2html.py '
+                             'or bib file' % ((folder,) + shard))
+        files += shard_list['files']
+
+    return files
+
+
+def link_folder(src_folder, dst_folder):
+    """hard-link (or copy if hard links are not supported) all files of src_folder into dst_folder.
+    Existing files of dst_folder are replaced, not modified in place.
+    """
+
+    for root, dirs, files in os.walk(src_folder):
+        dst_root = os.path.join(dst_folder, os.path.relpath(root, src_folder))
+        if not os.path.exists(dst_root):
+            os.mkdir(dst_root)
+        for name in files:
+            if name.endswith('.tmp'):
+                continue
+            src_file = os.path.join(root, name)
+            dst_file = os.path.join(dst_root, name)
+            if os.path.exists(dst_file) and os.path.samefile(src_file, dst_file):
+                continue
+
+            tmp_file = dst_file + '.tmp' if os.path.exists(dst_file) else dst_file
+            try:
+                os.link(src_file, tmp_file)
+            except (OSError, AttributeError):
+                shutil.copy2(src_file, tmp_file)
+            if tmp_file != dst_file:
+                replace_file(tmp_file, dst_file)
+
+
+def check_group_links(folder):
+    """check that the targets of relative links (href, src) in html files of a group folder exist.
+
+    Returns
+    -------
+        missing : list of (html file, link) of missing link targets in folder
+    """
+
+    missing = []
+    folder_abs = os.path.abspath(folder)
+    for root, dirs, files in os.walk(folder):
+        for name in sorted(files):
+            if not name.endswith('.html'):
+                continue
+            html_file = os.path.join(root, name)
+            with io.open(html_file, 'r', encoding='utf8', errors='replace') as f:
+                links = re.findall(r'(?:href|src)\s*=\s*["\']([^"\']*)["\']', f.read())
+            for link in links:
+                path = link.split('#')[0].split('?')[0]
+                if not path or ':' in path or path.startswith('/'):
+                    continue
+                target = os.path.abspath(os.path.join(root, path))
+                if target.startswith(folder_abs + os.sep) and not os.path.exists(target):
+                    missing.append((html_file, link))
+
+    return missing
+
+
+def merge_shards(bib_entries, ctx, shard_folders=None):
+    """merge the pages of the shards of a group (see params['shard']) and write index.html,
+    the bib file and the search index of the group.
+
+    Parameters
+    ----------
+        bib_entries   :   selected entries, the same as the entries of the shards
+        ctx           :   render context of the group
+        shard_folders :   group folders written by the shards, which are linked into ctx['htmlfile_group'].
+                          If empty, the shards were written in ctx['htmlfile_group'].
+
+    Returns
+    -------
+        written : {output file: True if written, False if unchanged}
+    """
+
+    if not len(ctx['author_group']):
+        raise ValueError("Cannot merge shards without params['author_group']")
+
+    folder = ctx['htmlfile_group']
+
+    # lists of pages of previous runs are replaced by the lists of shard_folders
+    if shard_folders:
+        for name in os.listdir(folder):
+            if re.match(r'^\.bibtex2html-shard-\d+-\d+\.json$', name):
+                os.remove(os.path.join(folder, name))
+        for shard_folder in shard_folders:
+            link_folder(shard_folder, folder)
+
+    files = set(read_shard_lists(folder, bib_entries))
+    missing = [name for name in sorted(files) if not os.path.exists(os.path.join(folder, name))]
+    if missing:
+        raise ValueError('Cannot merge shards in %s. Missing pages %s' % (folder, missing))
+
+    # remove pages which are not in any shard
+    for sub_folder in ['Author', 'Bibliography', 'Category', 'Venue', 'Year']:
+        if not os.path.isdir(ctx['author_group_' + sub_folder]):
+            continue
+        for name in sorted(os.listdir(ctx['author_group_' + sub_folder])):
+            if name.endswith('.html') and '%s/%s' % (sub_folder, name) not in files:
+                os.remove(os.path.join(ctx['author_group_' + sub_folder], name))
+                log(ctx, 'Remove %s' % os.path.join(ctx['author_group_' + sub_folder], name))
+
+    written = {}
+
+    if ctx['outbibfile']:
+        written.update(write_entries_to_bibfile(bib_entries, ctx))
+
+    if ctx['search_index']:
+        written.update(write_search_index(bib_entries, ctx))
+
+    bib_ctx = ctx.page(outbibfile=os.path.join(ctx['author_group_Bibliography'], 'complete-bibliography.bib'))
+    written.update(write_entries_to_bibfile(bib_entries, bib_ctx))
+    written.update(_write_entries_group_index(bib_entries, ctx))
+
+    missing = check_group_links(folder)
+    for html_file, link in missing:
+        log(ctx, 'Missing link target %s in %s' % (link, html_file))
+    if missing:
+        raise ValueError('Cannot merge shards in %s. %d missing link targets' % (folder, len(missing)))
+
+    log(ctx, 'Merge %d pages in %s' % (len(files), folder))
+
+    return written
+
+
+# pages inherited by a worker process of write_pages
+_worker_pages = []
+
+
+def _init_page_worker(pages):
+    """initialize a worker process of write_pages"""
+
+    global _worker_pages
+    _worker_pages = pages
+
+
+def _write_page(i):
+    """write the i-th page in a worker process of write_pages"""
+
+    entries, page_ctx, show_total_citation = _worker_pages[i]
+    return write_entries_by_type(entries, page_ctx, show_total_citation)
+
+
+def write_pages(pages, jobs=1):
+    """write pages by write_entries_by_type.
+
+    Parameters
+    ----------
+        pages :   list of (entries, page_ctx, show_total_citation)
+        jobs  :   number of processes. If jobs > 1, pages are written in a process pool.
+                  Pages are inherited by forked processes (copy-on-write) instead of being sent to them.
+                  If jobs <= 0, use all CPUs.
+
+    Returns
+    -------
+        written : {html file: True if written, False if unchanged}
+    """
+
+    import multiprocessing
+
+    written = {}
+    if jobs <= 0:
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(pages))
+
+    if jobs <= 1:
+        for entries, page_ctx, show_total_citation in pages:
+            written.update(write_entries_by_type(entries, page_ctx, show_total_citation))
+        return written
+
+    # largest pages first for better load balance
+    pages = sorted(pages, key=lambda page: len(page[0]), reverse=True)
+
+    if hasattr(multiprocessing, 'get_context') and 'fork' in multiprocessing.get_all_start_methods():
+        mp = multiprocessing.get_context('fork')
+    else:
+        mp = multiprocessing
+
+    pool = mp.Pool(jobs, initializer=_init_page_worker, initargs=(pages,))
+    try:
+        for written_page in pool.imap_unordered(_write_page, range(len(pages))):
+            written.update(written_page)
+    finally:
+        pool.close()
+        pool.join()
+
+    return written
+
+
+def _write_entries_group_index(bib_entries, ctx):
+    """write bib_entries to a index.html file."""
+
+    html_file = os.path.join(ctx['htmlfile_group'], 'index.html')
+
+    # create the html file with opted encoding
+    f1 = open_html_file(html_file, ctx)
+
+    # write the initial part of the file
+    f1.write(get_html_prelog(ctx, html_file))
+
+    if ctx['show_page_title']:
+        f1.write('<h1>%s</h1>\n\n' % ctx['title'])
+
+    if ctx['search_index']:
+        f1.write(get_html_search_box(ctx, html_file))
+
+    #  if ctx['show_count_number']:
+    #      _, _, count_str = get_publisher_countnumber_from_entries(bib_entries, ctx)
+    #      f1.write('%s\n\n' % count_str)
+
+    f1.write(get_html_group_index(bib_entries, ctx))
+
+    f1.write(get_html_disclaimer(ctx))
+
+    # afterlog
+    f1.write(ctx['afterlog'])
+    changed = f1.close()
+
+    log(ctx, 'Convert %s to %s' % (ctx['bibfile'], html_file))
+
+    return {html_file: changed}
+
+
+def get_html_group_index(bib_entries, ctx, categories=None):
+    """get html string of the selections by year, category, venue and author in index.html of a group.
+
+    categories : names of categories with pages. If None, categories whose pages exist.
+    """
+
+    html_file = os.path.join(ctx['htmlfile_group'], 'index.html')
+
+    f1 = io.StringIO()
+
+    # selection by year
+    f1.write("""
+<table width="100%">
+ <tr><td><h2>Selection by year</h2></td></tr>
+</table>
+""")
+
+    year_entries_dict = {}
+    for e in bib_entries:
+        if e['year'] in year_entries_dict:
+            year_entries_dict[e['year']].append(e)
+        else:
+            year_entries_dict[e['year']] = [e]
+
+    years = sorted(year_entries_dict.keys(), reverse=True)
+    f1.write('\n\n<br /><table align="center" cellpadding="4" cellspacing="2">\n')
+    for ii in range(len(years)):
+        if ii % 9 and ii != 0:
+            f1.write('<td><a href="Year/%s.html">%s</a></td>\n' % (years[ii], years[ii]))
+        else:
+            if ii:
+                f1.write('</tr>\n')
+            f1.write('<tr align="left" valign="top">\n<td><a href="Year/%s.html">%s</a></td>\n' % (years[ii], years[ii]))
+    f1.write('</tr>\n </table><br />\n\n')
+
+    # selection by category
+    seclist = ['Preprints', 'Books', 'Book Chapters', 'Journal Articles', 'Conference Articles', 'Conference Abstracts',
+               'Research Reports', 'Theses', 'Miscellaneous']
+    file_names = [os.path.join(ctx['author_group_Category'], get_anchor_name(secName) + '.html') for secName in seclist]
+    categories_print = [''] * len(file_names)
+    for ii in range(len(file_names)):
+        if os.path.exists(file_names[ii]) if categories is None else seclist[ii] in categories:
+            categories_print[ii] = '<td><a href="%s">%s</a></td>' % (
+               os.path.relpath(file_names[ii], os.path.dirname(html_file)), seclist[ii])
+
+    categories_print = [cat for cat in categories_print if cat != '']
+    if len(categories_print) < 9:
+        categories_print += [''] * (9 - len(categories_print))
+
+    f1.write("""
+<table width="100%%">
+ <tr><td><h2>Selection by category</h2></td></tr>
+</table>
+
+
+<br /><table align="center" cellpadding="4" cellspacing="2">
+<tr align="left" valign="top">
+%s
+%s
+%s
+</tr>
+<tr align="left" valign="top">
+%s
+%s
+%s
+</tr>
+<tr align="left" valign="top">
+%s
+%s
+%s
+</tr>
+</table><br />\n\n\n
+""" % tuple(cat for cat in categories_print))
+    #  f1.write('\n\n\n')
+
+    # selection by venue
+    f1.write("""
+<table width="100%%">
+ <tr><td><h2>Selection by selected venues</h2></td></tr>
+</table>
+
+
+<table align="center" cellpadding="3" cellspacing="1">
+<tr align="left" valign="top">\n""")
+
+    count_name, count_number = _get_count_name_number(bib_entries, ctx)
+    for ii in range(len(count_name)):
+        f1.write('<td><a href="Venue/%s.html"><b>%s</b> (%s)</a></td>\n' % (
+            count_name[ii], count_name[ii], count_number[ii]))
+
+        if not (ii + 1) % 3:
+            f1.write('</tr>\n<tr align="left" valign="top">\n')
+
+    f1.write('''</tr>
+</table>
+<br />\n\n\n''')
+
+    # selection by author
+    author_list = [None] * 26
+    for author in ctx['author_group'].keys():
+        author_split = author.rsplit(' ', 1)
+        jj = ord(author_split[1][0].lower()) - ord('a')
+        if author_list[jj] is None:
+            author_list[jj] = [author]
+        else:
+            author_list[jj].append(author)
+
+    f1.write("""
+<table width="100%%">
+ <tr><td><h2>Selection by author</h2></td></tr>
+</table>
+
+
+<br /><table align="center" cellpadding="4" cellspacing="4">
+<tr align="center">\n""")
+
+    for ii in range(26):
+        out_str = chr(65 + ii)
+        if author_list[ii] is not None:
+            out_str = '<a href="#AUTH%s">%s</a>' % (out_str, out_str)
+        f1.write('<td><b>%s</b></td>\n' % out_str)
+        if not (ii + 1) % 13:
+            f1.write('</tr>\n<tr align="center">\n')
+
+    f1.write('</table><br />\n\n\n')
+
+    f1.write('<table align="center" cellpadding="3" cellspacing="1">\n')
+    for ii in range(26):
+        if author_list[ii] is not None:
+
+            out_str = chr(65 + ii)
+            f1.write('<tr align="left" valign="top">\n<td>%s</td>\n' % out_str)
+
+            for jj in range(len(author_list[ii])):
+
+                str_tag = '<a name="AUTH%s"></a>' % out_str
+                author_split = author_list[ii][jj].rsplit(' ', 1)
+                str_author = get_author_html_name(author_list[ii][jj])
+                f1.write('<td>%s<a href="Author/%s">%s <strong>%s</strong></a></td>\n' % (
+                    str_tag if jj == 0 else '', str_author, author_split[0], author_split[1]))
+
+                if not (jj + 1) % 4:
+                    f1.write('</tr>\n<tr align="left" valign="top">\n')
+
+    f1.write('''</tr>
+</table>
+<br />\n\n\n''')
+
+    # write Complete bibliography
+    f1.write("""
+<table width="100%%">
+ <tr><td><h2>Complete bibliography</h2></td></tr>
+</table>
+
+
+<br /><table align="center" cellpadding="4" cellspacing="2">
+<tr align="left" valign="top">
+<td><a href="Bibliography/complete-bibliography.html">Complete bibliography as a single HTML page</a>
+</td>
+</tr>
+<tr align="left" valign="top">
+<td><a href="Bibliography/complete-bibliography.bib">Complete bibliography as a single BIBTEX file</a>
+</td>
+</tr>
+</table><br />\n\n\n""")
+
+    return f1.getvalue()
+
+
+def _get_pages_group_year(bib_entries, ctx):
+    """get pages of bib_entries by types for different years."""
+
+    year_folder = ctx['author_group_Year']
+
+    year_entries_dict = {}
+    for e in bib_entries:
+        if e['year'] in year_entries_dict:
+            year_entries_dict[e['year']].append(e)
+        else:
+            year_entries_dict[e['year']] = [e]
 
     #  print 'year_entries_dict=', year_entries_dict
 
+    pages = []
     for year, entries in year_entries_dict.items():
         html_file = os.path.join(year_folder, str(year) + '.html')
-        params['htmlfile_type'] = html_file
-        params['title'] = 'Publications of Year %s' % year
+        page_ctx = ctx.page(htmlfile_type=html_file, title='Publications of Year %s' % year)
 
-        write_entries_by_type(entries, show_total_citation=False)
+        pages.append((entries, page_ctx, False))
 
+    return pages
 
-def _write_entries_group_venue(bib_entries):
-    """write bib_entries by types for different publication venues."""
 
-    folder = os.path.join(params['htmlfile_group'], 'Venue')
-    params['author_group_Venue'] = folder
-    if not os.path.exists(folder):
-        os.mkdir(folder)
+def _get_pages_group_venue(bib_entries, ctx):
+    """get pages of bib_entries by types for different publication venues."""
 
-    count_name, count_number = _get_count_name_number(bib_entries)
+    folder = ctx['author_group_Venue']
+
+    count_name, count_number = _get_count_name_number(bib_entries, ctx)
 
     venue_entries_dict = {}
     for e in bib_entries:
-        name_e, _ = get_publisher_shortname_from_entry(e)
+        name_e, _ = get_publisher_shortname_from_entry(e, ctx)
         if name_e and name_e in count_name:
             if name_e in venue_entries_dict:
                 venue_entries_dict[name_e].append(e)
             else:
                 venue_entries_dict[name_e] = [e]
 
+    pages = []
     for venue, e_list in venue_entries_dict.items():
         html_file = os.path.join(folder, venue + '.html')
-        params['htmlfile_type'] = html_file
-        params['title'] = 'Publications in %s' % venue
+        page_ctx = ctx.page(htmlfile_type=html_file, title='Publications in %s' % venue)
 
-        write_entries_by_type(e_list, show_total_citation=False)
+        pages.append((e_list, page_ctx, False))
 
+    return pages
 
-def _write_entries_group_author(bib_entries):
-    """write bib_entries by types for different authors."""
 
-    author_folder = os.path.join(params['htmlfile_group'], 'Author')
-    params['author_group_Author'] = author_folder
-    if not os.path.exists(author_folder):
-        os.mkdir(author_folder)
+def get_author_scholarID(value):
+    """get googlescholar id of an author in author_group, {'ScholarID': id}"""
 
-    params['dict_title_group'] = {}
-    for author, value in params['author_group'].items():
+    googlescholarID = ''
+    for k, v in value.items():
+        googlescholarID = v if k.lower() == 'scholarid' else ''
+    return googlescholarID
 
-        author_split = author.rsplit(' ', 1)
-        if len(author_split) != 2:
-            raise ValueError('author_split should have 2 elements for first and last name')
-        # last-first.html
-        html_file = os.path.join(author_folder, author_split[1] + '-' + author_split[0].replace(' ', '-') + '.html')
-        params['htmlfile_type'] = html_file
-        params['title'] = 'Publications of %s' % author
+
+def _get_pages_group_author(bib_entries, ctx):
+    """get pages of bib_entries by types for different authors.
+
+    Returns
+    -------
+        pages     : list of (entries, page_ctx, show_total_citation)
+        group_ctx : ctx with citations of papers of all authors, dict_title {title: [citations, url]} and
+                    citation_series
+    """
+
+    author_folder = ctx['author_group_Author']
+
+    # fetch citations of all authors, e.g. google scholar profiles concurrently
+    provider = get_citation_provider(ctx)
+    scholarIDs = [get_author_scholarID(v) for v in ctx['author_group'].values()]
+    if provider:
+        provider.prefetch(scholarIDs)
+        dict_title_group = provider.get_citations(bib_entries, scholarIDs)[0]
+        ctx = ctx.page(dict_title=dict_title_group,
+                       citation_series=get_citation_series(bib_entries, dict_title_group, ctx))
+
+    pages = []
+    for author, value in ctx['author_group'].items():
+
+        html_file = os.path.join(author_folder, get_author_html_name(author))
 
         entries_selected = []
         for e in bib_entries:
-            if is_entry_selected(e, selection_and={'author': [author]}):
+            if is_entry_selected(e, ctx, selection_and={'author': [author]}):
                 entries_selected.append(e)
 
-        if len(value):
-            for k, v in value.items():
-                if k.lower() == 'scholarid':
-                    params['googlescholarID'] = v
-                else:
-                    params['googlescholarID'] = ''
-        else:
-            params['googlescholarID'] = ''
+        googlescholarID = get_author_scholarID(value)
+
+        page_ctx = ctx.page(htmlfile_type=html_file, title='Publications of %s' % author,
+                            googlescholarID=googlescholarID)
+
+        if provider:
+            dict_title, google_scholar_out = provider.get_citations(entries_selected, [googlescholarID])
+            page_ctx = page_ctx.page(dict_title=dict_title, google_scholar_out=google_scholar_out)
 
-        if params['show_citation'] == 'bs' and params['googlescholarID']:
-            out_scholar = get_title_citation_url(params['googlescholarID'])
-            params['dict_title'] = out_scholar[0]
-            params['google_scholar_out'] = out_scholar[1:]
-            params['dict_title_group'].update(out_scholar[0])
+        pages.append((entries_selected, page_ctx, ctx['show_total_citation'] and googlescholarID))
 
-        write_entries_by_type(entries_selected, params['show_total_citation'] and params['googlescholarID'])
+    return pages, ctx
 
 
-def _write_entries_group_complete(bib_entries):
-    """write bib_entries by types in complete-bibliography.html (journal, conference, etc.)"""
+def _get_pages_group_complete(bib_entries, ctx):
+    """get the page of bib_entries by types in complete-bibliography.html (journal, conference, etc.)"""
 
-    biblio_folder = os.path.join(params['htmlfile_group'], 'Bibliography')
-    params['author_group_Bibliography'] = biblio_folder
-    if not os.path.exists(biblio_folder):
+    biblio_folder = ctx['author_group_Bibliography']
+    if ctx['memory_files'] is None and not os.path.exists(biblio_folder):
         os.mkdir(biblio_folder)
 
-    params['htmlfile_type'] = os.path.join(biblio_folder, 'complete-bibliography.html')
+    page_ctx = ctx.page(htmlfile_type=os.path.join(biblio_folder, 'complete-bibliography.html'))
 
-    write_entries_by_type(bib_entries, show_total_citation=False)
+    return [(bib_entries, page_ctx, False)]
 
 
-def _write_entries_group_category(bib_entries):
-    """write bib_entries by types in in different categories (journal, conference, etc.)"""
+def _get_pages_group_category(bib_entries, ctx):
+    """get pages of bib_entries by types in in different categories (journal, conference, etc.)"""
 
-    folder = os.path.join(params['htmlfile_group'], 'Category')
-    params['author_group_Category'] = folder
-    if not os.path.exists(folder):
-        os.mkdir(folder)
+    folder = ctx['author_group_Category']
 
     # write list of sections, papers
-    paperlists, seclist, _ = get_categories_of_entries(bib_entries)
+    paperlists, seclist, _ = get_categories_of_entries(bib_entries, ctx)
 
+    pages = []
     for ii in range(len(paperlists)):
         if len(paperlists[ii]):
             html_file = os.path.join(folder, get_anchor_name(seclist[ii]) + '.html')
-            params['htmlfile_type'] = html_file
-            params['title'] = 'Publications of %s' % seclist[ii]
+            page_ctx = ctx.page(htmlfile_type=html_file, title='Publications of %s' % seclist[ii])
+
+            pages.append((paperlists[ii], page_ctx, False))
+
+    return pages
+
+
+def strip_html(text):
+    """remove html tags and entities from a string"""
+
+    return html_unescape(re.sub(u'<[^>]*>', u'', text)).replace(u'\xa0', u' ')
+
+
+def get_search_tokens(text):
+    """split a string into lowercase ascii tokens used by the search index"""
+
+    text = unicodedata.normalize('NFKD', unicode(strip_html(text)))
+    text = text.encode('ascii', 'ignore').decode('ascii').lower()
+    return re.findall(u'[0-9a-z]+', text)
+
+
+def get_search_document(entry, ctx):
+    """get a compact search document [title, authors, venue, year, link] for an entry"""
+
+    title = entry['chapter'] if 'chapter' in entry else entry.get('title', '')
+    venue, _ = get_publisher_shortname_from_entry(entry, ctx)
+    link = get_wwwlink_from_entry(entry) or get_pdflink_from_entry(entry)
+
+    return [strip_html(title), strip_html(entry.get('author', '')), venue, entry['year'], link]
+
+
+def write_search_index(bib_entries, ctx):
+    """write an inverted search index of bib_entries in ctx['search_index_folder'].
+
+    The index is partitioned by token prefix (idx-<prefix>.json: {token: [doc ids]}) and the
+    documents are split in chunks (docs-<n>.json), so the browser only loads what a query needs.
+    """
+
+    folder = ctx['search_index_folder']
+    if ctx['memory_files'] is None and not os.path.exists(folder):
+        os.mkdir(folder)
+
+    entries = sort_entries(bib_entries, cmp_by_year, ctx)
+
+    prefix_len = ctx['search_index_prefix_len']
+    chunk_size = ctx['search_index_chunk_size']
 
-            write_entries_by_type(paperlists[ii], show_total_citation=False)
+    written = {}
+    shards = {}
+    chunk = []
+    for i, e in enumerate(entries):
+        doc = get_search_document(e, ctx)
+        tokens = set(get_search_tokens(doc[0]) + get_search_tokens(doc[1]) + get_search_tokens(doc[2]) +
+                     get_search_tokens(doc[3]))
+        for t in tokens:
+            if len(t) >= prefix_len:
+                shards.setdefault(t[:prefix_len], {}).setdefault(t, []).append(i)
 
+        chunk.append(doc)
+        if len(chunk) == chunk_size or i == len(entries) - 1:
+            f1 = open_output_file(os.path.join(folder, 'docs-%d.json' % (i // chunk_size)), ctx, 'utf8')
+            f1.write(unicode(json.dumps(chunk, ensure_ascii=False, separators=(',', ':'))))
+            written[f1.out_file] = f1.close()
+            chunk = []
 
-def write_entries_to_bibfile(bib_entries):
+    for prefix, index in shards.items():
+        f1 = open_output_file(os.path.join(folder, 'idx-%s.json' % prefix), ctx, 'utf8')
+        f1.write(unicode(json.dumps(index, separators=(',', ':'), sort_keys=True)))
+        written[f1.out_file] = f1.close()
+
+    # remove shards of a previous run
+    for name in os.listdir(folder) if ctx['memory_files'] is None else []:
+        if (name.startswith('idx-') or name.startswith('docs-')) and name.endswith('.json'):
+            if os.path.join(folder, name) not in written:
+                os.remove(os.path.join(folder, name))
+
+    log(ctx, 'Write search index of %s to %s (%d entries, %d shards)' % (ctx['bibfile'], folder, len(entries),
+                                                                           len(shards)))
+
+    return written
+
+
+def write_entries_to_bibfile(bib_entries, ctx):
     """write entries into a bib file"""
 
-    f1 = codecs.open(params['outbibfile'], 'w', encoding=params['encoding'])
+    f1 = open_output_file(ctx['outbibfile'], ctx)
 
     for entry in bib_entries:
-        bibstr = get_bibtex_from_entry(entry, comma_to_and=True)
+        bibstr = get_bibtex_from_entry(entry, ctx, comma_to_and=True)
         f1.write(bibstr)
         f1.write('\n\n')
-    f1.close()
+    changed = f1.close()
 
-    print('Write %s (cleaned and selected) to %s' % (params['bibfile'], params['outbibfile']))
+    log(ctx, 'Write %s (cleaned and selected) to %s' % (ctx['bibfile'], ctx['outbibfile']))
 
+    return {ctx['outbibfile']: changed}
 
-def main():
-    args = docopt(__doc__, version='1.0')
 
-    _bibfile = args['<bibfile>']
-    _htmlfile = args['<htmlfile>']
-    _verbose = int(args['--verbose'])
-    _conffile = args['--conf']
-    _input = args['--input']
-    _outbibfile = args['--outbib']
+def read_config(conffile=None, input_params=None, no_citation=False, verbose=0, jobs=None):
+    """read parameters from a configuration file and input parameters.
 
-    if _verbose >= 1:
-        print(args)
+    Parameters
+    ----------
+        conffile     :   configuration file (.ini)
+        input_params :   dict of parameters which override parameters in conffile
+        no_citation  :   don't use google scholar
+        verbose      :   verbose level
+        jobs         :   number of processes to write pages in group mode
+
+    Returns
+    -------
+        conf : dict of parameters, based on a copy of the default params
+    """
 
-    params['verbose'] = _verbose
+    conf = copy.deepcopy(params)
+    conf['verbose'] = verbose
 
     config = configparser.ConfigParser()
-    if args['--conf']:
+    if conffile:
         param_str = 'params'
-        config.read(_conffile)
+        config.read(conffile)
         #  print config.items(param_str)
 
         #  strings, lists, dicts
@@ -1751,90 +3919,124 @@ def main():
                          'target_link', 'target_link_citation', 'type_conference_paper', 'type_conference_abstract',
                          'encoding',
                          'bibtex_fields_download', 'bibtex_fields_note', 'show_paper_style', 'bootstrap_css',
-                         'count_publisher', 'publisher_short_full_names', 'selection_and', 'selection_or', 'bulleted_list']:
+                         'count_publisher', 'publisher_short_full_names', 'selection_and', 'selection_or', 'bulleted_list',
+                         'jquery_js', 'bootstrap_js', 'assets', 'disclaimer_time', 'publish',
+                         'shard', 'bib_cache', 'group_output', 'citation_snapshot',
+                         'citation_history',
+                         'scholar_url', 'scholar_cache', 'scholar_record', 'scholar_replay']:
             if config.has_option(param_str, name_str):
-                params[name_str] = ast.literal_eval(config.get(param_str, name_str))
+                conf[name_str] = ast.literal_eval(config.get(param_str, name_str))
 
         #  booleans
         for name_str in ['use_icon', 'single_line', 'use_bootstrap_dialog', 'add_blank_line_after_item',
-                         'show_page_title', 'show_count_number', 'show_total_citation', 'show_author_sign']:
+                         'show_page_title', 'show_count_number', 'show_total_citation', 'show_author_sign',
+                         'search_index', 'inline_icons', 'minify_html', 'incremental', 'scholar_cache_stale',
+                         'citation_metrics']:
             if config.has_option(param_str, name_str):
-                params[name_str] = config.getboolean(param_str, name_str)
+                conf[name_str] = config.getboolean(param_str, name_str)
 
         #  integer
-        for name_str in ['show_citation_before_years', 'show_citation_lb']:
+        for name_str in ['show_citation_before_years', 'show_citation_lb', 'search_index_prefix_len',
+                         'search_index_chunk_size', 'jobs', 'scholar_cache_ttl', 'scholar_jobs',
+                         'scholar_host_connections', 'scholar_pagesize', 'scholar_timeout', 'scholar_retries']:
             if config.has_option(param_str, name_str):
-                params[name_str] = config.getint(param_str, name_str)
+                conf[name_str] = config.getint(param_str, name_str)
 
-        # publisher_short_full_names, add short_full lists in params['count_publisher']
-        tmp = params['count_publisher'].copy()
-        for name_sf in params['publisher_short_full_names']:
-            if name_sf not in params['count_publisher']:
+        #  float
+        for name_str in ['scholar_host_interval', 'scholar_backoff', 'title_match_threshold', 'watch_interval']:
+            if config.has_option(param_str, name_str):
+                conf[name_str] = config.getfloat(param_str, name_str)
+
+        # publisher_short_full_names, add short_full lists in conf['count_publisher']
+        tmp = conf['count_publisher'].copy()
+        for name_sf in conf['publisher_short_full_names']:
+            if name_sf not in conf['count_publisher']:
                 tmp.append(name_sf)
-        params['publisher_short_full_names'] = tmp.copy()
+        conf['publisher_short_full_names'] = tmp.copy()
+
+    if input_params:
+        for k, v in input_params.items():
+            conf[k] = v
+
+    if no_citation:
+        conf['show_total_citation'] = False
+        conf['show_citation'] = 'no'
+
+    if jobs is not None:
+        conf['jobs'] = jobs
+
+    return conf
+
+
+def make_render_context(conf, bibfile, htmlfile, outbibfile=''):
+    """make the render context from parameters read by read_config.
 
+    It sets output files and derived parameters, creates the output folder in group mode
+    and prepares css, javascript and icon resources.
 
-    if args['--input']:
-        paramsInput = ast.literal_eval(_input)
-        for k, v in paramsInput.items():
-            params[k] = v
+    Returns
+    -------
+        ctx : RenderContext
+    """
 
-    if args['--nc']:
-        params['show_total_citation'] = False
-        params['show_citation'] = 'no'
+    conf = dict(conf)
 
     # use lower words in some keys
-    params['show_paper_style'] = params['show_paper_style'].lower()
+    conf['show_paper_style'] = conf['show_paper_style'].lower()
 
     # use different output html file for different types
-    if len(params['author_group']):
-        file_name, file_ext = os.path.splitext(_htmlfile)
-        if not os.path.exists(file_name):
+    file_name, file_ext = os.path.splitext(htmlfile)
+    if len(conf['author_group']):
+        if conf['memory_files'] is None and not os.path.exists(file_name):
             os.mkdir(file_name)
 
-        params['htmlfile_group'] = file_name
+        conf['htmlfile_group'] = file_name
+        for folder in ['Author', 'Bibliography', 'Category', 'Icons', 'Static', 'Venue', 'Year']:
+            conf['author_group_' + folder] = os.path.join(file_name, folder)
+        conf['search_index_folder'] = os.path.join(file_name, 'Search')
 
     else:
-        if params['show_paper_style'] == 'type':
-            params['htmlfile_type'] = _htmlfile
-            params['htmlfile_year'] = ''
-        elif params['show_paper_style'] == 'year':
-            params['htmlfile_type'] = ''
-            params['htmlfile_year'] = _htmlfile
-        elif params['show_paper_style'] == 'year_type' or params['show_paper_style'] == 'type_year':
-            file_name, file_ext = os.path.splitext(_htmlfile)
-            params['htmlfile_type'] = '%s_by_type%s' % (file_name, file_ext)
-            params['htmlfile_year'] = '%s_by_year%s' % (file_name, file_ext)
-        elif params['show_paper_style'] == 'venue':
-            params['htmlfile_venue'] = _htmlfile
+        conf['search_index_folder'] = file_name + '_search'
+
+        if conf['show_paper_style'] == 'type':
+            conf['htmlfile_type'] = htmlfile
+            conf['htmlfile_year'] = ''
+        elif conf['show_paper_style'] == 'year':
+            conf['htmlfile_type'] = ''
+            conf['htmlfile_year'] = htmlfile
+        elif conf['show_paper_style'] == 'year_type' or conf['show_paper_style'] == 'type_year':
+            conf['htmlfile_type'] = '%s_by_type%s' % (file_name, file_ext)
+            conf['htmlfile_year'] = '%s_by_year%s' % (file_name, file_ext)
+        elif conf['show_paper_style'] == 'venue':
+            conf['htmlfile_venue'] = htmlfile
         else:
             raise ValueError('wrong show_paper_style')
 
-    params['bibfile'] = _bibfile
-    if _outbibfile:
-        params['outbibfile'] = _outbibfile
+    conf['bibfile'] = bibfile
+    if outbibfile:
+        conf['outbibfile'] = outbibfile
 
     #  add conferences
-    params['count_publisher'] = params['count_publisher'] + params['conference_shortname_highlighted']
+    conf['count_publisher'] = conf['count_publisher'] + conf['conference_shortname_highlighted']
 
-    if _verbose >= 1:
-        print('params = %s' % params)
+    if conf['verbose'] >= 1:
+        print('params = %s' % conf)
 
     # get fullname and shortname for journals
-    sn, fn = get_journal_short_full_names(params['publisher_short_full_names'])
-    params['journal_fullname_highlighted_lower'] = [name.lower() for name in fn]
-    params['journal_shortname_highlighted'] = sn
+    sn, fn = get_journal_short_full_names(conf['publisher_short_full_names'])
+    conf['journal_fullname_highlighted_lower'] = [name.lower() for name in fn]
+    conf['journal_shortname_highlighted'] = sn
 
     current_year = datetime.date.today().year
-    params['show_citation_year'] = current_year - params['show_citation_before_years']
+    conf['show_citation_year'] = current_year - conf['show_citation_before_years']
 
-    if params['show_citation'] != 'bs' and params['show_total_citation']:
+    if conf['show_citation'] != 'bs' and conf['show_total_citation']:
         raise ValueError("show_total_citation==True needs show_citation=='bs'")
 
-    params['author_group_authors'] = list(params['author_group'].keys())
+    conf['author_group_authors'] = list(conf['author_group'].keys())
 
     # html afterlog
-    if params['show_citation'] == 'scholar.js' and 'googlescholarID' in params:
+    if conf['show_citation'] == 'scholar.js' and 'googlescholarID' in conf:
         afterlog = """
         <br>
             <script type="text/javascript">
@@ -1843,7 +4045,7 @@ def main():
         </div>
         </body>
         </html>
-        """ % (params['googlescholarID'])
+        """ % (conf['googlescholarID'])
     else:
         afterlog = """
         <br>
@@ -1852,60 +4054,1205 @@ def main():
         </html>
         """
 
-    params['afterlog'] = afterlog
+    conf['afterlog'] = afterlog
 
-    with io.open(_bibfile, 'r', encoding='utf8') as bibtex_file:
-        bibtex_str = bibtex_file.read()
+    # css, javascript and icons
+    if len(conf['author_group']):
+        conf['asset_links'], conf['asset_inline'] = prepare_assets(conf, conf['author_group_Static'],
+                                                                   conf['author_group_Icons'])
+    else:
+        conf['asset_links'], conf['asset_inline'] = prepare_assets(conf, file_name + '_static', file_name + '_static')
+
+    return RenderContext(conf)
+
+
+def parse_bib_entries(bibtex_str, verbose=0):
+    """parse and clean entries of a bibtex string"""
+
+    import bibtexparser
 
-    # read bibtex file
     bib_database = bibtexparser.loads(bibtex_str)
     bib_entries = bib_database.entries
 
-    entries_selected = []
     for e in bib_entries:
 
-        if _verbose >= 2:
+        if verbose >= 2:
             print('e before clean=', e)
 
         #  clean entry for output
         clean_entry(e)
 
-        if is_entry_selected(e):
-            if len(params['author_group']) == 0 or len(params['author_group']) > 0 and is_entry_selected(e, selection_or={'author': params['author_group_authors']}):
+    return bib_entries
+
+
+class EntryCache(object):
+    """Cleaned entries of bib files which are kept in memory between builds, e.g. with --watch.
+
+    A bib file is split into blocks which start with @ at the beginning of a line. A block has all entries until
+    the next block, e.g. several entries on a line. Only new or changed blocks are parsed and cleaned again, or all
+    blocks if @string or @preamble blocks changed.
+    """
+
+    # prefix of keys of entries which separate blocks which are parsed at once
+    sentinel = u'bibtex2html-block-'
+
+    def __init__(self, verbose=0):
+        self.verbose = verbose
+        # {bib file: {md5 of @string blocks and a block: cleaned entries of the block}}
+        self.blocks = {}
+
+    def read(self, bibfile):
+        """read and clean entries from a bib file. Returns copies of the cached entries."""
+
+        with io.open(bibfile, 'r', encoding='utf8') as f:
+            blocks = re.split(r'(?m)^(?=[ \t]*@[ \t]*\w+[ \t]*[{(])', f.read())
+
+        is_strings = [bool(re.match(r'\s*@\s*(string|preamble)\b', b, re.IGNORECASE)) for b in blocks]
+        strings = u''.join(b for i, b in enumerate(blocks) if is_strings[i])
+        keys = [hashlib.md5((strings + u'\0' + b).encode('utf-8')).hexdigest() for b in blocks]
+
+        # new or changed blocks are parsed at once. An entry after each block assigns the entries to blocks.
+        cached = self.blocks.get(bibfile, {})
+        changed = [i for i, key in enumerate(keys) if key not in cached and not is_strings[i] and blocks[i].strip()]
+        entries_block = {}
+        if changed:
+            # an entry without fields is skipped by bibtexparser
+            bibtex_str = strings + u''.join(u'%s\n@misc{%s%d, note = {}}\n' % (blocks[i], self.sentinel, i)
+                                            for i in changed)
+            entries = []
+            for e in parse_bib_entries(bibtex_str, self.verbose):
+                if e['ID'].startswith(self.sentinel):
+                    entries_block[int(e['ID'][len(self.sentinel):])] = entries
+                    entries = []
+                else:
+                    entries.append(e)
+
+        self.blocks[bibfile] = {}
+        bib_entries = []
+        for i, key in enumerate(keys):
+            entries = cached[key] if key in cached else entries_block.get(i, [])
+            self.blocks[bibfile][key] = entries
+            bib_entries.extend(dict(e) for e in entries)
+
+        if self.verbose:
+            print('Parse %d of %d blocks of %s' % (len(changed), len(blocks), bibfile))
+
+        return bib_entries
+
+
+def read_bib_file(bibfile, cache_folder='', verbose=0):
+    """read and clean entries from a bib file.
+
+    If cache_folder, cleaned entries are cached in cache_folder/<md5>.json, where md5 is the digest of
+    the bib file and bibtex2html.py. The cache can be shared by several runs (e.g. shards of a group).
+    """
+
+    with open(bibfile, 'rb') as f:
+        bibtex_data = f.read()
+
+    cache_file = ''
+    if cache_folder:
+        md5 = hashlib.md5(get_generator_digest().encode('utf-8'))
+        md5.update(bibtex_data)
+        cache_file = os.path.join(cache_folder, md5.hexdigest() + '.json')
+        if os.path.exists(cache_file):
+            with io.open(cache_file, 'r', encoding='utf8') as f:
+                return json.load(f)
+
+    # read bibtex file
+    bib_entries = parse_bib_entries(bibtex_data.decode('utf8'), verbose)
+
+    if cache_file:
+        if not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+        write_file_if_changed(json.dumps(bib_entries).encode('utf-8'), cache_file)
+
+    return bib_entries
+
+
+def read_entries(bibfile, ctx, entry_cache=None):
+    """read, clean and select entries from a bib file, from entry_cache (EntryCache) if it is given"""
+
+    if entry_cache is not None:
+        bib_entries = entry_cache.read(bibfile)
+    else:
+        bib_entries = read_bib_file(bibfile, ctx['bib_cache'], ctx['verbose'])
+
+    entries_selected = []
+    for e in bib_entries:
+
+        if is_entry_selected(e, ctx):
+            if len(ctx['author_group']) == 0 or len(ctx['author_group']) > 0 and is_entry_selected(e, ctx, selection_or={'author': ctx['author_group_authors']}):
 
                 #  fill some empty fields
                 add_empty_fields_in_entry(e)
 
                 # add short name
-                add_shortname_in_entry(e)
+                add_shortname_in_entry(e, ctx)
 
-                if _verbose >= 2:
+                if ctx['verbose'] >= 2:
                     print('e after clean =', e)
 
                 entries_selected.append(e)
 
-    if params['outbibfile']:
-        write_entries_to_bibfile(entries_selected)
+    return entries_selected
+
+
+def add_citations(entries_selected, ctx):
+    """get the ctx of a page (not of a group) with citations of entries_selected of the citation provider:
+    dict_title, google_scholar_out and citation_series"""
+
+    if ctx['show_citation'] == 'bs' and not ctx['googlescholarID']:
+        raise ValueError("no googlescholarID")
+
+    provider = get_citation_provider(ctx)
+    if not provider:
+        return ctx
+
+    dict_title, google_scholar_out = provider.get_citations(entries_selected, [ctx['googlescholarID']])
+    return ctx.page(dict_title=dict_title, google_scholar_out=google_scholar_out,
+                    citation_series=get_citation_series(entries_selected, dict_title, ctx))
+
+
+def render_entries(entries_selected, ctx, citations=True):
+    """render selected entries into html files (and a bib file if ctx['outbibfile']), without a summary
+    (see write_entries). Writers print their progress, unless ctx['quiet'].
+
+    Parameters
+    ----------
+        entries_selected :   selected entries
+        ctx              :   render context
+        citations        :   add citations of entries_selected to ctx (see add_citations). If False, ctx already
+                             has citations, e.g. of all entries of a PublicationApp. Citations of a group are
+                             always added.
+
+    Returns
+    -------
+        written : {output file: True if written, False if unchanged}
+    """
+
+    written = {}
+
+    if ctx['outbibfile']:
+        written.update(write_entries_to_bibfile(entries_selected, ctx))
+
+    # the search index of a group in shards is written by merge_shards
+    if ctx['search_index'] and not (len(ctx['author_group']) and ctx['shard']):
+        written.update(write_search_index(entries_selected, ctx))
+
+    if len(ctx['author_group']):
+
+        written.update(write_entries_group(entries_selected, ctx))
+
+    else:
+        if citations:
+            ctx = add_citations(entries_selected, ctx)
+
+        if ctx['show_paper_style'] == 'type':
+            written.update(write_entries_by_type(entries_selected, ctx, ctx['show_total_citation']))
+        elif ctx['show_paper_style'] == 'year':
+            written.update(write_entries_by_year(entries_selected, ctx, ctx['show_total_citation']))
+        elif ctx['show_paper_style'] == 'year_type' or ctx['show_paper_style'] == 'type_year':
+            written.update(write_entries_by_type(entries_selected, ctx, ctx['show_total_citation']))
+            written.update(write_entries_by_year(entries_selected, ctx, ctx['show_total_citation']))
+        elif ctx['show_paper_style'] == 'venue':
+            written.update(write_entries_by_venue(entries_selected, ctx, ctx['show_total_citation']))
+
+    return written
+
+
+def write_entries(entries_selected, ctx):
+    """write selected entries to html files (and a bib file if ctx['outbibfile']) and print the number of written
+    files (see render_entries)
+
+    Returns
+    -------
+        written : {output file: True if written, False if unchanged}
+    """
+
+    written = render_entries(entries_selected, ctx)
+
+    num_written = sum(1 for changed in written.values() if changed)
+    print('Write %d files, skip %d unchanged files' % (num_written, len(written) - num_written))
+
+    return written
+
+
+def stage_output_folder(folder, mode):
+    """create the staging folder of the output folder for publish_output_folder.
+
+    Files of the current output folder are hard-linked (or copied if hard links are not supported) into the
+    staging folder. Output files are replaced, never modified in place, so the current tree is not changed.
+
+    Returns
+    -------
+        staging_folder : str
+    """
+
+    if mode not in ['symlink', 'rename']:
+        raise ValueError("Wrong params['publish']. Must be '', 'symlink', 'rename'")
+
+    # the same staging folder in each run, such that incremental builds can reuse the previous digests
+    staging_folder = folder + '_staging'
+    if os.path.lexists(staging_folder):
+        shutil.rmtree(staging_folder)
+    os.mkdir(staging_folder)
+
+    if os.path.isdir(folder):
+        link_folder(folder, staging_folder)
+
+    return staging_folder
+
+
+def publish_output_folder(staging_folder, folder, mode):
+    """publish the staging folder as the output folder.
+
+    'symlink': move the staging folder to <folder>_builds and atomically replace the symlink folder.
+    The previous build is kept for requests in flight, older builds are removed.
+    'rename': rename the staging folder to folder. The old folder is renamed away first,
+    so folder is missing for a moment.
+    """
+
+    if mode == 'symlink':
+        builds_folder = folder + '_builds'
+        if not os.path.exists(builds_folder):
+            os.mkdir(builds_folder)
+        build = datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '-%d' % os.getpid()
+        os.rename(staging_folder, os.path.join(builds_folder, build))
+
+        # a symlink can't replace a folder. Move the folder of a previous run without publish mode away.
+        old_folder = ''
+        if os.path.isdir(folder) and not os.path.islink(folder):
+            old_folder = folder + '_old'
+            if os.path.lexists(old_folder):
+                shutil.rmtree(old_folder)
+            os.rename(folder, old_folder)
+
+        previous = os.path.basename(os.readlink(folder)) if os.path.islink(folder) else ''
+
+        link_tmp = folder + '_link.tmp'
+        if os.path.lexists(link_tmp):
+            os.remove(link_tmp)
+        os.symlink(os.path.relpath(os.path.join(builds_folder, build), os.path.dirname(folder)), link_tmp)
+        if PY2:
+            os.rename(link_tmp, folder)
+        else:
+            os.replace(link_tmp, folder)
+
+        if old_folder:
+            shutil.rmtree(old_folder)
+        for name in os.listdir(builds_folder):
+            if name not in [build, previous]:
+                shutil.rmtree(os.path.join(builds_folder, name))
+
+    elif mode == 'rename':
+        old_folder = folder + '_old'
+        if os.path.lexists(old_folder):
+            shutil.rmtree(old_folder)
+        if os.path.islink(folder):
+            os.remove(folder)
+        elif os.path.exists(folder):
+            os.rename(folder, old_folder)
+        os.rename(staging_folder, folder)
+        if os.path.exists(old_folder):
+            shutil.rmtree(old_folder)
+
+    else:
+        raise ValueError("Wrong params['publish']. Must be '', 'symlink', 'rename'")
+
+    print('Publish %s to %s' % (staging_folder, folder))
+
+
+def get_watched_files(ctx, conffile=None):
+    """get local input files of a build: the bib file, the configuration, css, icons and the citation snapshot"""
+
+    files = [ctx['bibfile']]
+    if conffile:
+        files.append(conffile)
+    for name in asset_names + ['citation_snapshot']:
+        if ctx[name] and not is_url(ctx[name]):
+            files.append(ctx[name])
+    return files
+
+
+def get_files_state(files):
+    """get {file: (modification time, size)} of files, None for missing files"""
+
+    state = {}
+    for f in files:
+        try:
+            st = os.stat(f)
+            state[f] = (st.st_mtime, st.st_size)
+        except OSError:
+            state[f] = None
+    return state
+
+
+def watch(read_conf, bibfile, htmlfile, outbibfile='', conffile=None):
+    """write pages, then write them again whenever input files change (see get_watched_files), until interrupted.
+
+    Files are polled every params['watch_interval'] seconds. Cleaned entries (EntryCache) and citations of the
+    citation provider are kept in memory between builds, and only changed pages of a group are written again.
+
+    Parameters
+    ----------
+        read_conf : function which returns parameters (see read_config), called for each build
+    """
+
+    entry_cache = None
+    provider = None
+    provider_state = None
+
+    files = [f for f in [bibfile, conffile] if f]
+    state = None
+    interval = params['watch_interval']
+
+    try:
+        while True:
+            files_state = get_files_state(files)
+            if files_state != state:
+                start = time.time()
+                try:
+                    conf = read_conf()
+                    conf['incremental'] = True
+                    interval = conf['watch_interval']
+                    ctx = make_render_context(conf, bibfile, htmlfile, outbibfile)
+
+                    if entry_cache is None or entry_cache.verbose != ctx['verbose']:
+                        entry_cache = EntryCache(ctx['verbose'])
+
+                    # citations are kept until the configuration or the citation snapshot change
+                    files = get_watched_files(ctx, conffile)
+                    new_provider_state = [files_state.get(f) for f in [conffile, ctx['citation_snapshot']]]
+                    if provider_state != new_provider_state:
+                        provider = get_citation_provider(ctx)
+                        provider_state = new_provider_state
+                    ctx = ctx.page(citation_provider=provider)
+
+                    written = write_entries(read_entries(bibfile, ctx, entry_cache), ctx)
+                    print('Build %s: %d of %d files changed in %.2f s' % (
+                        htmlfile, sum(1 for changed in written.values() if changed), len(written), time.time() - start))
+                except Exception as e:
+                    # e.g. a bib file or a configuration in the middle of an edit. Keep watching.
+                    print('Error: %s' % e)
+
+                state = dict((f, files_state[f] if f in files_state else get_files_state([f])[f]) for f in files)
+                print('Watch %s' % ', '.join(files))
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+class PageServer(object):
+    """Output files of a build which are rendered in memory on request, for --serve.
+
+    Input files are read again when they change (see update). Cleaned entries (EntryCache), citations and
+    rendered files are kept in memory, and a page of a group is rendered again only if its entries or parameters
+    changed. Pages of a group are rendered one by one. Other outputs (a single bib file, a single page application,
+    css, javascript and icons) are rendered at once. Nothing is written to disk.
+    """
+
+    def __init__(self, read_conf, bibfile, htmlfile, outbibfile='', conffile=None):
+        self.read_conf = read_conf
+        self.bibfile = bibfile
+        self.htmlfile = htmlfile
+        self.outbibfile = outbibfile
+        self.conffile = conffile
+        # urls are paths relative to the folder of the output
+        self.root = os.path.dirname(os.path.abspath(htmlfile))
+        self.index = ''
+        self.encoding = params['encoding']
+        self.interval = params['watch_interval']
+
+        self.entry_cache = EntryCache()
+        self.provider = None
+        self.provider_state = None
+        self.files = [f for f in [bibfile, conffile] if f]
+        self.state = None
+
+        # incremented when inputs change, to reload pages in the browser
+        self.generation = 0
+        self.lock = threading.RLock()
+        # {output file: (key, function which renders the file)}, {key: content}
+        self.renderers = {}
+        self.rendered = {}
+        # local css, javascript and icon files which are not rendered (e.g. with assets 'cdn'), and asset folders
+        self.asset_files = set()
+        self.asset_folders = []
+
+        self.update()
+
+    def update(self):
+        """prepare the output files again if input files changed. Return true if they changed."""
+
+        files_state = get_files_state(self.files)
+        if files_state == self.state:
+            return False
+
+        with self.lock:
+            # assets prepared by make_render_context are kept in memory_files, for links of pages to them
+            memory_files = {}
+            conf = dict(self.read_conf(), memory_files=memory_files)
+            ctx = make_render_context(conf, self.bibfile, self.htmlfile, self.outbibfile)
+            assets = set(memory_files)
+
+            # citations are kept until the configuration or the citation snapshot change
+            files = get_watched_files(ctx, self.conffile)
+            provider_state = [files_state.get(f) for f in [self.conffile, ctx['citation_snapshot']]]
+            if self.provider_state != provider_state:
+                self.provider = get_citation_provider(ctx)
+                self.provider_state = provider_state
+
+            ctx = ctx.page(citation_provider=self.provider)
+            bib_entries = read_entries(self.bibfile, ctx, self.entry_cache)
+
+            renderers = {}
+            if len(ctx['author_group']) and ctx['group_output'] == 'pages':
+                pages, ctx = get_pages_group(bib_entries, ctx)
+                digests = GroupManifest(ctx['htmlfile_group'], bib_entries, enabled=False)
+                bib_ctx = ctx.page(outbibfile=os.path.join(ctx['author_group_Bibliography'], 'complete-bibliography.bib'))
+                index_file = os.path.join(ctx['htmlfile_group'], 'index.html')
+
+                outputs = [(page[1]['htmlfile_type'], page, write_entries_by_type) for page in pages]
+                outputs.append((index_file, (bib_entries, ctx), _write_entries_group_index))
+                outputs.append((bib_ctx['outbibfile'], (bib_entries, bib_ctx), write_entries_to_bibfile))
+                for out_file, args, write in outputs:
+                    key = (out_file, digests.get_digest(*args))
+                    renderers[os.path.abspath(out_file)] = (key, functools.partial(
+                        self.render, write, args, out_file, memory_files))
+                self.index = os.path.abspath(index_file)
+
+                # assets and the search index are rendered at once
+                if ctx['search_index']:
+                    write_search_index(bib_entries, ctx)
+                for out_file, data in list(memory_files.items()):
+                    key = (out_file, hashlib.md5(data).hexdigest())
+                    self.rendered[key] = data
+                    renderers[os.path.abspath(out_file)] = (key, None)
+                    if out_file not in assets:
+                        del memory_files[out_file]
+                asset_folders = [ctx['author_group_Static'], ctx['author_group_Icons']]
+            else:
+                write_entries(bib_entries, ctx)
+                for out_file, data in memory_files.items():
+                    key = (out_file, hashlib.md5(data).hexdigest())
+                    self.rendered[key] = data
+                    renderers[os.path.abspath(out_file)] = (key, None)
+                html_files = sorted(f for f in renderers if f.endswith('.html'))
+                self.index = os.path.join(ctx['htmlfile_group'], 'index.html') if len(ctx['author_group']) else (
+                    html_files[0] if html_files else '')
+                asset_folders = [ctx['author_group_Static'], ctx['author_group_Icons']] if len(
+                    ctx['author_group']) else [os.path.splitext(self.htmlfile)[0] + '_static']
+
+            self.renderers = renderers
+            self.asset_files = set(os.path.abspath(link) for link in ctx['asset_links'].values()
+                                   if link and not is_url(link) and os.path.isfile(link))
+            self.asset_folders = [os.path.join(os.path.abspath(folder), '') for folder in asset_folders]
+            keys = set(key for key, _ in renderers.values())
+            self.rendered = dict((key, data) for key, data in self.rendered.items() if key in keys)
+            self.encoding = ctx['encoding']
+            self.interval = ctx['watch_interval']
+            self.files = files
+            self.state = dict((f, files_state[f] if f in files_state else get_files_state([f])[f]) for f in files)
+            self.generation += 1
+
+        return True
+
+    @staticmethod
+    def render(write, args, out_file, memory_files):
+        """render out_file by write(*args) into memory_files. Return its content."""
+
+        write(*args)
+        return memory_files.pop(out_file)
+
+    def get(self, out_file):
+        """get the content of an output file (absolute path), or None if it is not an output of the build.
+        Local asset files and files in asset folders which are not rendered are read from disk."""
+
+        with self.lock:
+            if out_file not in self.renderers:
+                if out_file in self.asset_files or any(out_file.startswith(f) for f in self.asset_folders):
+                    if os.path.isfile(out_file):
+                        with open(out_file, 'rb') as f:
+                            return f.read()
+                return None
+            key, render = self.renderers[out_file]
+            if key not in self.rendered:
+                self.rendered[key] = render()
+            return self.rendered[key]
+
+
+# script of pages of --serve which reloads a page when inputs change
+serve_reload_script = b'''<script>new EventSource("/__events").onmessage = function () { location.reload(); };</script>
+'''
+
+
+def serve(read_conf, bibfile, htmlfile, outbibfile='', conffile=None, port=8000):
+    """serve output files of a build on http://localhost:port, rendered in memory on request (see PageServer).
+    Pages are reloaded in the browser when input files change. Only output files and local css, javascript and
+    icon files are served, e.g. not the bib file or the configuration.
+    """
+
+    if PY2:
+        from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+        from SocketServer import ThreadingMixIn
+        from urllib import unquote
+    else:
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+        from urllib.parse import unquote
+
+    pages = PageServer(read_conf, bibfile, htmlfile, outbibfile, conffile)
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            path = unquote(urlparse(self.path).path)
+            if path == '/__events':
+                return self.send_events()
+            if path == '/' and pages.index:
+                self.send_response(302)
+                self.send_header('Location', '/' + os.path.relpath(pages.index, pages.root).replace(os.sep, '/'))
+                self.end_headers()
+                return
+
+            out_file = os.path.abspath(os.path.join(pages.root, path.lstrip('/')))
+            data = pages.get(out_file) if out_file.startswith(os.path.join(pages.root, '')) else None
+            if data is None:
+                return self.send_error(404)
+
+            content_type = mimetypes.guess_type(out_file)[0] or 'application/octet-stream'
+            if content_type == 'text/html':
+                end = data.rfind(b'</body>')
+                if end >= 0:
+                    data = data[:end] + serve_reload_script + data[end:]
+                content_type += '; charset=%s' % pages.encoding
+
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_events(self):
+            """send an event to reload the page when inputs change (server-sent events)"""
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            generation = pages.generation
+            try:
+                while True:
+                    time.sleep(pages.interval)
+                    if pages.generation != generation:
+                        generation = pages.generation
+                        self.wfile.write(b'data: reload\n\n')
+                    else:
+                        # a comment, to notice closed connections
+                        self.wfile.write(b':\n\n')
+                    self.wfile.flush()
+            except (IOError, OSError):
+                pass
+
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    def watch_inputs():
+        while True:
+            time.sleep(pages.interval)
+            try:
+                if pages.update():
+                    print('Reload %s' % bibfile)
+            except Exception as e:
+                # e.g. a bib file or a configuration in the middle of an edit. Keep the previous pages.
+                print('Error: %s' % e)
+
+    thread = threading.Thread(target=watch_inputs)
+    thread.daemon = True
+    thread.start()
+
+    httpd = Server(('127.0.0.1', port), Handler)
+    print('Serve %s on http://localhost:%d/' % (htmlfile, port))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+class PublicationApp(object):
+    """WSGI application which renders publication lists of a bib file for queries, e.g.
+
+        /?author=Jian+Cheng&year=2017&year=2018&style=year
+
+    author, author_first, author_corresponding and year are keys of selection_and (several values with repeated
+    keys), and style is show_paper_style 'type', 'year' or 'venue'.
+
+    Cleaned entries and their citations are kept in memory, and read again when the bib file or the citation
+    snapshot change. Citations of google scholar (show_citation 'bs') are got again after scholar_cache_ttl
+    seconds. Rendered pages are kept in a LRU cache of cache_size pages. The ETag of a page is a digest of
+    the entries, the parameters, the citations, bibtex2html.py and the query, so requests with If-None-Match get
+    304 without rendering. Nothing is printed.
+
+    Examples
+    --------
+        application = PublicationApp('papers.bib', read_config('papers.ini', no_citation=True))
+    """
+
+    query_keys = ['author', 'author_first', 'author_corresponding', 'year']
+    styles = ['type', 'year', 'venue']
+
+    def __init__(self, bibfile, conf=None, cache_size=128):
+        conf = dict(conf if conf is not None else read_config())
+        # a single page for each query
+        conf['author_group'] = {}
+        conf['search_index'] = False
+        conf['quiet'] = True
+
+        self.bibfile = bibfile
+        self.htmlfile = os.path.splitext(os.path.basename(bibfile))[0] + '.html'
+        self.base_ctx = make_render_context(conf, bibfile, self.htmlfile)
+        # base_ctx with the citation provider, and the time the provider was made
+        self.ctx = self.base_ctx
+        self.provider_time = None
+        self.files = [f for f in [bibfile, self.ctx['citation_snapshot']] if f]
+        self.cache_size = cache_size
+
+        self.lock = threading.Lock()
+        self.cache = collections.OrderedDict()
+        self.entry_cache = EntryCache(self.ctx['verbose'])
+        self.state = None
+        self.corpus = None
+        self.update()
+
+    def is_provider_expired(self):
+        """return true if citations of google scholar are older than scholar_cache_ttl"""
+
+        return self.base_ctx['show_citation'] == 'bs' and self.provider_time is not None and (
+            time.time() - self.provider_time >= self.base_ctx['scholar_cache_ttl'])
+
+    def update(self):
+        """read the bib file and citations of its entries again if the bib file or the citation snapshot changed,
+        or if citations of google scholar expired"""
+
+        state = get_files_state(self.files)
+        if state == self.state and not self.is_provider_expired():
+            return
+
+        with self.lock:
+            if state == self.state and not self.is_provider_expired():
+                return
+
+            bib_entries = read_entries(self.bibfile, self.ctx, self.entry_cache)
+
+            # citations of all entries, used by pages of all queries. A changed snapshot is read again, and
+            # google scholar profiles are got again (see get_scholar_profile) when they expired.
+            snapshot = self.base_ctx['citation_snapshot']
+            if self.state is None or self.state.get(snapshot) != state.get(snapshot) or self.is_provider_expired():
+                self.ctx = self.base_ctx.page(citation_provider=get_citation_provider(self.base_ctx))
+                self.provider_time = time.time()
+            ctx = add_citations(bib_entries, self.ctx)
+
+            # the digest of ctx has the citations
+            md5 = hashlib.md5(get_generator_digest().encode('utf-8'))
+            md5.update(ctx.digest().encode('utf-8'))
+            for e in bib_entries:
+                md5.update(json.dumps(e, sort_keys=True).encode('utf-8'))
+
+            self.corpus = (bib_entries, md5.hexdigest(), ctx)
+            self.cache.clear()
+            self.state = state
+
+    def get_query(self, query):
+        """get the ETag, show_paper_style and selection_and of a query {key: [values]}"""
+
+        self.update()
+        _, digest, _ = self.corpus
+
+        style = self.ctx['show_paper_style'] if self.ctx['show_paper_style'] in self.styles else 'type'
+        selection = {}
+        for k, v in query.items():
+            if k == 'style':
+                style = v[-1]
+            elif k == 'year':
+                try:
+                    selection[k] = [int(i) for i in v]
+                except ValueError:
+                    raise ValueError('Wrong year %s' % ', '.join(v))
+            elif k in self.query_keys:
+                selection[k] = v
+            else:
+                raise ValueError('Wrong query key %s. Must be %s' % (k, ', '.join(self.query_keys + ['style'])))
+        if style not in self.styles:
+            raise ValueError('Wrong style %s. Must be %s' % (style, ', '.join(self.styles)))
+
+        etag = hashlib.md5(json.dumps([digest, style, selection], sort_keys=True).encode('utf-8')).hexdigest()
+        return '"%s"' % etag, style, selection
+
+    def get_page(self, etag, style, selection):
+        """get the html page (bytes) of a query (see get_query), from the cache or rendered"""
+
+        with self.lock:
+            if etag in self.cache:
+                # most recently used
+                self.cache[etag] = self.cache.pop(etag)
+                return self.cache[etag]
+
+        bib_entries, _, ctx = self.corpus
+        # output file of the style, and no links to pages of other styles
+        html_files = {'htmlfile_type': '', 'htmlfile_year': '', 'htmlfile_venue': ''}
+        html_files['htmlfile_' + style] = self.htmlfile
+
+        memory_files = {}
+        title = 'Publications of %s' % ', '.join(selection['author']) if 'author' in selection else ctx['title']
+        ctx = ctx.page(memory_files=memory_files, show_paper_style=style, title=title, **html_files)
+        render_entries([e for e in bib_entries if is_entry_selected(e, ctx, selection, {})], ctx, citations=False)
+        html = memory_files[self.htmlfile]
+
+        with self.lock:
+            self.cache[etag] = html
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return html
+
+    def __call__(self, environ, start_response):
+        if PY2:
+            from urlparse import parse_qs
+        else:
+            from urllib.parse import parse_qs
+
+        if environ.get('PATH_INFO', '/') not in ['', '/']:
+            start_response('404 Not Found', [('Content-Type', 'text/plain; charset=utf-8')])
+            return [b'Not Found\n']
+
+        try:
+            etag, style, selection = self.get_query(parse_qs(environ.get('QUERY_STRING', '')))
+        except ValueError as e:
+            start_response('400 Bad Request', [('Content-Type', 'text/plain; charset=utf-8')])
+            return [('%s\n' % e).encode('utf-8')]
+
+        headers = [('ETag', etag), ('Cache-Control', 'no-cache')]
+        if etag in [i.strip() for i in environ.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+            start_response('304 Not Modified', headers)
+            return []
+
+        html = self.get_page(etag, style, selection)
+        start_response('200 OK', headers + [('Content-Type', 'text/html; charset=%s' % self.ctx['encoding']),
+                                            ('Content-Length', str(len(html)))])
+        return [html]
+
+
+class Corpus(object):
+    """Cleaned and selected entries of bib files with the render context of a configuration, see load.
+
+    Pages are rendered in memory and returned, without printing, and module state is not changed, so a process
+    can render many pages of many corpora. Citations are got from the citation provider once, for the first
+    page (of all entries) and for the first group, like in a build: they can be cached in params['scholar_cache']
+    and recorded in params['citation_history'].
+
+    Examples
+    --------
+        corpus = load('papers.bib', 'papers.ini', show_citation='no', show_total_citation=False)
+        html = corpus.render_year(selection_and={'author': ['Jian Cheng']}, title='Publications of Jian Cheng')
+        group = load('papers_group.bib', 'papers_group.ini', htmlfile='group', show_citation='no',
+                     show_total_citation=False)
+        for out_file, data in group.iter_group():
+            ...
+    """
+
+    def __init__(self, bib_entries, ctx, htmlfile):
+        self.bib_entries = bib_entries
+        self.htmlfile = htmlfile
+        self.ctx = ctx.page(citation_provider=get_citation_provider(ctx), quiet=True)
+        # css, javascript and icons prepared for the pages, {file: bytes}
+        self.assets = dict(ctx['memory_files'])
+        # ctx with citations of all entries for pages, (pages, ctx, {output file: bytes}) of the group
+        self.page_ctx = None
+        self.group = None
+
+    def get_entries(self, selection_and=None, selection_or=None):
+        """get entries selected by selection_and or selection_or (see is_entry_selected)"""
+
+        return [e for e in self.bib_entries if is_entry_selected(e, self.ctx, selection_and or {}, selection_or or {})]
+
+    def render(self, show_paper_style, selection_and=None, selection_or=None, **values):
+        """render a page of selected entries with show_paper_style 'type', 'year' or 'venue'.
+        values override parameters of the page, e.g. title.
+
+        Returns
+        -------
+            html : the html page (unicode)
+        """
+
+        if show_paper_style not in ['type', 'year', 'venue']:
+            raise ValueError("Wrong show_paper_style. Must be 'type', 'year', 'venue'")
+
+        # output file of the style, and no links to pages of other styles
+        html_files = {'htmlfile_type': '', 'htmlfile_year': '', 'htmlfile_venue': ''}
+        html_files['htmlfile_' + show_paper_style] = self.htmlfile
+        html_files.update(values)
+
+        if self.page_ctx is None:
+            self.page_ctx = add_citations(self.bib_entries, self.ctx.page(author_group={}))
+
+        memory_files = dict(self.assets)
+        ctx = self.page_ctx.page(memory_files=memory_files, show_paper_style=show_paper_style, outbibfile='',
+                                 search_index=False, **html_files)
+        render_entries(self.get_entries(selection_and, selection_or), ctx, citations=False)
+        return memory_files[self.htmlfile].decode(ctx['encoding'])
+
+    def render_type(self, selection_and=None, selection_or=None, **values):
+        """render a page of selected entries by types (see render)"""
+
+        return self.render('type', selection_and, selection_or, **values)
+
+    def render_year(self, selection_and=None, selection_or=None, **values):
+        """render a page of selected entries by years (see render)"""
+
+        return self.render('year', selection_and, selection_or, **values)
+
+    def render_venue(self, selection_and=None, selection_or=None, **values):
+        """render a page of selected entries by venues (see render)"""
+
+        return self.render('venue', selection_and, selection_or, **values)
+
+    def iter_group(self):
+        """render the files of a group (params['author_group']) one by one.
+
+        Yields
+        ------
+            (output file, content in bytes), for pages of authors, venues, years and categories, index.html and
+            the bib file (or data.json and index.html of a single page application)
+        """
+
+        if not len(self.ctx['author_group']):
+            raise ValueError("iter_group needs params['author_group']")
+
+        if self.group is None:
+            memory_files = dict(self.assets)
+            ctx = self.ctx.page(memory_files=memory_files, jobs=1, incremental=False, shard='', search_index=False)
+            pages, ctx = get_pages_group(self.bib_entries, ctx)
+            self.group = (pages, ctx, memory_files)
+        pages, ctx, memory_files = self.group
+
+        if ctx['group_output'] == 'spa':
+            write_entries_group_spa(self.bib_entries, pages, ctx)
+            for out_file in sorted(set(memory_files) - set(self.assets)):
+                yield out_file, memory_files.pop(out_file)
+            return
+        elif ctx['group_output'] != 'pages':
+            raise ValueError("Wrong params['group_output']. Must be 'pages', 'spa'")
+
+        bib_ctx = ctx.page(outbibfile=os.path.join(ctx['author_group_Bibliography'], 'complete-bibliography.bib'))
+        outputs = [(page[1]['htmlfile_type'], page, write_entries_by_type) for page in pages]
+        outputs.append((os.path.join(ctx['htmlfile_group'], 'index.html'), (self.bib_entries, ctx),
+                        _write_entries_group_index))
+        outputs.append((bib_ctx['outbibfile'], (self.bib_entries, bib_ctx), write_entries_to_bibfile))
+
+        for out_file, args, write in outputs:
+            write(*args)
+            yield out_file, memory_files.pop(out_file)
+
+    def render_group(self):
+        """render the files of a group, {output file: content in bytes} (see iter_group)"""
+
+        return dict(self.iter_group())
+
+
+def load(bibfiles, config=None, htmlfile='publications.html', **values):
+    """read, clean and select entries of bib files to render pages in memory.
+
+    Parameters
+    ----------
+        bibfiles : a bib file or a list of bib files. Entries with the key of a previous entry are skipped.
+        config   : a configuration file (see read_config), a dict of parameters, or None for default parameters
+        htmlfile : the output file (the output folder of a group) of pages, for relative links. It is not written.
+        values   : parameters which override config, e.g. show_citation='no'
+
+    Returns
+    -------
+        corpus : Corpus
+    """
+
+    if not isinstance(bibfiles, (list, tuple)):
+        bibfiles = [bibfiles]
+
+    if isinstance(config, dict):
+        conf = read_config(input_params=config)
+    else:
+        conf = read_config(config)
+    conf.update(values)
+    conf['memory_files'] = {}
+
+    ctx = make_render_context(conf, bibfiles[0], htmlfile)
+
+    bib_entries = []
+    keys = set()
+    for bibfile in bibfiles:
+        for e in read_entries(bibfile, ctx):
+            if e['ID'] not in keys:
+                keys.add(e['ID'])
+                bib_entries.append(e)
+
+    return Corpus(bib_entries, ctx, htmlfile)
+
+
+class BatchCache(object):
+    """Caches which are shared by the jobs of a batch (see run_batch): cleaned entries of bib files (EntryCache)
+    and citation providers, e.g. citations of google scholar profiles of authors on several pages.
+
+    Providers are shared by jobs with the same citation parameters (see provider_keys).
+    """
+
+    def __init__(self, verbose=0):
+        self.entry_cache = EntryCache(verbose)
+        self.providers = {}
+
+    @staticmethod
+    def get_provider_key(ctx):
+        """parameters of ctx which are used by citation providers"""
+
+        return repr([(k, ctx[k]) for k in sorted(ctx) if k.startswith('scholar_') or k in batch_provider_params])
+
+    def get_citation_provider(self, ctx):
+        """get the shared citation provider of ctx['show_citation'] (see get_citation_provider)"""
+
+        key = self.get_provider_key(ctx)
+        if key not in self.providers:
+            self.providers[key] = get_citation_provider(ctx)
+        return self.providers[key]
+
+
+# parameters of citation providers, besides scholar_*, which must be the same for jobs sharing a provider
+batch_provider_params = ['show_citation', 'citation_snapshot', 'title_match_threshold', 'verbose']
+
+
+def read_batch_manifest(manifest):
+    """read the jobs of a batch manifest (.json or .toml).
+
+    The manifest is a list of jobs, or has a list of jobs in 'jobs'. A job is a dict with keys
+    bibfile, output (the html file or group folder), config (optional .ini file), input (optional parameters
+    like -i, a dict or a string), outbib (optional) and nc (optional, like --nc). Files are relative to the
+    current folder, as on the command line.
+
+    Returns
+    -------
+        jobs : list of dict
+    """
+
+    if manifest.lower().endswith('.toml'):
+        try:
+            import tomllib
+            with open(manifest, 'rb') as f:
+                data = tomllib.load(f)
+        except ImportError:
+            try:
+                import toml
+            except ImportError:
+                raise ImportError('A .toml manifest needs python >= 3.11 (tomllib) or the toml package')
+            with io.open(manifest, 'r', encoding='utf8') as f:
+                data = toml.load(f)
+    else:
+        with io.open(manifest, 'r', encoding='utf8') as f:
+            data = json.load(f)
+
+    jobs = data.get('jobs', []) if isinstance(data, dict) else data
+    for i, job in enumerate(jobs):
+        if not isinstance(job, dict) or not job.get('bibfile') or not job.get('output'):
+            raise ValueError("Wrong job %d in %s. Must have 'bibfile' and 'output'" % (i + 1, manifest))
+    return jobs
+
+
+def run_batch_job(job, cache, no_citation=False, verbose=0, jobs=None):
+    """run a job of a batch manifest (see read_batch_manifest) with caches of the batch (BatchCache)
+
+    Returns
+    -------
+        result : dict of output, entries (number of selected entries), written (number of written files),
+                 files (number of output files), seconds, and error (message, or '' if the job succeeded)
+    """
+
+    start = time.time()
+    result = {'output': job['output'], 'entries': 0, 'written': 0, 'files': 0, 'error': ''}
+    try:
+        input_params = job.get('input')
+        if input_params and not isinstance(input_params, dict):
+            input_params = ast.literal_eval(input_params)
+        conf = read_config(job.get('config'), input_params, job.get('nc', no_citation), verbose, jobs)
+
+        htmlfile = job['output']
+        publish = conf['publish'] and len(conf['author_group'])
+        if publish:
+            group_folder, file_ext = os.path.splitext(htmlfile)
+            staging_folder = stage_output_folder(group_folder, conf['publish'])
+            htmlfile = staging_folder + file_ext
+
+        ctx = make_render_context(conf, job['bibfile'], htmlfile, job.get('outbib', ''))
+        ctx = ctx.page(citation_provider=cache.get_citation_provider(ctx))
+
+        entries_selected = read_entries(job['bibfile'], ctx, cache.entry_cache)
+        written = write_entries(entries_selected, ctx)
+
+        if publish:
+            publish_output_folder(staging_folder, group_folder, conf['publish'])
+
+        result.update(entries=len(entries_selected), files=len(written),
+                      written=sum(1 for changed in written.values() if changed))
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+
+    result['seconds'] = time.time() - start
+    return result
+
+
+# jobs, caches and options of a worker process of run_batch
+_worker_batch = None
+
+
+def _init_batch_worker(batch_jobs, cache, no_citation, verbose):
+    """initialize a worker process of run_batch"""
+
+    global _worker_batch
+    _worker_batch = (batch_jobs, cache, no_citation, verbose)
+
+
+def _run_batch_job(i):
+    """run the i-th job in a worker process of run_batch"""
+
+    batch_jobs, cache, no_citation, verbose = _worker_batch
+    # worker processes can't start processes to write pages
+    return i, run_batch_job(batch_jobs[i], cache, no_citation, verbose, 1)
+
+
+def run_batch(manifest, no_citation=False, verbose=0, jobs=None):
+    """run the jobs of a batch manifest (see read_batch_manifest) and print the time of each job.
+
+    Parameters
+    ----------
+        manifest    :   .json or .toml file of jobs
+        no_citation :   don't use google scholar, unless nc of a job is False
+        verbose     :   verbose level
+        jobs        :   number of processes to run jobs (all CPUs if <= 0). If jobs is None or 1, jobs run one by
+                        one in this process, and pages of a group are written with params['jobs'] processes.
+                        Otherwise bib files are parsed before the processes are forked, so that they inherit the
+                        cleaned entries, and each process has its own citations and writes pages of a group itself.
 
-    if len(params['author_group']):
+    Returns
+    -------
+        results : results of jobs (see run_batch_job), in the order of the manifest
+    """
+
+    import multiprocessing
+
+    batch_jobs = read_batch_manifest(manifest)
+
+    start = time.time()
+    if jobs is not None and jobs <= 0:
+        jobs = multiprocessing.cpu_count()
+
+    cache = BatchCache(verbose)
+    if jobs is None or jobs <= 1 or len(batch_jobs) <= 1:
+        results = [run_batch_job(job, cache, no_citation, verbose, jobs) for job in batch_jobs]
+    else:
+        for bibfile in sorted(set(job['bibfile'] for job in batch_jobs)):
+            try:
+                cache.entry_cache.read(bibfile)
+            except Exception:
+                # the error is reported by the jobs of the bib file
+                pass
+
+        if hasattr(multiprocessing, 'get_context') and 'fork' in multiprocessing.get_all_start_methods():
+            mp = multiprocessing.get_context('fork')
+        else:
+            mp = multiprocessing
+
+        results = [None] * len(batch_jobs)
+        pool = mp.Pool(min(jobs, len(batch_jobs)), initializer=_init_batch_worker,
+                       initargs=(batch_jobs, cache, no_citation, verbose))
+        try:
+            for i, result in pool.imap_unordered(_run_batch_job, range(len(batch_jobs))):
+                results[i] = result
+        finally:
+            pool.close()
+            pool.join()
+
+    width = max([len('output')] + [len(r['output']) for r in results])
+    print('%-*s %8s %12s %9s' % (width, 'output', 'entries', 'written', 'seconds'))
+    for r in results:
+        print('%-*s %8d %5d of %-4d %9.2f%s' % (width, r['output'], r['entries'], r['written'], r['files'],
+                                               r['seconds'], '  ' + r['error'] if r['error'] else ''))
+    num_errors = sum(1 for r in results if r['error'])
+    print('Run %d jobs in %.2f s, %d failed' % (len(results), time.time() - start, num_errors))
+
+    return results
+
+
+def main():
+    from docopt import docopt
+
+    args = docopt(__doc__, version='1.0')
+
+    _bibfile = args['<bibfile>']
+    _htmlfile = args['<htmlfile>']
+    _verbose = int(args['--verbose'])
+    _conffile = args['--conf']
+    _input = args['--input']
+    _outbibfile = args['--outbib']
+    _jobs = int(args['--jobs']) if args['--jobs'] else None
 
-        write_entries_group(entries_selected)
+    if _verbose >= 1:
+        print(args)
+
+    if args['--batch']:
+        results = run_batch(args['--batch'], args['--nc'], _verbose, _jobs)
+        if any(r['error'] for r in results):
+            sys.exit(1)
+        return
+
+    def read_conf():
+        conf = read_config(_conffile, ast.literal_eval(_input) if _input else None, args['--nc'], _verbose, _jobs)
+        if args['--publish']:
+            conf['publish'] = args['--publish']
+        if args['--shard']:
+            conf['shard'] = args['--shard']
+        if args['--merge']:
+            conf['shard'] = ''
+        return conf
+
+    conf = read_conf()
+
+    if args['--watch'] or args['--serve']:
+        if conf['publish'] or conf['shard']:
+            raise ValueError('--watch and --serve do not support --publish and --shard')
+        if args['--serve']:
+            serve(read_conf, _bibfile, _htmlfile, _outbibfile, _conffile, int(args['--serve']))
+        else:
+            watch(read_conf, _bibfile, _htmlfile, _outbibfile, _conffile)
+        return
 
+    # publish mode renders a group into a staging folder
+    publish = conf['publish'] and len(conf['author_group'])
+    if publish:
+        group_folder, file_ext = os.path.splitext(_htmlfile)
+        staging_folder = stage_output_folder(group_folder, conf['publish'])
+        _htmlfile = staging_folder + file_ext
+
+    ctx = make_render_context(conf, _bibfile, _htmlfile, _outbibfile)
+
+    entries_selected = read_entries(_bibfile, ctx)
+
+    if args['--merge']:
+        merge_shards(entries_selected, ctx, args['<shardfolder>'])
     else:
-        if params['show_citation'] == 'bs':
-            out_scholar = get_title_citation_url(params['googlescholarID'])
-            params['dict_title'] = out_scholar[0]
-            params['google_scholar_out'] = out_scholar[1:]
-
-        if params['show_paper_style'] == 'type':
-            write_entries_by_type(entries_selected, params['show_total_citation'])
-        elif params['show_paper_style'] == 'year':
-            write_entries_by_year(entries_selected, params['show_total_citation'])
-        elif params['show_paper_style'] == 'year_type' or params['show_paper_style'] == 'type_year':
-            write_entries_by_type(entries_selected, params['show_total_citation'])
-            write_entries_by_year(entries_selected, params['show_total_citation'])
-        elif params['show_paper_style'] == 'venue':
-            write_entries_by_venue(entries_selected, params['show_total_citation'])
+        write_entries(entries_selected, ctx)
+
+    if publish:
+        publish_output_folder(staging_folder, group_folder, conf['publish'])
 
 
 if __name__ == '__main__':